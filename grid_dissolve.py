@@ -0,0 +1,64 @@
+import numpy as np
+import shapely
+from collections import defaultdict
+from scipy import ndimage
+
+def label_cell_regions(cell_indices, cell_bins):
+    """
+    Find the connected regions of cells that share a bin. Because the grid is regular this is
+    done on the (i, j) index raster: each bin's cells are labeled with scipy.ndimage.label,
+    where cells sharing an edge (not just a corner) are connected.
+
+    Args:
+        cell_indices (list): (i, j) grid index of each cell
+        cell_bins (list): Bin of each cell, e.g. from map_grid_render.score_bins
+
+    Returns:
+        array: Region number of each cell, unique across bins
+    """
+    indices = np.asarray(cell_indices)
+    cell_bins = np.asarray(cell_bins)
+    i, j = indices[:, 0], indices[:, 1]
+
+    raster = np.full((i.max() + 1, j.max() + 1), -1)
+    raster[i, j] = cell_bins
+
+    regions = np.empty(len(cell_bins), dtype=np.int64)
+    next_region = 0
+    for bin_index in np.unique(cell_bins):
+        labels, n_labels = ndimage.label(raster == bin_index)
+        in_bin = cell_bins == bin_index
+        regions[in_bin] = labels[i[in_bin], j[in_bin]] - 1 + next_region
+        next_region += n_labels
+
+    return regions
+
+def dissolve_grid_cells(grid_cells, cell_indices, cell_bins):
+    """
+    Merge adjacent cells that share a bin into one geometry per connected region, so a map
+    draws a few hundred regions instead of tens of thousands of cells.
+
+    Args:
+        grid_cells (list): Shapely polygons for each grid cell
+        cell_indices (list): (i, j) grid index of each cell
+        cell_bins (list): Bin of each cell
+
+    Returns:
+        list: (bin, geometry) of each region
+    """
+    if not grid_cells:
+        return []
+
+    regions = label_cell_regions(cell_indices, cell_bins)
+
+    members = defaultdict(list)
+    region_bins = {}
+    for cell, region, bin_index in zip(grid_cells, regions, cell_bins):
+        members[region].append(cell)
+        region_bins[region] = bin_index
+
+    # Grid cells never overlap, so the faster coverage union can be used instead of unary_union
+    return [
+        (region_bins[region], shapely.coverage_union_all(cells))
+        for region, cells in sorted(members.items())
+    ]
@@ -0,0 +1,131 @@
+import json
+import numpy as np
+import os
+import shapely
+from matplotlib.colors import to_hex
+from map_grid import load_projected_states, load_grid_cells
+from grid_scoring import METRICS, unproject_coordinates
+from map_grid_render import score_bins, score_bin_edges, bin_colors
+from grid_dissolve import dissolve_grid_cells
+from score_cache import get_grid_scores
+
+# Decimal places kept in exported longitudes/latitudes, 4 places is about 10 meters
+DEFAULT_PRECISION = 4
+
+def scored_regions(metric, grid_cells, cell_indices, scores, percentiles=None, levels=10):
+    """
+    Bin the cell scores like the PNG maps and dissolve adjacent cells in the same bin.
+
+    Returns:
+        tuple: (regions, bin_ranges) where regions is a list of (bin, geometry) in the projected
+               CRS and bin_ranges holds the (low, high) score range of each bin
+    """
+    style = METRICS[metric]
+    low, high = percentiles or style['percentiles']
+    min_score, max_score = np.percentile(scores, low), np.percentile(scores, high)
+
+    cell_bins = score_bins(metric, scores, min_score, max_score, levels)
+    regions = dissolve_grid_cells(grid_cells, cell_indices, cell_bins)
+
+    edges = score_bin_edges(metric, min_score, max_score, levels)
+    return regions, list(zip(edges[:-1], edges[1:]))
+
+def regions_to_geojson(metric, regions, bin_ranges, precision=DEFAULT_PRECISION, levels=10):
+    """
+    Build a GeoJSON FeatureCollection of the regions in longitude/latitude. Coordinates are
+    quantized to the given number of decimals, which also snaps shared edges of neighboring
+    regions to identical coordinates, and repeated points are dropped.
+
+    Returns:
+        dict: The FeatureCollection
+    """
+    colors = bin_colors(metric, levels)
+
+    def to_lonlat(coords):
+        longitude, latitude = unproject_coordinates(coords[:, 0], coords[:, 1])
+        return np.round(np.column_stack([longitude, latitude]), precision)
+
+    features = []
+    for bin_index, geometry in regions:
+        geometry = shapely.make_valid(shapely.transform(geometry, to_lonlat))
+        # Rounding can leave consecutive duplicate vertices
+        geometry = shapely.remove_repeated_points(geometry)
+        if geometry.is_empty:
+            continue
+        low, high = bin_ranges[bin_index]
+        features.append({
+            'type': 'Feature',
+            'properties': {
+                'bin': int(bin_index),
+                'min_score': round(float(low), 2),
+                'max_score': round(float(high), 2),
+                'color': to_hex(colors[bin_index]),
+            },
+            'geometry': json.loads(shapely.to_geojson(geometry)),
+        })
+
+    return {'type': 'FeatureCollection', 'metric': metric, 'features': features}
+
+def export_grid(metric, grid_spacing_miles=20, output_format='geojson', precision=DEFAULT_PRECISION,
+                percentiles=None, levels=10, workers=1):
+    """
+    Export the scored grid of a metric with adjacent same-bin cells dissolved into regions.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (int): Grid spacing in miles
+        output_format (str): 'geojson', or 'fgb' for FlatGeobuf (written with geopandas)
+        precision (int): Decimal places kept in GeoJSON coordinates
+        percentiles (tuple): Optional (low, high) percentiles overriding the metric's default
+        levels (int): Number of bins continuous metrics are split into
+        workers (int): Number of worker processes used if the scores aren't cached yet
+
+    Returns:
+        str: Path of the exported file
+    """
+    _, us_boundary = load_projected_states()
+    grid_cells, cell_indices = load_grid_cells(us_boundary, grid_spacing_miles)
+    scores, _, _ = get_grid_scores(metric, grid_spacing_miles, grid_cells, workers)
+
+    regions, bin_ranges = scored_regions(metric, grid_cells, cell_indices, scores, percentiles, levels)
+    print(f"Dissolved {len(grid_cells)} grid cells into {len(regions)} regions")
+
+    os.makedirs('output', exist_ok=True)
+
+    if output_format == 'fgb':
+        import geopandas as gpd
+
+        output_file = f'output/map_grid_{metric}_{grid_spacing_miles}_miles.fgb'
+        colors = bin_colors(metric, levels)
+        gpd.GeoDataFrame(
+            {
+                'bin': [int(bin_index) for bin_index, _ in regions],
+                'min_score': [float(bin_ranges[bin_index][0]) for bin_index, _ in regions],
+                'max_score': [float(bin_ranges[bin_index][1]) for bin_index, _ in regions],
+                'color': [to_hex(colors[bin_index]) for bin_index, _ in regions],
+            },
+            geometry=[geometry for _, geometry in regions],
+            crs='EPSG:5070',
+        ).to_crs(epsg=4326).to_file(output_file, driver='FlatGeobuf')
+    else:
+        output_file = f'output/map_grid_{metric}_{grid_spacing_miles}_miles.geojson'
+        with open(output_file, 'w') as f:
+            json.dump(regions_to_geojson(metric, regions, bin_ranges, precision, levels), f, separators=(',', ':'))
+
+    print(f"Exported {metric} regions to {output_file} ({os.path.getsize(output_file) / 1e6:.2f} MB)")
+    return output_file
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a scored grid as dissolved GeoJSON or FlatGeobuf regions.")
+    parser.add_argument('metric', choices=list(METRICS))
+    parser.add_argument('--spacing', type=int, default=20, help="Grid spacing in miles")
+    parser.add_argument('--format', choices=['geojson', 'fgb'], default='geojson')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION, help="Decimal places of GeoJSON coordinates")
+    parser.add_argument('--percentiles', type=int, nargs=2, metavar=('LOW', 'HIGH'))
+    parser.add_argument('--levels', type=int, default=10, help="Number of bins for continuous metrics")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes used if scores aren't cached yet")
+    args = parser.parse_args()
+
+    export_grid(args.metric, args.spacing, args.format, args.precision, args.percentiles, args.levels, args.workers)
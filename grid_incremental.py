@@ -0,0 +1,203 @@
+import hashlib
+import numpy as np
+import os
+import pickle
+import shapely
+from grid_scoring import score_stations, cell_search_radius, assign_cell, scoring_fingerprint
+from spatial_index import load_kdtree
+
+# Bump when the layout of the saved state changes so old files are rebuilt instead of misread
+INCREMENTAL_STATE_VERSION = 2
+
+def station_digests(stations):
+    """
+    Fingerprint of everything about each station that can affect its score or which cells it
+    belongs to, from the station cache arrays.
+
+    Returns:
+        dict: Station ID -> digest
+    """
+    digests = {}
+    for k, station_id in enumerate(stations['station_ids'].tolist()):
+        digest = hashlib.sha1()
+        for name in ('x', 'y', 'daily_max', 'rainy_days'):
+            digest.update(np.ascontiguousarray(stations[name][k]).tobytes())
+        digests[station_id] = digest.hexdigest()
+    return digests
+
+def _select_rows(stations, station_ids):
+    rows = np.flatnonzero(np.isin(stations['station_ids'], list(station_ids)))
+    return {name: values[rows] for name, values in stations.items()}
+
+def _station_points(stations):
+    return dict(zip(stations['station_ids'].tolist(), zip(stations['x'].tolist(), stations['y'].tolist())))
+
+def _station_scores(metric, stations):
+    return dict(zip(stations['station_ids'].tolist(), score_stations(metric, stations).tolist()))
+
+def incremental_state_file(metric, grid_spacing_miles):
+    return f'computed/incremental_{metric}_{grid_spacing_miles}_miles.pkl'
+
+def _grid_signature(grid_cells):
+    """
+    Cheap check that the cached state was built for the same grid cells.
+    """
+    if not grid_cells:
+        return (0,)
+    return (len(grid_cells), grid_cells[0].bounds, grid_cells[-1].bounds)
+
+def _assign_cells(cell_numbers, grid_cells, station_data, station_scores, kdtree, grid_spacing_miles):
+    """
+    Assign and score the given cells against the full station set.
+
+    Returns:
+        dict: cell number -> (member station IDs, nearest station ID or None, score)
+    """
+    search_radius = cell_search_radius(grid_spacing_miles)
+    results = {}
+
+    for k in cell_numbers:
+        members, nearest = assign_cell(grid_cells[k], station_data, kdtree, search_radius)
+        if members:
+            score = sum(station_scores[idx] for idx in members) / len(members)
+            results[k] = ([station_data[idx][0] for idx in members], None, score)
+        else:
+            results[k] = ([], station_data[nearest][0], station_scores[nearest])
+
+    return results
+
+def _build_station_set(metric, station_ids, station_points, station_scores):
+    """
+    Rebuild station_data and the score list, and load the KD-tree, in the given station order.
+    The order is the station cache's, as in a full run, so the tree stored by prepare_station_scoring is reused.
+    """
+    station_data = []
+    scores = []
+    for station_id in station_ids:
+        station_data.append((station_id, None, station_points[station_id]))
+        scores.append(station_scores[station_id])
+
+    return station_data, scores, load_kdtree([station_points[station_id] for station_id in station_ids], f'cache_stations_{metric}')
+
+def _cell_counts(state):
+    cells_with_assigned_stations = sum(1 for members in state['members'] if members)
+    return cells_with_assigned_stations, len(state['members']) - cells_with_assigned_stations
+
+def update_grid_scores(metric, grid_spacing_miles, grid_cells, stations, force_recalculate=False):
+    """
+    Score the grid cells, reusing the results of the last run for everything that
+    doesn't depend on a station that was added, removed or changed since then.
+
+    Only changed stations are scored again. The cells that are recomputed are
+    the ones that contained a changed station, that the station moved into, that used it as
+    their nearest station, or that it is now closer to than their current nearest station.
+    The result is the same as scoring every cell from scratch.
+
+    Args:
+        metric (str): One of the keys of METRICS
+        grid_spacing_miles (int): Grid spacing in miles
+        grid_cells (list): Shapely polygons for each grid cell
+        stations (dict): Station cache arrays from load_metric_stations
+        force_recalculate (bool): If True, ignore the saved state and score everything
+
+    Returns:
+        tuple: (scores, cells_with_assigned_stations, cells_with_nearest_stations)
+    """
+    state_file = incremental_state_file(metric, grid_spacing_miles)
+    digests = station_digests(stations)
+
+    state = None
+    if not force_recalculate and os.path.exists(state_file):
+        try:
+            with open(state_file, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading incremental state: {e}")
+        if state is not None and (state.get('version') != INCREMENTAL_STATE_VERSION or
+                                  state['grid_signature'] != _grid_signature(grid_cells)):
+            print("Incremental state was built for a different grid, recomputing everything")
+            state = None
+        if state is not None and state.get('scoring') != scoring_fingerprint():
+            print("Scoring code or profile changed since the incremental state was saved, rescoring all stations")
+            state = None
+
+    if state is None:
+        print("No usable incremental state, scoring all stations and cells...")
+        state = {
+            'version': INCREMENTAL_STATE_VERSION,
+            'grid_signature': _grid_signature(grid_cells),
+            'scoring': scoring_fingerprint(),
+            'digests': digests,
+            'station_points': _station_points(stations),
+            'station_scores': _station_scores(metric, stations),
+            'centers': np.array([((c.bounds[0] + c.bounds[2]) / 2, (c.bounds[1] + c.bounds[3]) / 2) for c in grid_cells]),
+            'members': [[] for _ in grid_cells],
+            'nearest': [None for _ in grid_cells],
+            'scores': [0.0 for _ in grid_cells],
+        }
+        affected = range(len(grid_cells))
+        changed_ids = list(state['station_points'])
+    else:
+        changed_ids = [station_id for station_id, digest in digests.items() if state['digests'].get(station_id) != digest]
+        removed_ids = [station_id for station_id in state['digests'] if station_id not in digests]
+        print(f"{len(changed_ids)} stations added or changed, {len(removed_ids)} removed since the last run")
+
+        if not changed_ids and not removed_ids:
+            return list(state['scores']), *_cell_counts(state)
+
+        dirty_ids = set(changed_ids) | set(removed_ids)
+        for station_id in dirty_ids:
+            state['station_points'].pop(station_id, None)
+            state['station_scores'].pop(station_id, None)
+
+        # Only the changed stations need to be scored
+        changed = _select_rows(stations, changed_ids)
+        state['station_points'].update(_station_points(changed))
+        state['station_scores'].update(_station_scores(metric, changed))
+        state['digests'] = digests
+
+        # Cells that contained a changed station or used it as their nearest station
+        affected = {
+            k for k, (members, nearest) in enumerate(zip(state['members'], state['nearest']))
+            if nearest in dirty_ids or dirty_ids.intersection(members)
+        }
+
+        if changed_ids:
+            changed_points = np.column_stack([changed['x'], changed['y']])
+
+            # Cells the changed stations are now inside
+            _, cell_numbers = shapely.STRtree(grid_cells).query(shapely.points(changed_points), predicate='within')
+            affected.update(int(k) for k in cell_numbers)
+
+            # Cells without stations that a changed station is now at least as close to as their nearest station
+            fallback = np.array([k for k, nearest in enumerate(state['nearest']) if nearest is not None and k not in affected], dtype=int)
+            if len(fallback):
+                centers = state['centers'][fallback]
+                nearest_points = np.array([state['station_points'][state['nearest'][k]] for k in fallback])
+                nearest_distance = np.hypot(*(centers - nearest_points).T)
+                for x, y in changed_points:
+                    closer = np.hypot(centers[:, 0] - x, centers[:, 1] - y) <= nearest_distance
+                    affected.update(int(k) for k in fallback[closer])
+
+        affected = sorted(affected)
+
+    print(f"Rescoring {len(changed_ids)} stations and {len(affected)}/{len(grid_cells)} grid cells")
+
+    # Keep the stations in the same order as a full run so sums over a cell's stations match exactly
+    station_ids = stations['station_ids'].tolist()
+    if not station_ids:
+        print("No valid station points found!")
+        return [], 0, 0
+    station_data, station_scores, kdtree = _build_station_set(metric, station_ids, state['station_points'], state['station_scores'])
+
+    results = _assign_cells(affected, grid_cells, station_data, station_scores, kdtree, grid_spacing_miles)
+    for k, (members, nearest, score) in results.items():
+        state['members'][k] = members
+        state['nearest'][k] = nearest
+        state['scores'][k] = score
+
+    os.makedirs('computed', exist_ok=True)
+    with open(state_file, 'wb') as f:
+        pickle.dump(state, f)
+
+    return list(state['scores']), *_cell_counts(state)
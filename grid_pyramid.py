@@ -0,0 +1,270 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+import shapely
+from collections import defaultdict
+from map_grid import load_projected_states, grid_coordinates, load_grid_cells
+from grid_scoring import load_metric_stations, prepare_station_scoring
+from map_grid_render import render_grid_scores
+from score_cache import score_cache_key, remove_other_cache_files
+from spatial_index import array_digest
+
+# Per-cell statistics kept at every pyramid level and how each one is aggregated into a coarser level
+LEVEL_REDUCTIONS = {
+    'count': ('sum', 0),              # number of stations inside the cell
+    'sum': ('sum', 0.0),              # sum of the scores of those stations
+    'min': ('min', np.inf),           # lowest station score
+    'max': ('max', -np.inf),          # highest station score
+    'area': ('sum', 0.0),             # area of the cell inside the US (0 = no cell)
+    'minx': ('min', np.inf),          # bounds of the cell clipped to the US, the cell
+    'miny': ('min', np.inf),          # center used for the nearest station fallback is
+    'maxx': ('max', -np.inf),         # the center of these bounds
+    'maxy': ('max', -np.inf),
+}
+
+def build_finest_level(grid_cells, cell_indices, x_grid, y_grid, station_data, station_scores):
+    """
+    Calculate the per-cell station statistics for the finest grid, laid out as (columns, rows) rasters.
+
+    Args:
+        grid_cells (list): Shapely polygons for each grid cell
+        cell_indices (list): (i, j) grid index of each cell
+        x_grid (array): Grid line x coordinates
+        y_grid (array): Grid line y coordinates
+        station_data (list): (station_id, station, (x, y)) tuples from project_stations
+        station_scores (list): Score of each station, in the same order as station_data
+
+    Returns:
+        dict: Raster of each statistic in LEVEL_REDUCTIONS plus the 'spacing' of the level in meters
+    """
+    shape = (len(x_grid) - 1, len(y_grid) - 1)
+    level = {
+        name: np.full(shape, fill, dtype=np.int64 if name == 'count' else np.float64)
+        for name, (_, fill) in LEVEL_REDUCTIONS.items()
+    }
+    level['spacing'] = x_grid[1] - x_grid[0]
+
+    cell_lookup = {}
+    for cell, (i, j) in zip(grid_cells, cell_indices):
+        cell_lookup[(i, j)] = cell
+        level['area'][i, j] = cell.area
+        level['minx'][i, j], level['miny'][i, j], level['maxx'][i, j], level['maxy'][i, j] = cell.bounds
+
+    # The grid is regular, so each station can only be inside the cell its coordinates round down to
+    points = np.array([point for _, _, point in station_data], dtype=float).reshape(-1, 2)
+    columns = np.searchsorted(x_grid, points[:, 0], side='right') - 1
+    rows = np.searchsorted(y_grid, points[:, 1], side='right') - 1
+    for i, j, (x, y), score in zip(columns.tolist(), rows.tolist(), points.tolist(), station_scores):
+        cell = cell_lookup.get((i, j))
+        # The cell is clipped to the US boundary, so still check the station is really inside it
+        if cell is None or not shapely.contains_xy(cell, x, y):
+            continue
+        level['count'][i, j] += 1
+        level['sum'][i, j] += score
+        level['min'][i, j] = min(level['min'][i, j], score)
+        level['max'][i, j] = max(level['max'][i, j], score)
+
+    return level
+
+def derive_pyramid_level(level, factor):
+    """
+    Derive a coarser level by aggregating factor x factor blocks of cells.
+
+    Coarse cells that are less than 10% inside the US are dropped, the same rule used when
+    generating grid cells, except that fine cells that were already dropped don't count towards the area.
+
+    Args:
+        level (dict): Level from build_finest_level (or a previously derived level)
+        factor (int): Number of cells along each side of a block
+
+    Returns:
+        dict: The coarser level, with the same statistics
+    """
+    if factor == 1:
+        return level
+
+    n_columns, n_rows = level['count'].shape
+    padded_columns = -(-n_columns // factor) * factor
+    padded_rows = -(-n_rows // factor) * factor
+
+    coarse = {'spacing': level['spacing'] * factor}
+    for name, (reduction, fill) in LEVEL_REDUCTIONS.items():
+        padded = np.full((padded_columns, padded_rows), fill, dtype=level[name].dtype)
+        padded[:n_columns, :n_rows] = level[name]
+        blocks = padded.reshape(padded_columns // factor, factor, padded_rows // factor, factor)
+        coarse[name] = getattr(blocks, reduction)(axis=(1, 3))
+
+    # Drop cells that are mostly outside the US
+    too_small = coarse['area'] < 0.1 * coarse['spacing'] ** 2
+    for name, (_, fill) in LEVEL_REDUCTIONS.items():
+        coarse[name][too_small] = fill
+
+    return coarse
+
+def level_cell_scores(level, station_scores, kdtree):
+    """
+    Score the cells of a pyramid level: the average score of the stations inside each cell,
+    or the score of the station nearest to the cell center when there are none.
+
+    Returns:
+        tuple: (cell_indices, scores) arrays for the cells that exist at this level
+    """
+    cell_indices = np.argwhere(level['area'] > 0)
+    i, j = cell_indices[:, 0], cell_indices[:, 1]
+
+    count = level['count'][i, j]
+    scores = np.empty(len(cell_indices))
+
+    has_stations = count > 0
+    scores[has_stations] = level['sum'][i, j][has_stations] / count[has_stations]
+
+    # Fall back to the station closest to each remaining cell's center
+    empty = ~has_stations
+    if np.any(empty):
+        centers = np.column_stack([
+            (level['minx'][i, j][empty] + level['maxx'][i, j][empty]) / 2,
+            (level['miny'][i, j][empty] + level['maxy'][i, j][empty]) / 2,
+        ])
+        _, nearest = kdtree.query(centers, k=1)
+        scores[empty] = np.asarray(station_scores)[nearest]
+
+    return cell_indices, scores
+
+def level_cell_geometries(grid_cells, cell_indices, factor, level_indices, coarse_grid=None):
+    """
+    Get the geometry of each cell of a derived level. Cells of the coarse grid are used as
+    they are, since a coarse cell is the same box clipped to the US boundary. Cells the coarse
+    grid doesn't have (its 10% rule counts area the finest level dropped) are merged from the
+    finest cells they cover, with a coverage union since grid cells share their edges exactly.
+
+    Args:
+        grid_cells (list): Shapely polygons of the finest grid cells
+        cell_indices (list): (i, j) grid index of each finest cell
+        factor (int): Number of finest cells along each side of a derived cell
+        level_indices (array): (i, j) indices of the cells at the derived level
+        coarse_grid (tuple): Optional (grid_cells, cell_indices) from load_grid_cells at the
+                             derived level's spacing
+
+    Returns:
+        list: One geometry per entry of level_indices
+    """
+    if factor == 1:
+        cell_lookup = dict(zip(map(tuple, cell_indices), grid_cells))
+        return [cell_lookup[(i, j)] for i, j in level_indices]
+
+    cell_lookup = dict(zip(map(tuple, coarse_grid[1]), coarse_grid[0])) if coarse_grid else {}
+    missing = {(int(i), int(j)) for i, j in level_indices} - set(cell_lookup)
+
+    if missing:
+        members = defaultdict(list)
+        for cell, (i, j) in zip(grid_cells, cell_indices):
+            if (i // factor, j // factor) in missing:
+                members[(i // factor, j // factor)].append(cell)
+        for key in missing:
+            cell_lookup[key] = shapely.coverage_union_all(members[key])
+
+    return [cell_lookup[(int(i), int(j))] for i, j in level_indices]
+
+def pyramid_cache_file(metric, finest_spacing_miles):
+    """
+    Path of the cached finest level for the current station data and scoring code.
+    """
+    return f'computed/pyramid_{metric}_{finest_spacing_miles}_miles_{score_cache_key(metric)}.npz'
+
+def load_grid_pyramid(metric, finest_spacing_miles, grid_cells, cell_indices, x_grid, y_grid,
+                      station_data, station_scores, force_recalculate=False):
+    """
+    Load the finest pyramid level from the cache in computed/, building and caching it first if needed.
+    Coarser levels are cheap to derive from it with derive_pyramid_level, so only the finest level is stored.
+    """
+    os.makedirs('computed', exist_ok=True)
+    cache_file = pyramid_cache_file(metric, finest_spacing_miles)
+    grid_signature = array_digest(x_grid, y_grid, cell_indices)
+
+    if not force_recalculate and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            # The grid itself could have been regenerated since
+            if 'grid_signature' in cached.files and str(cached['grid_signature']) == grid_signature:
+                print(f"Loading grid pyramid from cache: {cache_file}")
+                return {name: cached[name] for name in cached.files if name != 'grid_signature'}
+        print("Cached grid pyramid was built for a different grid, rebuilding it")
+
+    print(f"Building finest pyramid level ({finest_spacing_miles}-mile grid)...")
+    level = build_finest_level(grid_cells, cell_indices, x_grid, y_grid, station_data, station_scores)
+    np.savez(cache_file, grid_signature=grid_signature, **level)
+    remove_other_cache_files(cache_file)
+
+    return level
+
+def create_pyramid_maps(metric, finest_spacing_miles=5, factors=(1, 2, 4, 8), force_recalculate=False, dissolve=False):
+    """
+    Create maps of a metric at several grid spacings, computing the grid and station assignment
+    only for the finest spacing. With the defaults this renders 5-, 10-, 20- and 40-mile maps.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        finest_spacing_miles (int): Grid spacing of the finest level in miles
+        factors (tuple): Multiples of the finest spacing to render
+        force_recalculate (bool): If True, rebuild the finest level even if cached data exists
+        dissolve (bool): If True, merge adjacent cells of the same color before drawing
+
+    Returns:
+        list: Paths of the saved maps
+    """
+    print(f"Loading station data for {metric} map...")
+    stations = load_metric_stations(metric)
+    print(f"Loaded {len(stations['station_ids'])} stations")
+
+    projected_states, us_boundary = load_projected_states()
+    x_grid, y_grid = grid_coordinates(us_boundary.bounds, finest_spacing_miles)
+    grid_cells, cell_indices = load_grid_cells(us_boundary, finest_spacing_miles, force_recalculate)
+
+    station_data, station_scores, kdtree = prepare_station_scoring(stations, metric)
+    if kdtree is None:
+        print("No valid station points found!")
+        return []
+
+    finest = load_grid_pyramid(
+        metric, finest_spacing_miles, grid_cells, cell_indices, x_grid, y_grid,
+        station_data, station_scores, force_recalculate
+    )
+
+    os.makedirs('output', exist_ok=True)
+    output_files = []
+
+    for factor in factors:
+        spacing_miles = finest_spacing_miles * factor
+        level = derive_pyramid_level(finest, factor)
+        level_indices, scores = level_cell_scores(level, station_scores, kdtree)
+        print(f"{spacing_miles}-mile level: {len(scores)} cells, {np.count_nonzero(level['count'])} with stations inside")
+
+        # The coarse grid is cached like the finest one, so only cells it lacks are merged
+        coarse_grid = load_grid_cells(us_boundary, spacing_miles, force_recalculate) if factor > 1 else None
+        level_cells = level_cell_geometries(grid_cells, cell_indices, factor, level_indices, coarse_grid)
+
+        fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+        projected_states.plot(linewidth=0.8, edgecolor='black', facecolor='white', ax=ax)
+        render_grid_scores(plt, level_cells, scores, metric, projected_states, cell_indices=level_indices, dissolve=dissolve)
+        ax.set_title(f'Continental US {metric.title()} Map ({spacing_miles}-Mile Grid)', fontsize=15)
+        ax.set_axis_off()
+
+        output_file = f'output/map_grid_{metric}_{spacing_miles}_miles.png'
+        print(f"Saving {metric} map to {output_file}...")
+        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+        output_files.append(output_file)
+
+    return output_files
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render a metric at several grid spacings from one finest grid.")
+    parser.add_argument('metric', choices=['temperature', 'precipitation', 'comfort'])
+    parser.add_argument('--finest-spacing', type=int, default=5, help="Finest grid spacing in miles")
+    parser.add_argument('--factors', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--force-recalc', action='store_true')
+    parser.add_argument('--dissolve', action='store_true', help="Merge adjacent cells of the same color before drawing")
+    args = parser.parse_args()
+
+    create_pyramid_maps(args.metric, args.finest_spacing, tuple(args.factors), args.force_recalc, args.dissolve)
@@ -0,0 +1,339 @@
+import hashlib
+import numpy as np
+import multiprocessing
+import shapely
+import types
+from concurrent.futures import ProcessPoolExecutor
+from pyproj import Transformer
+from station import Station
+from scoring_profiles import (DEFAULT_PROFILE, batch_station_scores, batch_temperature_scores,
+                              summary_temperature_scores, batch_precipitation_scores)
+from spatial_index import load_kdtree
+from spatial_order import cell_order
+
+# 1 mile = 1609.34 meters (grid spacing is in miles, the projected CRS is in meters)
+METERS_PER_MILE = 1609.34
+
+# 7 distinct colors from red to yellow to green
+SEVEN_BIN_COLORS = [
+    (0.8, 0, 0),      # Dark red
+    (1.0, 0.2, 0.2),  # Red
+    (1.0, 0.5, 0),    # Orange
+    (1.0, 1.0, 0),    # Yellow
+    (0.7, 1.0, 0),    # Yellow-green
+    (0.4, 0.8, 0),    # Light green
+    (0, 0.6, 0)       # Green
+]
+
+# White for no precipitation, light blue, dark blue for high
+PRECIPITATION_COLORS = [(1, 1, 1), (0.7, 0.9, 1), (0, 0.3, 0.8)]
+
+# Built once and reused, creating a transformer costs far more than projecting with it
+_to_projected = Transformer.from_crs("EPSG:4326", "EPSG:5070", always_xy=True)
+_to_lonlat = Transformer.from_crs("EPSG:5070", "EPSG:4326", always_xy=True)
+
+# Shared state for the scoring workers. It is filled in before the worker processes are
+# forked so the grid cells, station points and KD-tree are inherited instead of pickled per task.
+_scoring_state = {}
+
+# Everything the grid scripts need to know about each map type
+METRICS = {
+    'temperature': {
+        'score': Station.get_temperature_score,
+        'percentiles': (2, 98),
+        'bins': 7,
+        'colors': SEVEN_BIN_COLORS,
+        'label': 'Temperature Comfort Score (higher = more comfortable)',
+    },
+    'precipitation': {
+        'score': Station.get_precipitation_score,
+        'percentiles': (5, 95),
+        'bins': None,  # continuous colormap
+        'colors': PRECIPITATION_COLORS,
+        'label': 'Precipitation Score (higher = more rainy days)',
+    },
+    'comfort': {
+        'score': Station.get_total_score,
+        'percentiles': (2, 98),
+        'bins': 7,
+        'colors': SEVEN_BIN_COLORS,
+        'label': 'Overall Comfort Score (higher = more comfortable)',
+    },
+}
+
+# Station methods whose code determines the scores, together with the values in DEFAULT_PROFILE
+SCORING_METHODS = [Station.get_temperature_score, Station.get_precipitation_score, Station.get_total_score]
+
+# Vectorised functions the grid scripts and batch jobs score the cached stations with
+BATCH_SCORING_FUNCTIONS = [batch_station_scores, summary_temperature_scores, batch_temperature_scores,
+                           batch_precipitation_scores]
+
+def _update_code_digest(digest, code):
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        # The repr of a nested function's code holds its memory address, so hash its contents instead
+        if isinstance(const, types.CodeType):
+            _update_code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+def code_fingerprint(functions):
+    """
+    Hash the bytecode and constants of functions, so changing their code invalidates results cached from them.
+    """
+    digest = hashlib.sha1()
+    for function in functions:
+        _update_code_digest(digest, function.__code__)
+    return digest.hexdigest()
+
+def scoring_fingerprint():
+    """
+    Hash the scoring code and the default profile, so changing a constant such as the ideal
+    temperature invalidates cached scores.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr(sorted(DEFAULT_PROFILE.to_dict().items())).encode())
+    digest.update(code_fingerprint(SCORING_METHODS + BATCH_SCORING_FUNCTIONS).encode())
+    return digest.hexdigest()
+
+def load_metric_stations(metric):
+    """
+    Load the stations that have the data needed to score the given metric from the station
+    cache, with the projected coordinates and temperature summaries it holds, in its
+    Hilbert-curve order.
+
+    Args:
+        metric (str): One of the keys of METRICS
+
+    Returns:
+        dict: The selected station cache arrays, see station_cache.load_station_cache
+    """
+    # station_cache projects the stations with project_coordinates, so it's imported here
+    from station_cache import load_station_cache, metric_station_mask, select_stations
+    cache = load_station_cache()
+    return select_stations(cache, metric_station_mask(cache, metric))
+
+def score_stations(metric, stations, profile=None):
+    """
+    Score every station in the station cache arrays for the metric in one vectorised pass.
+
+    Returns:
+        array: Score of each station
+    """
+    return batch_station_scores(metric, [profile or DEFAULT_PROFILE], stations['daily_max'], stations['rainy_days'], summary=stations)[0]
+
+def project_coordinates(longitude, latitude):
+    """
+    Project arrays of longitudes and latitudes into the equal-area CRS used by the grid
+    (EPSG:5070) in one call. Missing (NaN) coordinates stay NaN.
+
+    Returns:
+        tuple: (x, y) arrays in meters
+    """
+    x, y = _to_projected.transform(np.asarray(longitude, dtype=float), np.asarray(latitude, dtype=float))
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+def unproject_coordinates(x, y):
+    """
+    Convert arrays of projected (EPSG:5070) coordinates back to longitudes and latitudes,
+    the inverse of project_coordinates.
+
+    Returns:
+        tuple: (longitude, latitude) arrays in degrees
+    """
+    longitude, latitude = _to_lonlat.transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    return np.asarray(longitude, dtype=float), np.asarray(latitude, dtype=float)
+
+def project_stations(stations):
+    """
+    Project station coordinates into the equal-area CRS used by the grid (EPSG:5070).
+
+    Args:
+        stations (dict): Dictionary mapping station IDs to Station objects
+
+    Returns:
+        tuple: (station_data, station_points) where station_data is a list of
+               (station_id, station, (x, y)) tuples and station_points is a (stations, 2) array
+    """
+    located = [
+        (station_id, station) for station_id, station in stations.items()
+        if station.latitude is not None and station.longitude is not None
+    ]
+    x, y = project_coordinates([station.longitude for _, station in located], [station.latitude for _, station in located])
+
+    station_data = [(station_id, station, (sx, sy)) for (station_id, station), sx, sy in zip(located, x.tolist(), y.tolist())]
+    return station_data, np.column_stack([x, y]).reshape(-1, 2)
+
+def cell_search_radius(grid_spacing_miles):
+    """
+    Radius around a cell center that is guaranteed to reach every point of the cell.
+    """
+    grid_spacing_meters = grid_spacing_miles * METERS_PER_MILE
+
+    # Using the diagonal of the grid cell as the search radius to ensure we capture all stations
+    return np.sqrt(2) * (grid_spacing_meters / 2)
+
+def assign_cell(cell, station_data, kdtree, search_radius):
+    """
+    Find the stations inside a grid cell, or the station nearest to its center if there are none.
+
+    Args:
+        cell: Shapely polygon of the grid cell
+        station_data (list): (station_id, station, (x, y)) tuples from project_stations
+        kdtree (KDTree): KD-tree over the projected station points, in the order of station_data
+        search_radius (float): Radius from cell_search_radius
+
+    Returns:
+        tuple: (members, nearest) where members are the indices of the stations inside the cell
+               and nearest is the index of the nearest station (None if members is not empty)
+    """
+    # Get cell center
+    cell_center_x = (cell.bounds[0] + cell.bounds[2]) / 2
+    cell_center_y = (cell.bounds[1] + cell.bounds[3]) / 2
+
+    # Find indices of stations within the search radius
+    indices = np.asarray(kdtree.query_ball_point([cell_center_x, cell_center_y], search_radius), dtype=np.intp)
+
+    # Filter stations that are actually within the cell, testing the tree's own copy of the
+    # coordinates in one call
+    candidates = kdtree.data[indices]
+    members = indices[shapely.contains_xy(cell, candidates[:, 0], candidates[:, 1])].tolist()
+    if members:
+        return members, None
+
+    distance, nearest = kdtree.query([cell_center_x, cell_center_y], k=1)
+    return members, int(nearest)
+
+def score_grid_cells(grid_cells, station_data, station_scores, kdtree, grid_spacing_miles, label='grid', show_progress=True, workers=1):
+    """
+    Score each grid cell with the average score of the stations inside it, or with the
+    score of the station nearest to the cell center when the cell has no stations.
+
+    Args:
+        grid_cells (list): Shapely polygons for each grid cell
+        station_data (list): (station_id, station, (x, y)) tuples from project_stations
+        station_scores (list): Score of each station, in the same order as station_data
+        kdtree (KDTree): KD-tree over the projected station points
+        grid_spacing_miles (float): Grid spacing in miles
+        label (str): Name of the score, used for progress output
+        show_progress (bool): If False, don't print per-cell progress
+        workers (int): Number of worker processes, cells are split into contiguous chunks
+                       and the results are identical to scoring them serially
+
+    The cells are visited along a Hilbert curve over their centers (see spatial_order), so
+    consecutive KD-tree queries land in the same part of the tree, and the scores are
+    returned in the order of grid_cells.
+
+    Returns:
+        tuple: (scores, cells_with_assigned_stations, cells_with_nearest_stations)
+    """
+    if workers > 1 and len(grid_cells) > 1:
+        return _score_grid_cells_parallel(
+            grid_cells, station_data, station_scores, kdtree, grid_spacing_miles, label, show_progress, workers
+        )
+
+    scores = [None] * len(grid_cells)
+    cells_with_assigned_stations = 0
+    cells_with_nearest_stations = 0
+
+    search_radius = cell_search_radius(grid_spacing_miles)
+
+    for i, k in enumerate(cell_order(grid_cells), 1):
+        # Update progress
+        if show_progress:
+            print(f"\rCalculating {label} scores: {i}/{len(grid_cells)} cells", end='')
+
+        members, nearest = assign_cell(grid_cells[k], station_data, kdtree, search_radius)
+
+        # Calculate average score if there are stations in the cell
+        if members:
+            scores[k] = sum(station_scores[idx] for idx in members) / len(members)
+            cells_with_assigned_stations += 1
+        else:
+            # Fall back to the station closest to this cell's center
+            scores[k] = station_scores[nearest]
+            cells_with_nearest_stations += 1
+
+    # Print newline after completion
+    if show_progress:
+        print()
+
+    return scores, cells_with_assigned_stations, cells_with_nearest_stations
+
+def _score_cell_chunk(chunk):
+    """
+    Score one chunk of cells, given by their indices, inside a worker process.
+    """
+    state = _scoring_state
+    return score_grid_cells(
+        [state['grid_cells'][k] for k in chunk], state['station_data'], state['station_scores'], state['kdtree'],
+        state['grid_spacing_miles'], show_progress=False
+    )
+
+def _score_grid_cells_parallel(grid_cells, station_data, station_scores, kdtree, grid_spacing_miles, label, show_progress, workers):
+    """
+    Score the cells in a pool of forked worker processes, see score_grid_cells.
+    """
+    # Contiguous ranges along the Hilbert curve are compact patches of the map. A few chunks
+    # per worker keeps the pool busy when some patches have more stations than others.
+    order = cell_order(grid_cells)
+    n_chunks = min(len(grid_cells), workers * 4)
+    chunk_edges = np.linspace(0, len(grid_cells), n_chunks + 1).astype(int)
+    chunks = [order[start:stop] for start, stop in zip(chunk_edges[:-1], chunk_edges[1:])]
+
+    _scoring_state.update(
+        grid_cells=grid_cells,
+        station_data=station_data,
+        station_scores=station_scores,
+        kdtree=kdtree,
+        grid_spacing_miles=grid_spacing_miles,
+    )
+
+    scores = [None] * len(grid_cells)
+    cells_with_assigned_stations = 0
+    cells_with_nearest_stations = 0
+    done = 0
+
+    try:
+        # Fork so the workers inherit _scoring_state instead of receiving it with every task
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            # map() yields results in submission order, so each chunk's scores go back to its cells
+            for chunk, (chunk_scores, assigned, nearest) in zip(chunks, executor.map(_score_cell_chunk, chunks)):
+                for k, score in zip(chunk, chunk_scores):
+                    scores[k] = score
+                cells_with_assigned_stations += assigned
+                cells_with_nearest_stations += nearest
+                done += len(chunk)
+                if show_progress:
+                    print(f"\rCalculating {label} scores: {done}/{len(grid_cells)} cells", end='')
+    finally:
+        _scoring_state.clear()
+
+    if show_progress:
+        print()
+
+    return scores, cells_with_assigned_stations, cells_with_nearest_stations
+
+def prepare_station_scoring(stations, metric):
+    """
+    Score each station once and load the KD-tree used to assign them to cells, which is only
+    built when no tree was stored for these station points. The points are the station
+    cache's stored x/y in its Hilbert order, so the tree is the one the other station cache
+    callers (point queries, batch jobs) use as well.
+
+    Args:
+        stations (dict): Station cache arrays from load_metric_stations
+        metric (str): One of the keys of METRICS
+
+    Returns:
+        tuple: (station_data, station_scores, kdtree), kdtree is None if there are no stations
+    """
+    if not len(stations['station_ids']):
+        return [], [], None
+
+    station_data = [
+        (station_id, None, point)
+        for station_id, point in zip(stations['station_ids'].tolist(), zip(stations['x'].tolist(), stations['y'].tolist()))
+    ]
+    points = np.column_stack([stations['x'], stations['y']])
+    return station_data, score_stations(metric, stations).tolist(), load_kdtree(points, f'cache_stations_{metric}')
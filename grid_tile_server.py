@@ -0,0 +1,236 @@
+import io
+import json
+import numpy as np
+import shapely
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from matplotlib.colors import to_rgba
+from matplotlib.image import imsave
+from map_grid import load_projected_states, grid_coordinates, load_grid_cells
+from grid_scoring import METRICS, project_coordinates
+from map_grid_render import score_colors
+from score_cache import get_grid_scores, score_cache_key
+
+TILE_SIZE = 256
+
+def load_grid_layer(metric, grid_spacing_miles, us_boundary, workers=1):
+    """
+    Lay the cached per-cell scores of a metric out as (columns, rows) rasters over the grid, so
+    any point can be looked up with a division instead of a geometry search.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (int): Grid spacing in miles
+        us_boundary: Geometry of the continental US
+        workers (int): Number of worker processes used if the scores aren't cached yet
+
+    Returns:
+        dict: The layer's grid origin and spacing in meters, the 'scores' raster (NaN outside
+              the US), the 'colors' raster (RGBA, transparent outside the US), the clipped
+              geometries of cells on the US boundary, the color scale range and an 'etag'
+              that changes whenever the scores do
+    """
+    x_grid, y_grid = grid_coordinates(us_boundary.bounds, grid_spacing_miles)
+    grid_cells, cell_indices = load_grid_cells(us_boundary, grid_spacing_miles)
+    scores, _, _ = get_grid_scores(metric, grid_spacing_miles, grid_cells, workers)
+
+    low, high = METRICS[metric]['percentiles']
+    min_score, max_score = np.percentile(scores, low), np.percentile(scores, high)
+
+    shape = (len(x_grid) - 1, len(y_grid) - 1)
+    spacing = x_grid[1] - x_grid[0]
+    layer = {
+        'metric': metric,
+        'grid_spacing_miles': grid_spacing_miles,
+        'origin': (x_grid[0], y_grid[0]),
+        'spacing': spacing,
+        'scores': np.full(shape, np.nan),
+        'colors': np.zeros(shape + (4,), dtype=np.uint8),
+        # Cells that are clipped by the US boundary, pixels inside them still need a containment check
+        'clipped': np.zeros(shape, dtype=bool),
+        'clipped_cells': np.full(shape, None, dtype=object),
+        'min_score': float(min_score),
+        'max_score': float(max_score),
+        # Changes with the station data and scoring code, like the score cache
+        'etag': f'{metric}-{grid_spacing_miles}-{score_cache_key(metric)}',
+    }
+
+    i, j = np.array(cell_indices).T
+    layer['scores'][i, j] = scores
+    # Same colors and transparency as the PNG maps
+    layer['colors'][i, j] = [
+        np.round(np.array(to_rgba(color, alpha=0.7)) * 255)
+        for color in score_colors(metric, scores, min_score, max_score)
+    ]
+    for cell, ci, cj in zip(grid_cells, i, j):
+        if cell.area < spacing * spacing * (1 - 1e-9):
+            layer['clipped'][ci, cj] = True
+            layer['clipped_cells'][ci, cj] = cell
+
+    return layer
+
+def _cell_lookup(layer, x, y):
+    """
+    Grid index of the cell holding each projected point, and whether the point is in a cell.
+    """
+    i = np.floor((x - layer['origin'][0]) / layer['spacing']).astype(int)
+    j = np.floor((y - layer['origin'][1]) / layer['spacing']).astype(int)
+    n_columns, n_rows = layer['scores'].shape
+    inside = (i >= 0) & (i < n_columns) & (j >= 0) & (j < n_rows)
+    i, j = np.where(inside, i, 0), np.where(inside, j, 0)
+    inside &= ~np.isnan(layer['scores'][i, j])
+
+    # Points in the square of a cell clipped by the boundary must also be in its clipped shape
+    clipped = inside & layer['clipped'][i, j]
+    if np.any(clipped):
+        inside[clipped] = shapely.contains_xy(layer['clipped_cells'][i[clipped], j[clipped]], x[clipped], y[clipped])
+
+    return i, j, inside
+
+def layer_score_at(layer, latitude, longitude):
+    """
+    Score of the grid cell containing a location, or None outside the grid.
+    """
+    x, y = project_coordinates([float(longitude)], [float(latitude)])
+    i, j, inside = _cell_lookup(layer, np.asarray(x), np.asarray(y))
+    return float(layer['scores'][i[0], j[0]]) if inside[0] else None
+
+def render_tile(layer, z, x, y):
+    """
+    Render one XYZ (Web Mercator) map tile of the layer as a PNG by looking up the cell under
+    the center of each pixel.
+
+    Returns:
+        bytes: The PNG image
+    """
+    n = 2 ** z
+    pixel = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    longitude = (x + pixel) / n * 360 - 180
+    latitude = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / n))))
+    longitude, latitude = np.meshgrid(longitude, latitude)
+
+    px, py = project_coordinates(longitude.ravel(), latitude.ravel())
+    i, j, inside = _cell_lookup(layer, np.asarray(px), np.asarray(py))
+
+    image = np.zeros((TILE_SIZE * TILE_SIZE, 4), dtype=np.uint8)
+    image[inside] = layer['colors'][i[inside], j[inside]]
+
+    buffer = io.BytesIO()
+    imsave(buffer, image.reshape(TILE_SIZE, TILE_SIZE, 4), format='png')
+    return buffer.getvalue()
+
+def create_tile_server(layers, host='127.0.0.1', port=8000, tile_cache_size=4096):
+    """
+    Create an HTTP server for the layers. Routes:
+        /layers                               metrics, spacings and color scale ranges
+        /{metric}/score?lat=..&lon=..         score of the grid cell containing a location
+        /{metric}/scores                      every cell's (i, j) index and score, with the grid origin
+        /{metric}/{z}/{x}/{y}.png             XYZ map tile
+
+    Responses carry an ETag derived from the cached scores and honor If-None-Match, and
+    rendered tiles are kept in an in-memory LRU cache.
+
+    Args:
+        layers (dict): Layers from load_grid_layer keyed by metric
+        tile_cache_size (int): Number of rendered tiles kept in memory
+
+    Returns:
+        ThreadingHTTPServer: The server, call serve_forever() to start it
+    """
+    @lru_cache(maxsize=tile_cache_size)
+    def cached_tile(metric, z, x, y):
+        return render_tile(layers[metric], z, x, y)
+
+    class TileRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+
+            if parts == ['layers']:
+                body = {
+                    metric: {key: layer[key] for key in ('grid_spacing_miles', 'min_score', 'max_score', 'etag')}
+                    for metric, layer in layers.items()
+                }
+                return self._send(json.dumps(body).encode(), 'application/json')
+
+            layer = layers.get(parts[0])
+            if layer is None:
+                return self.send_error(404, "Unknown layer")
+
+            if parts[1:] == ['score']:
+                query = parse_qs(url.query)
+                try:
+                    score = layer_score_at(layer, query['lat'][0], query['lon'][0])
+                except (KeyError, ValueError):
+                    return self.send_error(400, "Expected lat and lon parameters")
+                body = {'metric': layer['metric'], 'score': score}
+                return self._send(json.dumps(body).encode(), 'application/json', layer['etag'] + f"-{query['lat'][0]}-{query['lon'][0]}")
+
+            if parts[1:] == ['scores']:
+                i, j = np.nonzero(~np.isnan(layer['scores']))
+                body = {
+                    'metric': layer['metric'],
+                    'origin': layer['origin'],
+                    'spacing': layer['spacing'],
+                    'crs': 'EPSG:5070',
+                    'cells': [[int(ci), int(cj), float(layer['scores'][ci, cj])] for ci, cj in zip(i, j)],
+                }
+                return self._send(json.dumps(body).encode(), 'application/json', layer['etag'] + '-scores')
+
+            if len(parts) == 4 and parts[3].endswith('.png'):
+                try:
+                    z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+                except ValueError:
+                    return self.send_error(400, "Expected /{metric}/{z}/{x}/{y}.png")
+                if not (0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                    return self.send_error(404, "Tile out of range")
+                etag = f"{layer['etag']}-{z}-{x}-{y}"
+                if self._not_modified(etag):
+                    return
+                return self._send(cached_tile(parts[0], z, x, y), 'image/png', etag)
+
+            return self.send_error(404)
+
+        def _not_modified(self, etag):
+            if self.headers.get('If-None-Match') == f'"{etag}"':
+                self.send_response(304)
+                self.send_header('ETag', f'"{etag}"')
+                self.end_headers()
+                return True
+            return False
+
+        def _send(self, body, content_type, etag=None):
+            if etag and self._not_modified(etag):
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if etag:
+                self.send_header('ETag', f'"{etag}"')
+                self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ThreadingHTTPServer((host, port), TileRequestHandler)
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Serve cached grid scores as JSON and XYZ map tiles.")
+    parser.add_argument('--metrics', nargs='+', choices=list(METRICS), default=list(METRICS))
+    parser.add_argument('--spacing', type=int, default=20, help="Grid spacing in miles")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--tile-cache-size', type=int, default=4096, help="Number of rendered tiles kept in memory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes used if scores aren't cached yet")
+    args = parser.parse_args()
+
+    _, us_boundary = load_projected_states()
+    layers = {metric: load_grid_layer(metric, args.spacing, us_boundary, args.workers) for metric in args.metrics}
+
+    server = create_tile_server(layers, args.host, args.port, args.tile_cache_size)
+    print(f"Serving {', '.join(layers)} tiles at http://{args.host}:{args.port}/{{metric}}/{{z}}/{{x}}/{{y}}.png")
+    server.serve_forever()
@@ -2,17 +2,19 @@ from load_stations_zipcodes import load_stations_zipcodes
 from load_stations_daily_temp import load_stations_daily_temp
 from load_stations_monthly_precip import load_stations_monthly_precip
 
-def load_stations():
+def load_stations(zipcodes_file=None, daily_tmax_file=None, monthly_precip_dir=None, monthly_precip_archive=None):
     """
     Load stations from zipcode, temperature, and precipitation data sources and combine them.
+    Each source defaults to the 1981-2010 file its loader reads, see normals_periods for
+    the paths of the other normals periods.
     
     Returns:
         dict: Dictionary mapping station IDs to Station objects with combined data
     """
     # Load stations from all data sources
-    zipcode_stations = load_stations_zipcodes()
-    temp_stations = load_stations_daily_temp()
-    precip_stations = load_stations_monthly_precip()
+    zipcode_stations = load_stations_zipcodes(zipcodes_file)
+    temp_stations = load_stations_daily_temp(daily_tmax_file)
+    precip_stations = load_stations_monthly_precip(monthly_precip_dir, monthly_precip_archive)
     
     # Start with all zipcode stations
     combined_stations = zipcode_stations.copy()
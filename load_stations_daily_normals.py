@@ -0,0 +1,255 @@
+import csv
+import multiprocessing
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from score_cache import source_fingerprint
+
+DAILY_NORMALS_DIR = 'noaa/normals-daily/'
+
+# Header of every CSV in the directory, see load_column_catalog
+DAILY_NORMALS_CATALOG = 'computed/normals_daily_catalog.npz'
+
+# One file per loaded variable, see load_daily_normals
+DAILY_NORMALS_STORE_DIR = 'computed/normals_daily'
+
+# Bump when the layout of the catalog or the variable files changes so old files are rebuilt
+DAILY_NORMALS_VERSION = 1
+
+# NOAA flags stored in place of a value. -7777 marks a value too small to show, which counts as 0.
+MISSING_VALUES = {-9999.0, -8888.0, -6666.0, -5555.0}
+TRACE_VALUE = -7777.0
+
+# Columns describing the station rather than a variable
+STATION_COLUMNS = ['STATION', 'DATE', 'LATITUDE', 'LONGITUDE', 'ELEVATION', 'NAME']
+
+def _station_files():
+    """
+    Station IDs and paths of the directory's CSV files, sorted by station ID.
+    """
+    filenames = sorted(filename for filename in os.listdir(DAILY_NORMALS_DIR) if filename.endswith('.csv'))
+    return [(os.path.splitext(filename)[0], os.path.join(DAILY_NORMALS_DIR, filename)) for filename in filenames]
+
+def _chunks(items, workers):
+    """
+    Split the items into a few contiguous chunks per worker.
+    """
+    n_chunks = max(1, min(len(items), workers * 4))
+    edges = np.linspace(0, len(items), n_chunks + 1).astype(int)
+    return [items[start:stop] for start, stop in zip(edges[:-1], edges[1:])]
+
+def _map_chunks(function, items, workers):
+    """
+    Apply function to chunks of the items, in a pool of worker processes if workers > 1.
+    """
+    chunks = _chunks(items, workers)
+    if workers <= 1:
+        return [function(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        return list(executor.map(function, chunks))
+
+def _read_headers(files):
+    """
+    Read the header line of each file.
+    """
+    headers = []
+    for _, file_path in files:
+        with open(file_path, 'r', newline='') as csvfile:
+            headers.append(next(csv.reader(csvfile), []))
+    return headers
+
+def build_column_catalog(workers=1):
+    """
+    Read only the header of every normals-daily CSV and record which columns each station has.
+
+    Returns:
+        dict: 'station_ids' sorted, every distinct 'columns' name sorted, and 'has_column',
+              a (stations, columns) bool array
+    """
+    files = _station_files()
+    headers = [header for chunk in _map_chunks(_read_headers, files, workers) for header in chunk]
+
+    columns = sorted({column for header in headers for column in header})
+    column_index = {column: k for k, column in enumerate(columns)}
+    has_column = np.zeros((len(files), len(columns)), dtype=bool)
+    for row, header in enumerate(headers):
+        has_column[row, [column_index[column] for column in header]] = True
+
+    return {
+        'station_ids': np.array([station_id for station_id, _ in files], dtype=str),
+        'columns': np.array(columns, dtype=str),
+        'has_column': has_column,
+    }
+
+def load_column_catalog(force_recalculate=False, workers=1):
+    """
+    Load the column catalog from computed/, building it first if it is missing or the
+    directory has changed since it was built.
+    """
+    source_key = f"{DAILY_NORMALS_VERSION}:{source_fingerprint([DAILY_NORMALS_DIR])}"
+
+    if not force_recalculate and os.path.exists(DAILY_NORMALS_CATALOG):
+        with np.load(DAILY_NORMALS_CATALOG) as cached:
+            if str(cached['source_key']) == source_key:
+                return {name: cached[name] for name in cached.files if name != 'source_key'}
+
+    print(f"Scanning the headers in {DAILY_NORMALS_DIR}...")
+    catalog = build_column_catalog(workers)
+    os.makedirs(os.path.dirname(DAILY_NORMALS_CATALOG), exist_ok=True)
+    np.savez(DAILY_NORMALS_CATALOG, source_key=source_key, **catalog)
+    return catalog
+
+def catalog_stations(catalog, variable):
+    """
+    IDs of the stations whose files have the variable's column.
+    """
+    matches = np.flatnonzero(catalog['columns'] == variable)
+    if not len(matches):
+        return catalog['station_ids'][:0]
+    return catalog['station_ids'][catalog['has_column'][:, matches[0]]]
+
+def _parse_value(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return np.nan
+    if value in MISSING_VALUES:
+        return np.nan
+    return 0.0 if value == TRACE_VALUE else value
+
+def parse_daily_normals_csv(lines, variables):
+    """
+    Parse the requested variables out of one station's normals-daily CSV. The DATE column
+    holds the month and day as MM-DD.
+
+    Args:
+        lines: The CSV's lines, e.g. an open file
+        variables (list): Column names, e.g. ['DLY-TMIN-NORMAL', 'DLY-SNOW-PCTALL-GE001TI']
+
+    Returns:
+        tuple: (latitude, longitude, values) where values is a (variables, 12, 31) float32
+               array with NaN for missing days and variables the station doesn't have
+    """
+    values = np.full((len(variables), 12, 31), np.nan, dtype=np.float32)
+    latitude = longitude = np.nan
+
+    reader = csv.reader(lines)
+    header = next(reader, [])
+    positions = {column: k for k, column in enumerate(header)}
+    wanted = [(v, positions[variable]) for v, variable in enumerate(variables) if variable in positions]
+    date_column = positions.get('DATE')
+    if date_column is None:
+        return latitude, longitude, values
+
+    for row in reader:
+        try:
+            month, day = (int(part) - 1 for part in row[date_column].split('-')[-2:])
+        except (ValueError, IndexError):
+            continue
+        if not (0 <= month < 12 and 0 <= day < 31):
+            continue
+        for v, column in wanted:
+            if column < len(row):
+                values[v, month, day] = _parse_value(row[column])
+        if np.isnan(latitude) and 'LATITUDE' in positions and 'LONGITUDE' in positions:
+            latitude = _parse_value(row[positions['LATITUDE']])
+            longitude = _parse_value(row[positions['LONGITUDE']])
+
+    return latitude, longitude, values
+
+def _parse_files(files, variables):
+    """
+    Parse the requested variables out of a chunk of files inside a worker process.
+    """
+    latitude = np.full(len(files), np.nan)
+    longitude = np.full(len(files), np.nan)
+    values = np.full((len(files), len(variables), 12, 31), np.nan, dtype=np.float32)
+
+    for k, (_, file_path) in enumerate(files):
+        with open(file_path, 'r', newline='') as csvfile:
+            latitude[k], longitude[k], values[k] = parse_daily_normals_csv(csvfile, variables)
+
+    return latitude, longitude, values
+
+def _store_file(variable):
+    return os.path.join(DAILY_NORMALS_STORE_DIR, f'{variable}.npz')
+
+def load_daily_normals(variables, workers=None, force_recalculate=False):
+    """
+    Load daily normals variables for every station that has them, as arrays laid out like
+    the station cache's daily_max, so they can be scored the same way (for example
+    batch_temperature_scores on DLY-TMIN-NORMAL).
+
+    Only the files listed in the column catalog as having one of the variables are read, and
+    each file is parsed once for all of the variables that aren't stored in computed/ yet,
+    in a pool of worker processes. Every variable is then stored on its own, so loading a
+    new variable later doesn't parse the ones already stored again.
+
+    Args:
+        variables (list): Column names, e.g. ['DLY-TMIN-NORMAL']
+        workers (int): Number of worker processes, defaults to the number of CPUs
+        force_recalculate (bool): If True, parse every variable again
+
+    Returns:
+        dict: For each variable, 'station_ids' sorted, 'latitude', 'longitude' and
+              'values' as a (stations, 12, 31) float32 array with NaN for missing days
+    """
+    workers = workers or os.cpu_count()
+    catalog = load_column_catalog(workers=workers)
+    source_key = f"{DAILY_NORMALS_VERSION}:{source_fingerprint([DAILY_NORMALS_DIR])}"
+
+    unknown = [variable for variable in variables if variable not in catalog['columns']]
+    if unknown:
+        raise ValueError(f"No normals-daily files have the columns {unknown}")
+
+    store = {}
+    for variable in variables:
+        if not force_recalculate and os.path.exists(_store_file(variable)):
+            with np.load(_store_file(variable)) as stored:
+                if str(stored['source_key']) == source_key:
+                    store[variable] = {name: stored[name] for name in stored.files if name != 'source_key'}
+
+    missing = [variable for variable in variables if variable not in store]
+    if missing:
+        station_ids = np.unique(np.concatenate([catalog_stations(catalog, variable) for variable in missing]))
+        files = [(station_id, os.path.join(DAILY_NORMALS_DIR, f'{station_id}.csv')) for station_id in station_ids]
+        print(f"Parsing {', '.join(missing)} from {len(files)} files with {workers} worker(s)...")
+
+        results = _map_chunks(partial(_parse_files, variables=missing), files, workers)
+
+        latitude = np.concatenate([result[0] for result in results])
+        longitude = np.concatenate([result[1] for result in results])
+        values = np.concatenate([result[2] for result in results])
+
+        os.makedirs(DAILY_NORMALS_STORE_DIR, exist_ok=True)
+        for v, variable in enumerate(missing):
+            has_variable = np.isin(station_ids, catalog_stations(catalog, variable))
+            store[variable] = {
+                'station_ids': station_ids[has_variable],
+                'latitude': latitude[has_variable],
+                'longitude': longitude[has_variable],
+                'values': values[has_variable, v],
+            }
+            np.savez(_store_file(variable), source_key=source_key, **store[variable])
+
+    return {variable: store[variable] for variable in variables}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Catalog the normals-daily columns and load selected variables.")
+    parser.add_argument('variables', nargs='*', help="Columns to load, e.g. DLY-TMIN-NORMAL")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--force-recalc', action='store_true')
+    args = parser.parse_args()
+
+    catalog = load_column_catalog(workers=args.workers)
+    if not args.variables:
+        counts = catalog['has_column'].sum(axis=0)
+        for column, count in zip(catalog['columns'], counts):
+            if column not in STATION_COLUMNS and not column.endswith('_ATTRIBUTES'):
+                print(f"{column}: {count} stations")
+    else:
+        for variable, data in load_daily_normals(args.variables, args.workers, args.force_recalc).items():
+            print(f"{variable}: {len(data['station_ids'])} stations")
@@ -2,58 +2,105 @@ from station import Station
 
 DAILY_TMAX_NORMAL_FILE = 'noaa/dly-tmax-normal.txt'
 
-def load_stations_daily_temp():
+def parse_daily_temp_lines(lines):
     """
-    Load daily maximum temperature data from the dly-tmax-normal.txt file.
+    Parse lines of the dly-tmax-normal.txt file, which holds one line per station and month
+    sorted by station, into stations. Each station is yielded as soon as the first line of the
+    next station is read.
     
-    Returns:
-        dict: Dictionary mapping station IDs to Station objects with temperature data
+    Args:
+        lines: Lines of the file, e.g. the open file or part of it
+        
+    Yields:
+        Station: Station objects with temperature data
     """
-    stations = {}
+    station = None
     
-    try:
-        with open(DAILY_TMAX_NORMAL_FILE, 'r') as file:
-            for line in file:
-                # Skip empty lines
-                if not line.strip():
-                    continue
+    for line in lines:
+        # Skip empty lines
+        if not line.strip():
+            continue
+        
+        # Parse the line
+        parts = line.strip().split()
+        if len(parts) >= 33:  # Station ID, month, and 31 days of data
+            station_id = parts[0]
+            month = int(parts[1]) - 1  # Convert to 0-based index (0-11)
+            
+            # Start a new Station object when the next station's lines begin
+            if station is None or station.station_id != station_id:
+                if station is not None:
+                    yield station
+                station = Station()
+                station.station_id = station_id
+                # Initialize temperature data structure (12 months, 31 days each)
+                station.avg_daily_max_temperature = [[None for _ in range(31)] for _ in range(12)]
+            
+            # Process temperature data for each day of the month
+            for day in range(31):
+                temp_str = parts[day + 2]  # +2 because parts[0] is station_id and parts[1] is month
                 
-                # Parse the line
-                parts = line.strip().split()
-                if len(parts) >= 33:  # Station ID, month, and 31 days of data
-                    station_id = parts[0]
-                    month = int(parts[1]) - 1  # Convert to 0-based index (0-11)
-                    
-                    # Create a new Station object if we haven't seen this station before
-                    if station_id not in stations:
-                        station = Station()
-                        station.station_id = station_id
-                        # Initialize temperature data structure (12 months, 31 days each)
-                        station.avg_daily_max_temperature = [[None for _ in range(31)] for _ in range(12)]
-                        stations[station_id] = station
-                    
-                    # Process temperature data for each day of the month
-                    for day in range(31):
-                        temp_str = parts[day + 2]  # +2 because parts[0] is station_id and parts[1] is month
-                        
-                        # Check if it's a special value (-8888)
-                        if temp_str.startswith('-8888'):
-                            stations[station_id].avg_daily_max_temperature[month][day] = None
-                        else:
-                            # Extract the numeric part (ignoring the flag character)
-                            numeric_part = temp_str.rstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
-                            try:
-                                # Convert to float and divide by 10 (data is in tenths of degrees)
-                                temp_value = float(numeric_part) / 10.0
-                                stations[station_id].avg_daily_max_temperature[month][day] = temp_value
-                            except ValueError:
-                                # If conversion fails, store None
-                                stations[station_id].avg_daily_max_temperature[month][day] = None
+                # Check if it's a special value (-8888)
+                if temp_str.startswith('-8888'):
+                    station.avg_daily_max_temperature[month][day] = None
+                else:
+                    # Extract the numeric part (ignoring the flag character)
+                    numeric_part = temp_str.rstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                    try:
+                        # Convert to float and divide by 10 (data is in tenths of degrees)
+                        temp_value = float(numeric_part) / 10.0
+                        station.avg_daily_max_temperature[month][day] = temp_value
+                    except ValueError:
+                        # If conversion fails, store None
+                        station.avg_daily_max_temperature[month][day] = None
+    
+    # The last station
+    if station is not None:
+        yield station
+
+def iter_stations_daily_temp(path=None):
+    """
+    Yield stations with daily maximum temperature data from the dly-tmax-normal.txt file
+    as they are parsed, see parse_daily_temp_lines.
+    
+    Args:
+        path (str): File to read, DAILY_TMAX_NORMAL_FILE if not given
+    
+    Yields:
+        Station: Station objects with temperature data
+    """
+    path = path or DAILY_TMAX_NORMAL_FILE
+    try:
+        with open(path, 'r') as file:
+            yield from parse_daily_temp_lines(file)
     
     except FileNotFoundError:
-        print(f"Error: File '{DAILY_TMAX_NORMAL_FILE}' not found.")
+        print(f"Error: File '{path}' not found.")
     except Exception as e:
         print(f"Error reading file: {e}")
+
+def load_stations_daily_temp(path=None):
+    """
+    Load daily maximum temperature data from the dly-tmax-normal.txt file.
+    
+    Args:
+        path (str): File to read, DAILY_TMAX_NORMAL_FILE if not given
+    
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects with temperature data
+    """
+    stations = {}
+    
+    for station in iter_stations_daily_temp(path):
+        existing = stations.get(station.station_id)
+        if existing is None:
+            stations[station.station_id] = station
+            continue
+        
+        # A station whose lines aren't contiguous in the file is yielded more than once, combine the months
+        for month, month_data in enumerate(station.avg_daily_max_temperature):
+            if any(temp is not None for temp in month_data):
+                existing.avg_daily_max_temperature[month] = month_data
     
     return stations
 
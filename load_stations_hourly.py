@@ -0,0 +1,255 @@
+import json
+import numpy as np
+import os
+from station import Station
+from scoring_profiles import MONTH_DAYS, daily_temperature_scores
+from score_cache import source_fingerprint
+
+# Hourly normals, one line per station and day with 24 values in tenths of °F
+HOURLY_NORMAL_FILES = {
+    'temp': 'noaa/hly-temp-normal.txt',
+    'hidx': 'noaa/hly-hidx-normal.txt',
+    'wchl': 'noaa/hly-wchl-normal.txt',
+    'dewp': 'noaa/hly-dewp-normal.txt',
+}
+
+# One (stations, 366, 24) array per variable, see load_hourly_normals
+HOURLY_STORE_DIR = 'computed/hourly'
+
+# Bump when the layout of the stored arrays changes so old files are rebuilt
+HOURLY_STORE_VERSION = 1
+
+# Air temperatures (°F) the heat index and wind chill apply to
+HEAT_INDEX_MIN_TEMP = 80
+WIND_CHILL_MAX_TEMP = 50
+
+# Index of the first day of each month in the 366-day year
+MONTH_STARTS = np.concatenate([[0], np.cumsum(MONTH_DAYS)[:-1]])
+
+def parse_hourly_line(line):
+    """
+    Parse one line of an hourly normals file: station ID, month, day and 24 hourly values,
+    each in tenths of °F followed by a flag letter.
+
+    Returns:
+        tuple: (station_id, day_of_year, values) with values as 24 floats in °F, NaN for
+               missing hours, or None if the line can't be parsed
+    """
+    parts = line.split()
+    if len(parts) < 27:
+        return None
+
+    try:
+        month, day = int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+    if not (1 <= month <= 12 and 1 <= day <= MONTH_DAYS[month - 1]):
+        return None
+
+    values = np.full(24, np.nan, dtype=np.float32)
+    for hour, text in enumerate(parts[3:27]):
+        numeric_part = text.rstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+        # -9999 and -8888 mark missing or uncomputed hours
+        if numeric_part in ('-9999', '-8888'):
+            continue
+        try:
+            values[hour] = float(numeric_part) / 10.0
+        except ValueError:
+            continue
+
+    return parts[0], MONTH_STARTS[month - 1] + day - 1, values
+
+def _store_paths(variable):
+    return (
+        os.path.join(HOURLY_STORE_DIR, f'{variable}.npy'),
+        os.path.join(HOURLY_STORE_DIR, f'{variable}.json'),
+    )
+
+def build_hourly_store(variable, dtype=np.float16):
+    """
+    Stream an hourly normals file into a (stations, 366, 24) array on disk. The file is read
+    twice, once for the station IDs and once for the values, and the values are written
+    straight into a memory-mapped .npy file, so memory use doesn't grow with the file.
+
+    float16 keeps temperatures to better than a tenth of a degree up to 128°F, at half the
+    size of float32.
+
+    Returns:
+        int: Number of stations written
+    """
+    source_path = HOURLY_NORMAL_FILES[variable]
+    array_path, index_path = _store_paths(variable)
+
+    with open(source_path, 'r') as file:
+        station_ids = sorted({line.split(None, 1)[0] for line in file if line.strip()})
+    rows = {station_id: row for row, station_id in enumerate(station_ids)}
+
+    os.makedirs(HOURLY_STORE_DIR, exist_ok=True)
+    values = np.lib.format.open_memmap(array_path, mode='w+', dtype=dtype, shape=(len(station_ids), 366, 24))
+    values[:] = np.nan
+
+    with open(source_path, 'r') as file:
+        for line in file:
+            parsed = parse_hourly_line(line)
+            if parsed is not None:
+                station_id, day, hours = parsed
+                values[rows[station_id], day] = hours
+
+    values.flush()
+    del values
+
+    with open(index_path, 'w') as f:
+        json.dump({'source_key': _source_key(variable), 'dtype': np.dtype(dtype).name, 'station_ids': station_ids}, f)
+
+    return len(station_ids)
+
+def _source_key(variable):
+    return f"{HOURLY_STORE_VERSION}:{source_fingerprint([HOURLY_NORMAL_FILES[variable]])}"
+
+def load_hourly_normals(variable, dtype=np.float16, force_recalculate=False):
+    """
+    Open the stored hourly normals of a variable as a read-only memory map, building the
+    store first if it is missing, was built from different data or with another dtype.
+
+    Args:
+        variable (str): One of the keys of HOURLY_NORMAL_FILES
+        dtype: float16 or float32
+        force_recalculate (bool): If True, rebuild the store
+
+    Returns:
+        tuple: (station_ids, values) with the sorted station IDs and a (stations, 366, 24)
+               memory-mapped array, NaN for missing hours
+    """
+    array_path, index_path = _store_paths(variable)
+
+    index = None
+    if not force_recalculate and os.path.exists(index_path) and os.path.exists(array_path):
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if index['source_key'] != _source_key(variable) or index['dtype'] != np.dtype(dtype).name:
+            index = None
+
+    if index is None:
+        print(f"Building hourly {variable} store from {HOURLY_NORMAL_FILES[variable]}...")
+        build_hourly_store(variable, dtype)
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+
+    return np.array(index['station_ids'], dtype=str), np.load(array_path, mmap_mode='r')
+
+def feels_like_temperatures(temp, hidx=None, wchl=None):
+    """
+    Pick the temperature that describes each hour best: the heat index for hours of at least
+    HEAT_INDEX_MIN_TEMP and the wind chill for hours of at most WIND_CHILL_MAX_TEMP, the
+    ranges the National Weather Service defines them for, falling back to the air
+    temperature where those are missing.
+    """
+    temp = np.asarray(temp, dtype=np.float32)
+    feels_like = temp.copy()
+    if hidx is not None:
+        hot = (temp >= HEAT_INDEX_MIN_TEMP) & ~np.isnan(hidx)
+        feels_like[hot] = np.asarray(hidx)[hot]
+    if wchl is not None:
+        cold = (temp <= WIND_CHILL_MAX_TEMP) & ~np.isnan(wchl)
+        feels_like[cold] = np.asarray(wchl)[cold]
+    return feels_like
+
+def _aligned_rows(station_ids, other_ids):
+    """
+    Row of each station in another sorted list of station IDs, -1 where it's missing.
+    """
+    rows = np.searchsorted(other_ids, station_ids)
+    rows = np.minimum(rows, max(len(other_ids) - 1, 0))
+    found = len(other_ids) > 0 and (other_ids[rows] == station_ids)
+    return np.where(found, rows, -1)
+
+def _aligned_chunk(values, rows):
+    chunk = np.full((len(rows), 366, 24), np.nan, dtype=np.float32)
+    present = rows >= 0
+    chunk[present] = values[rows[present]]
+    return chunk
+
+def feels_like_scores(profiles, chunk_size=512, dtype=np.float16):
+    """
+    Score every station with hourly temperature normals for every profile from its hourly
+    feels-like temperatures, matching Station.get_feels_like_score. Stations are processed
+    chunk_size at a time from the memory-mapped stores, so memory use stays bounded.
+
+    Returns:
+        tuple: (station_ids, scores) with a (profiles, stations) scores array
+    """
+    station_ids, temp = load_hourly_normals('temp', dtype)
+    hidx_ids, hidx = load_hourly_normals('hidx', dtype) if os.path.exists(HOURLY_NORMAL_FILES['hidx']) else ([], None)
+    wchl_ids, wchl = load_hourly_normals('wchl', dtype) if os.path.exists(HOURLY_NORMAL_FILES['wchl']) else ([], None)
+    hidx_rows = _aligned_rows(station_ids, np.asarray(hidx_ids, dtype=str))
+    wchl_rows = _aligned_rows(station_ids, np.asarray(wchl_ids, dtype=str))
+
+    scores = np.zeros((len(profiles), len(station_ids)))
+    for start in range(0, len(station_ids), chunk_size):
+        stop = start + chunk_size
+        temp_chunk = np.asarray(temp[start:stop], dtype=np.float32)
+        hidx_chunk = _aligned_chunk(hidx, hidx_rows[start:stop]) if hidx is not None else None
+        wchl_chunk = _aligned_chunk(wchl, wchl_rows[start:stop]) if wchl is not None else None
+        feels_like = feels_like_temperatures(temp_chunk, hidx_chunk, wchl_chunk).astype(np.float64)
+        valid_hours = np.count_nonzero(~np.isnan(feels_like), axis=(1, 2))
+
+        for p, profile in enumerate(profiles):
+            hour_sums = np.nansum(daily_temperature_scores(profile, feels_like), axis=(1, 2))
+            scores[p, start:stop] = np.divide(hour_sums, valid_hours, out=np.zeros(len(hour_sums)), where=valid_hours > 0)
+
+    return station_ids, scores
+
+def load_stations_hourly(station_ids=None, dtype=np.float16):
+    """
+    Load the hourly feels-like temperatures of the given stations (all of them if not given)
+    onto Station objects, for use with Station.get_feels_like_score.
+
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects with hourly data
+    """
+    all_ids, temp = load_hourly_normals('temp', dtype)
+    if station_ids is None:
+        station_ids = all_ids
+    station_ids = np.asarray(sorted(station_ids), dtype=str)
+    rows = _aligned_rows(station_ids, all_ids)
+    station_ids = station_ids[rows >= 0]
+    rows = rows[rows >= 0]
+
+    extra = {}
+    for variable in ('hidx', 'wchl'):
+        if os.path.exists(HOURLY_NORMAL_FILES[variable]):
+            variable_ids, values = load_hourly_normals(variable, dtype)
+            extra[variable] = (values, _aligned_rows(station_ids, variable_ids))
+
+    stations = {}
+    for k, (station_id, row) in enumerate(zip(station_ids, rows)):
+        hourly = {
+            variable: np.asarray(values[variable_rows[k]], dtype=np.float32) if variable_rows[k] >= 0 else None
+            for variable, (values, variable_rows) in extra.items()
+        }
+        station = Station()
+        station.station_id = str(station_id)
+        station.avg_hourly_feels_like = feels_like_temperatures(temp[row], hourly.get('hidx'), hourly.get('wchl'))
+        stations[station.station_id] = station
+
+    return stations
+
+if __name__ == "__main__":
+    import argparse
+    from scoring_profiles import DEFAULT_PROFILE
+
+    parser = argparse.ArgumentParser(description="Build the hourly normals stores and score stations by feels-like temperature.")
+    parser.add_argument('--dtype', choices=['float16', 'float32'], default='float16')
+    parser.add_argument('--force-recalc', action='store_true')
+    args = parser.parse_args()
+
+    for variable, path in HOURLY_NORMAL_FILES.items():
+        if os.path.exists(path):
+            station_ids, values = load_hourly_normals(variable, np.dtype(args.dtype), args.force_recalc)
+            print(f"{variable}: {len(station_ids)} stations, {values.nbytes / 1e6:.1f} MB")
+
+    station_ids, scores = feels_like_scores([DEFAULT_PROFILE], dtype=np.dtype(args.dtype))
+    order = np.argsort(scores[0])[::-1][:10]
+    print("Most comfortable stations by feels-like temperature:")
+    for k in order:
+        print(f"  {station_ids[k]}: {scores[0, k]:.2f}")
@@ -1,89 +1,290 @@
+import asyncio
 import os
 import csv
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from station import Station
 
 MONTHLY_PRECIP_DIR = 'noaa/normals-monthly/'
 
+# All of the directory's stations packed into one file by pack_monthly_precip_archive()
+MONTHLY_PRECIP_ARCHIVE = 'noaa/normals-monthly.npz'
+
 # TODO would also like to count snowfall days at some point and count those as precipitation
 # TODO also might be better to use 0.1" cutoff for rainy days instead.
-def load_stations_monthly_precip():
+def parse_monthly_precip_csv(station_id, lines):
     """
-    Load monthly precipitation data from CSV files in the normals-monthly directory.
-    Each CSV file represents a station with the filename being the station ID.
+    Parse one station's normals-monthly CSV.
     
+    Args:
+        station_id (str): Station ID, the CSV's filename without the extension
+        lines: The CSV's lines, e.g. an open file or the file's text split into lines
+        
     Returns:
-        dict: Dictionary mapping station IDs to Station objects with precipitation data
+        Station: Station object with precipitation data, or None if the data is invalid
     """
-    stations = {}
+    # Create a new station object
+    station = Station()
+    station.station_id = station_id
+    
+    # Initialize precipitation data array (12 months)
+    # TODO should probably be None that way we can tell if it's unloaded vs actually zero
+    precip_data = [0] * 12
     
+    reader = csv.DictReader(lines)
+    
+    for row in reader:
+        # Get the month (1-based in the CSV, convert to 0-based for our array)
+        try:
+            month = int(row['DATE']) - 1  # DATE column contains the month number
+            
+            # Get the precipitation value
+            if 'MLY-PRCP-AVGNDS-GE050HI' in row:
+                precip_value = row['MLY-PRCP-AVGNDS-GE050HI']
+                
+                # Convert to float if it's a valid number
+                # TODO seems like some of these are -7777 (missing data)? In that case we should skip it as well, though it's not a big deal because later in Station.py there's a validation to make sure it's 0-31
+                if precip_value and precip_value != 'S' and precip_value != 'P':
+                    # The data is the sum over 30 years, so divide by 30 to get the average
+                    precip_data[month] = float(precip_value) / 30.0
+            
+            # Get latitude and longitude (only need to set once)
+            if month == 0:  # Only process for the first month to avoid redundancy
+                if 'LATITUDE' in row and not station.latitude:
+                    try:
+                        station.latitude = row['LATITUDE']
+                    except ValueError:
+                        # Skip invalid latitude
+                        pass
+                    
+                if 'LONGITUDE' in row and not station.longitude:
+                    try:
+                        station.longitude = row['LONGITUDE']
+                    except ValueError:
+                        # Skip invalid longitude
+                        pass
+        except (ValueError, IndexError):
+            # Skip rows with invalid data
+            continue
+    
+    # Set the precipitation data on the station. If any values are invalid or None this will throw exception, so just skip that station
+    try:
+        station.avg_rainy_days_per_month = precip_data
+    except ValueError:
+        return None
+    
+    return station
+
+def _iter_monthly_precip_dir(directory=None):
+    """
+    Yield stations parsed from the CSV files in the normals-monthly directory, one file at a time.
+    """
+    directory = directory or MONTHLY_PRECIP_DIR
     try:
         # Check if directory exists
-        if not os.path.isdir(MONTHLY_PRECIP_DIR):
-            print(f"Error: Directory '{MONTHLY_PRECIP_DIR}' not found.")
-            return stations
+        if not os.path.isdir(directory):
+            print(f"Error: Directory '{directory}' not found.")
+            return
         
         # Process each CSV file in the directory
-        for filename in os.listdir(MONTHLY_PRECIP_DIR):
+        for filename in os.listdir(directory):
             if not filename.endswith('.csv'):
                 continue
                 
             station_id = os.path.splitext(filename)[0]  # Remove .csv extension to get station ID
-            file_path = os.path.join(MONTHLY_PRECIP_DIR, filename)
-            
-            # Create a new station object
-            station = Station()
-            station.station_id = station_id
-            
-            # Initialize precipitation data array (12 months)
-            # TODO should probably be None that way we can tell if it's unloaded vs actually zero
-            precip_data = [0] * 12
+            file_path = os.path.join(directory, filename)
             
             # Read the CSV file
             with open(file_path, 'r') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    # Get the month (1-based in the CSV, convert to 0-based for our array)
-                    try:
-                        month = int(row['DATE']) - 1  # DATE column contains the month number
-                        
-                        # Get the precipitation value
-                        if 'MLY-PRCP-AVGNDS-GE050HI' in row:
-                            precip_value = row['MLY-PRCP-AVGNDS-GE050HI']
-                            
-                            # Convert to float if it's a valid number
-                            # TODO seems like some of these are -7777 (missing data)? In that case we should skip it as well, though it's not a big deal because later in Station.py there's a validation to make sure it's 0-31
-                            if precip_value and precip_value != 'S' and precip_value != 'P':
-                                # The data is the sum over 30 years, so divide by 30 to get the average
-                                precip_data[month] = float(precip_value) / 30.0
-                        
-                        # Get latitude and longitude (only need to set once)
-                        if month == 0:  # Only process for the first month to avoid redundancy
-                            if 'LATITUDE' in row and not station.latitude:
-                                try:
-                                    station.latitude = row['LATITUDE']
-                                except ValueError:
-                                    # Skip invalid latitude
-                                    pass
-                                
-                            if 'LONGITUDE' in row and not station.longitude:
-                                try:
-                                    station.longitude = row['LONGITUDE']
-                                except ValueError:
-                                    # Skip invalid longitude
-                                    pass
-                    except (ValueError, IndexError):
-                        # Skip rows with invalid data
-                        continue
+                station = parse_monthly_precip_csv(station_id, csvfile)
             
-            # Set the precipitation data on the station. If any values are invalid or None this will throw exception, so just skip that station
-            try:
-                station.avg_rainy_days_per_month = precip_data
-            except ValueError as e:
-                continue
+            if station is not None:
+                yield station
+    
+    except Exception as e:
+        print(f"Error loading precipitation data: {e}")
+
+def _iter_monthly_precip_archive(archive_path=None):
+    """
+    Yield stations from the archive written by pack_monthly_precip_archive().
+    """
+    with np.load(archive_path or MONTHLY_PRECIP_ARCHIVE) as archive:
+        station_ids = archive['station_ids']
+        rainy_days = archive['rainy_days']
+        latitude = archive['latitude']
+        longitude = archive['longitude']
+    
+    for k, station_id in enumerate(station_ids):
+        station = Station()
+        station.station_id = str(station_id)
+        if not np.isnan(latitude[k]):
+            station.latitude = latitude[k]
+        if not np.isnan(longitude[k]):
+            station.longitude = longitude[k]
+        station.avg_rainy_days_per_month = rainy_days[k].tolist()
+        yield station
+
+def monthly_precip_source_key(directory=None, verify=False):
+    """
+    Fingerprint of the CSV files in the normals-monthly directory, stored in the packed
+    archive so an archive that is older than the CSV files can be detected. By default only
+    the directory's modification time and number of entries are used, so checking it doesn't
+    stat every file; verify=True fingerprints every file, see score_cache.source_fingerprint.
+    """
+    # Imported here because score_cache imports this module for MONTHLY_PRECIP_DIR
+    from score_cache import source_fingerprint
+    return source_fingerprint([os.path.normpath(directory or MONTHLY_PRECIP_DIR)], stat_files=verify)
+
+def precip_archive_is_current(archive_path=None, directory=None, verify=False):
+    """
+    Whether the packed archive exists and was packed from the CSV files as they are now.
+    Without the directory the archive is the only copy of the data, so it is used as it is.
+    
+    Args:
+        archive_path (str): Packed archive, MONTHLY_PRECIP_ARCHIVE if not given
+        directory (str): Directory of CSV files, MONTHLY_PRECIP_DIR if not given
+        verify (bool): If True, also notice CSV files that were edited in place, at the cost
+                       of a stat of every file
+    """
+    archive_path = archive_path or MONTHLY_PRECIP_ARCHIVE
+    directory = directory or MONTHLY_PRECIP_DIR
+    if not os.path.exists(archive_path):
+        return False
+    if not os.path.isdir(directory):
+        return True
+    
+    name = 'file_key' if verify else 'source_key'
+    with np.load(archive_path) as archive:
+        return name in archive.files and str(archive[name]) == monthly_precip_source_key(directory, verify)
+
+def iter_stations_monthly_precip(directory=None, archive_path=None):
+    """
+    Yield stations with precipitation data, one at a time. They are read from the packed
+    archive (MONTHLY_PRECIP_ARCHIVE) when it is up to date with the CSV files, otherwise from
+    the CSV files in the normals-monthly directory, where each CSV file represents a station
+    with the filename being the station ID.
+    
+    Args:
+        directory (str): Directory of CSV files, MONTHLY_PRECIP_DIR if not given
+        archive_path (str): Packed archive, MONTHLY_PRECIP_ARCHIVE if neither it nor the
+                            directory is given
+    
+    Yields:
+        Station: Station objects with precipitation data
+    """
+    # The default archive was packed from the default directory, not from the one given
+    if archive_path is None and directory is not None:
+        yield from _iter_monthly_precip_dir(directory)
+        return
+    
+    archive_path = archive_path or MONTHLY_PRECIP_ARCHIVE
+    if os.path.exists(archive_path):
+        try:
+            if precip_archive_is_current(archive_path, directory):
+                yield from _iter_monthly_precip_archive(archive_path)
+                return
+            print(f"{archive_path} is older than the CSV files, reading the CSV files instead (rerun with --pack to update it)")
+        except Exception as e:
+            print(f"Error reading precipitation archive, falling back to the CSV files: {e}")
+    
+    yield from _iter_monthly_precip_dir(directory)
+
+def pack_monthly_precip_archive(directory=None, archive_path=None):
+    """
+    Parse every CSV in the normals-monthly directory once and pack the stations into a
+    single compressed file sorted by station ID, so later loads read one file instead of
+    opening thousands of small ones. Fingerprints of the CSV files are stored with them,
+    so the archive stops being used once they change.
+    
+    Returns:
+        int: Number of stations written to the archive (MONTHLY_PRECIP_ARCHIVE if not given)
+    """
+    source_key = monthly_precip_source_key(directory)
+    file_key = monthly_precip_source_key(directory, verify=True)
+    stations = sorted(_iter_monthly_precip_dir(directory), key=lambda station: station.station_id)
+    
+    np.savez_compressed(
+        archive_path or MONTHLY_PRECIP_ARCHIVE,
+        source_key=source_key,
+        file_key=file_key,
+        station_ids=np.array([station.station_id for station in stations], dtype=str),
+        rainy_days=np.array([station.avg_rainy_days_per_month for station in stations], dtype=np.float64).reshape(-1, 12),
+        latitude=np.array([np.nan if station.latitude is None else station.latitude for station in stations], dtype=np.float64),
+        longitude=np.array([np.nan if station.longitude is None else station.longitude for station in stations], dtype=np.float64),
+    )
+    
+    return len(stations)
+
+def load_stations_monthly_precip(directory=None, archive_path=None):
+    """
+    Load monthly precipitation data from CSV files in the normals-monthly directory,
+    or from the packed archive when it exists.
+    Each CSV file represents a station with the filename being the station ID.
+    
+    Args:
+        directory (str): Directory of CSV files, MONTHLY_PRECIP_DIR if not given
+        archive_path (str): Packed archive, MONTHLY_PRECIP_ARCHIVE if not given
+    
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects with precipitation data
+    """
+    return {station.station_id: station for station in iter_stations_monthly_precip(directory, archive_path)}
+
+def _read_text(file_path):
+    with open(file_path, 'r') as csvfile:
+        return csvfile.read()
+
+async def _load_station_file(station_id, file_path, semaphore, executor):
+    # The semaphore bounds how many reads are in flight, the reads themselves run in the executor's threads
+    async with semaphore:
+        text = await asyncio.get_running_loop().run_in_executor(executor, _read_text, file_path)
+    return parse_monthly_precip_csv(station_id, text.splitlines())
+
+async def load_stations_monthly_precip_async(max_concurrent_reads=64, directory=None):
+    """
+    Load monthly precipitation data from the CSV files like load_stations_monthly_precip(),
+    overlapping the reads of the files. On network-mounted data the per-file latency dominates, so having many
+    reads in flight at once is much faster than reading one file at a time.
+    
+    Args:
+        max_concurrent_reads (int): Maximum number of files being read at the same time, also the
+                                    number of threads reading them
+        directory (str): Directory of CSV files, MONTHLY_PRECIP_DIR if not given
+        
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects with precipitation data,
+              in the same order as load_stations_monthly_precip()
+    """
+    directory = directory or MONTHLY_PRECIP_DIR
+    stations = {}
+    
+    try:
+        # Check if directory exists
+        if not os.path.isdir(directory):
+            print(f"Error: Directory '{directory}' not found.")
+            return stations
+        
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        
+        # A dedicated pool sized to the concurrency limit, the default executor has far fewer threads
+        with ThreadPoolExecutor(max_workers=max_concurrent_reads) as executor:
+            filenames = await loop.run_in_executor(executor, os.listdir, directory)
+            
+            semaphore = asyncio.Semaphore(max_concurrent_reads)
+            tasks = [
+                _load_station_file(os.path.splitext(filename)[0], os.path.join(directory, filename), semaphore, executor)
+                for filename in filenames if filename.endswith('.csv')
+            ]
             
-            # Add the station to our dictionary
-            stations[station_id] = station
+            # gather() returns the results in the order of the tasks, so the stations keep the directory order
+            for station in await asyncio.gather(*tasks):
+                if station is not None:
+                    stations[station.station_id] = station
+        
+        elapsed = time.perf_counter() - start_time
+        print(f"Read {len(tasks)} precipitation files in {elapsed:.2f}s ({len(tasks) / elapsed if elapsed > 0 else 0:.0f} files/sec)")
     
     except Exception as e:
         print(f"Error loading precipitation data: {e}")
@@ -91,8 +292,31 @@ def load_stations_monthly_precip():
     return stations
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--async', dest='use_async', action='store_true', help="Overlap the reads of the CSV files")
+    parser.add_argument('--max-concurrent-reads', type=int, default=64)
+    parser.add_argument('--pack', action='store_true', help=f"Pack the CSV files into {MONTHLY_PRECIP_ARCHIVE}")
+    parser.add_argument('--verify', action='store_true', help=f"Check every CSV file against {MONTHLY_PRECIP_ARCHIVE}, including ones edited in place")
+    args = parser.parse_args()
+    
+    if args.verify and not args.pack:
+        if precip_archive_is_current(verify=True):
+            print(f"{MONTHLY_PRECIP_ARCHIVE} is up to date with the CSV files")
+        else:
+            print(f"{MONTHLY_PRECIP_ARCHIVE} is missing or older than the CSV files, rerun with --pack to update it")
+    
+    if args.pack:
+        start_time = time.perf_counter()
+        station_count = pack_monthly_precip_archive()
+        print(f"Packed {station_count} stations into {MONTHLY_PRECIP_ARCHIVE} in {time.perf_counter() - start_time:.2f}s")
+    
     # Example usage
-    precip_stations = load_stations_monthly_precip()
+    if args.use_async:
+        precip_stations = asyncio.run(load_stations_monthly_precip_async(args.max_concurrent_reads))
+    else:
+        precip_stations = load_stations_monthly_precip()
     print(f"Loaded precipitation data for {len(precip_stations)} stations")
     
     # Print sample of the data for the first station
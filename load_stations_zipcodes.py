@@ -2,17 +2,22 @@ from station import Station
 
 ZIPCODES_NORMALS_STATIONS = 'noaa/zipcodes-normals-stations.txt'
 
-def load_stations_zipcodes():
+def iter_stations_zipcodes(path=None):
     """
-    Load stations from the zipcodes-normals-stations.txt file.
+    Yield stations from the zipcodes-normals-stations.txt file as they are parsed,
+    without holding the whole file's stations in memory.
     
-    Returns:
-        dict: Dictionary mapping station IDs to Station objects
+    Args:
+        path (str): File to read, ZIPCODES_NORMALS_STATIONS if not given
+    
+    Yields:
+        Station: One Station object per station ID, the first time it appears in the file
     """
-    stations = {}
+    path = path or ZIPCODES_NORMALS_STATIONS
+    seen_station_ids = set()
     
     try:
-        with open(ZIPCODES_NORMALS_STATIONS, 'r') as file:
+        with open(path, 'r') as file:
             for line in file:
                 # Skip empty lines
                 if not line.strip():
@@ -25,21 +30,33 @@ def load_stations_zipcodes():
                     zipcode = parts[1]
                     
                     # Create a new Station object if we haven't seen this station before
-                    if station_id not in stations:
+                    if station_id not in seen_station_ids:
                         station = Station()
                         station.station_id = station_id
                         try:
                             station.zipcode = zipcode
-                            stations[station_id] = station
                         except ValueError as e:
                             print(f"Skipping station {station_id}: {e}")
+                            continue
+                        seen_station_ids.add(station_id)
+                        yield station
                 
     except FileNotFoundError:
-        print(f"Error: File '{ZIPCODES_NORMALS_STATIONS}' not found.")
+        print(f"Error: File '{path}' not found.")
     except Exception as e:
         print(f"Error reading file: {e}")
+
+def load_stations_zipcodes(path=None):
+    """
+    Load stations from the zipcodes-normals-stations.txt file.
+    
+    Args:
+        path (str): File to read, ZIPCODES_NORMALS_STATIONS if not given
     
-    return stations
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects
+    """
+    return {station.station_id: station for station in iter_stations_zipcodes(path)}
 
 if __name__ == "__main__":
     # Example usage
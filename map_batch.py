@@ -0,0 +1,251 @@
+import hashlib
+import json
+import matplotlib
+matplotlib.use('Agg')  # Render without a display, batches run unattended
+import matplotlib.pyplot as plt
+import multiprocessing
+import numpy as np
+import os
+import time
+from map_grid import load_projected_states, load_grid_cells
+from grid_scoring import METRICS, BATCH_SCORING_FUNCTIONS, scoring_fingerprint, code_fingerprint
+from map_grid_profiles import load_projected_metric_stations, cell_station_weights
+from map_grid_render import render_grid_scores
+from map_output import OUTPUT_FORMATS, save_figure_formats
+from scoring_profiles import ScoringProfile, DEFAULT_PROFILE, batch_station_scores
+from score_cache import source_fingerprint
+from station_cache import STATION_CACHE_VERSION, STATION_SOURCES, load_station_cache
+
+# Bump when the rendering of batch maps changes so every output is rebuilt
+BATCH_VERSION = 1
+
+# Key each output was last rendered with, so unchanged outputs are skipped
+BATCH_STATE_FILE = 'computed/batch_outputs.json'
+
+# Shared state for the render workers. It is filled in before the worker processes are
+# forked so the state shapes, grid cells and cell scores are inherited instead of pickled.
+_batch_state = {}
+
+def load_manifest(path):
+    """
+    Load a batch manifest, a JSON object like
+        {
+            "profiles": [{"name": "likes-heat", "ideal_temp": 80}],
+            "jobs": [
+                {"metric": "comfort", "spacing": 10, "formats": ["png", "svg"]},
+                {"metric": "temperature", "spacing": 20, "profile": "likes-heat", "dissolve": true}
+            ]
+        }
+    or just the list of jobs. A job's profile names one of the manifest's profiles and is
+    the default profile if left out. Jobs can also set "percentiles", "dpi", "compress_png",
+    "png_colors" and "output" (the output path without extension).
+
+    Returns:
+        list: Jobs as dictionaries with every setting filled in
+    """
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+
+    profiles = {DEFAULT_PROFILE.name: DEFAULT_PROFILE}
+    profiles.update((settings['name'], ScoringProfile(**settings)) for settings in manifest.get('profiles', []))
+
+    jobs = []
+    for settings in manifest['jobs']:
+        job = {
+            'metric': settings['metric'],
+            'spacing': settings.get('spacing', 20),
+            'profile': profiles.get(settings.get('profile', DEFAULT_PROFILE.name)),
+            'formats': settings.get('formats', ['png']),
+            'dissolve': settings.get('dissolve', False),
+            'percentiles': settings.get('percentiles'),
+            'dpi': settings.get('dpi', 300),
+            'compress_png': settings.get('compress_png', False),
+            'png_colors': settings.get('png_colors'),
+        }
+        if job['metric'] not in METRICS:
+            raise ValueError(f"Unknown metric {job['metric']!r}, expected one of {list(METRICS)}")
+        if job['profile'] is None:
+            raise ValueError(f"Unknown profile {settings['profile']!r}, expected one of {list(profiles)}")
+        if set(job['formats']) - set(OUTPUT_FORMATS):
+            raise ValueError(f"Unknown formats in {job['formats']}, expected any of {list(OUTPUT_FORMATS)}")
+        job['output'] = settings.get('output', f"output/map_grid_{job['metric']}_{job['spacing']}_miles_{job['profile'].name}")
+        jobs.append(job)
+
+    return jobs
+
+def station_data_key():
+    """
+    Key that changes whenever the station cache the batch reads is rebuilt from changed data
+    files, or the scoring code changes, both the Station methods and the vectorised functions
+    in BATCH_SCORING_FUNCTIONS the batch actually scores with. Checking it only needs the data
+    files' sizes and modification times.
+    """
+    return (f"{STATION_CACHE_VERSION}:{source_fingerprint(STATION_SOURCES, stat_files=False)}:"
+            f"{scoring_fingerprint()}:{code_fingerprint(BATCH_SCORING_FUNCTIONS)}")
+
+def job_key(job, data_key=None):
+    """
+    Key that changes whenever the job's settings or the station data and scoring code change.
+
+    Args:
+        job (dict): Job from load_manifest
+        data_key (str): station_data_key(), computed if not given
+    """
+    settings = {name: value for name, value in job.items() if name not in ('profile', 'output')}
+    settings['profile'] = job['profile'].to_dict()
+    return hashlib.sha1(
+        f"{BATCH_VERSION}:{data_key or station_data_key()}:{json.dumps(settings, sort_keys=True)}".encode()
+    ).hexdigest()[:16]
+
+def job_outputs(job):
+    """
+    Path of each of the job's output files by format.
+    """
+    return {output_format: f"{job['output']}.{output_format}" for output_format in job['formats']}
+
+def _profile_key(profile):
+    return tuple(sorted(profile.to_dict().items()))
+
+def score_jobs(jobs):
+    """
+    Compute the cell scores of every job. The station cache and state shapes are loaded once,
+    each metric's stations are projected and put in a KD-tree once, the stations are assigned
+    to the cells once per (metric, spacing), and each metric's stations are scored for all of
+    its profiles in one batch.
+
+    Returns:
+        tuple: (projected_states, grids, scores) with the (grid_cells, cell_indices) of each
+               spacing and the cell scores of each job
+    """
+    cache = load_station_cache()
+    projected_states, us_boundary = load_projected_states()
+    grids = {spacing: load_grid_cells(us_boundary, spacing) for spacing in sorted({job['spacing'] for job in jobs})}
+
+    scores = [None] * len(jobs)
+    for metric in sorted({job['metric'] for job in jobs}):
+        metric_jobs = [k for k, job in enumerate(jobs) if job['metric'] == metric]
+
+        stations, station_data, kdtree = load_projected_metric_stations(metric, cache)
+        if not station_data:
+            raise ValueError(f"No stations with {metric} data")
+
+        # One scoring pass for every distinct profile of the metric
+        profiles = {_profile_key(jobs[k]['profile']): jobs[k]['profile'] for k in metric_jobs}
+        station_scores = batch_station_scores(metric, list(profiles.values()),
+                                              stations['daily_max'], stations['rainy_days'], summary=stations)
+        profile_rows = {key: row for row, key in enumerate(profiles)}
+
+        for spacing in sorted({jobs[k]['spacing'] for k in metric_jobs}):
+            grid_cells, _ = grids[spacing]
+            print(f"Assigning {len(station_data)} {metric} stations to {len(grid_cells)} {spacing}-mile grid cells...")
+            # (cells, stations) x (stations, profiles) gives every profile's cell scores at once
+            cell_scores = np.asarray(cell_station_weights(grid_cells, station_data, kdtree, spacing) @ station_scores.T)
+
+            for k in metric_jobs:
+                if jobs[k]['spacing'] == spacing:
+                    scores[k] = cell_scores[:, profile_rows[_profile_key(jobs[k]['profile'])]]
+
+    return projected_states, grids, scores
+
+def render_job(job, projected_states, grid_cells, cell_indices, scores, workers=1):
+    """
+    Draw one job's map and save it in each of its formats.
+
+    Returns:
+        dict: Path of the saved file for each format
+    """
+    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+    projected_states.plot(linewidth=0.8, edgecolor='black', facecolor='white', ax=ax)
+    render_grid_scores(plt, grid_cells, scores.tolist(), job['metric'], projected_states,
+                       job['percentiles'], cell_indices, job['dissolve'])
+    profile = '' if job['profile'] is DEFAULT_PROFILE else f" for {job['profile'].name}"
+    ax.set_title(f"Continental US {job['metric'].title()} Map{profile} ({job['spacing']}-Mile Grid)", fontsize=15)
+    ax.set_axis_off()
+
+    try:
+        return save_figure_formats(fig, job['output'], job['formats'], job['dpi'], job['compress_png'],
+                                   job['png_colors'], workers=workers)
+    finally:
+        plt.close(fig)
+
+def _render_job(k):
+    """
+    Render one job inside a worker process.
+    """
+    state = _batch_state
+    job = state['jobs'][k]
+    grid_cells, cell_indices = state['grids'][job['spacing']]
+    return render_job(job, state['projected_states'], grid_cells, cell_indices, state['scores'][k])
+
+def run_batch(jobs, workers=None, force=False):
+    """
+    Run the jobs of a manifest in one process, sharing the loaded data between them. Jobs
+    whose outputs exist and were rendered from the same settings, station data and scoring
+    code are skipped; the rest are scored together and rendered in parallel worker processes.
+
+    Args:
+        jobs (list): Jobs from load_manifest
+        workers (int): Number of render worker processes, defaults to the number of CPUs
+        force (bool): If True, render every job even if its outputs are up to date
+
+    Returns:
+        dict: Paths of the saved files of each rendered job, by the job's output path
+    """
+    start = time.time()
+
+    rendered_keys = {}
+    if os.path.exists(BATCH_STATE_FILE):
+        with open(BATCH_STATE_FILE, 'r') as f:
+            rendered_keys = json.load(f)
+
+    data_key = station_data_key()
+    keys = [job_key(job, data_key) for job in jobs]
+    pending = [
+        k for k, job in enumerate(jobs)
+        if force or any(rendered_keys.get(path) != keys[k] or not os.path.exists(path) for path in job_outputs(job).values())
+    ]
+    print(f"{len(jobs) - len(pending)} of {len(jobs)} jobs are up to date")
+    if not pending:
+        return {}
+
+    pending_jobs = [jobs[k] for k in pending]
+    projected_states, grids, scores = score_jobs(pending_jobs)
+    print(f"Scored {len(pending_jobs)} jobs in {time.time() - start:.2f} seconds")
+
+    workers = min(workers or os.cpu_count(), len(pending_jobs))
+    if workers > 1:
+        _batch_state.update(jobs=pending_jobs, projected_states=projected_states, grids=grids, scores=scores)
+        try:
+            # Fork so the workers inherit _batch_state instead of receiving it with every job
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                results = pool.map(_render_job, range(len(pending_jobs)), chunksize=1)
+        finally:
+            _batch_state.clear()
+    else:
+        # A single job still writes its formats in parallel
+        results = [
+            render_job(job, projected_states, *grids[job['spacing']], job_scores, workers=None)
+            for job, job_scores in zip(pending_jobs, scores)
+        ]
+
+    for k, paths in zip(pending, results):
+        rendered_keys.update((path, keys[k]) for path in paths.values())
+    os.makedirs(os.path.dirname(BATCH_STATE_FILE), exist_ok=True)
+    with open(BATCH_STATE_FILE, 'w') as f:
+        json.dump(rendered_keys, f, indent=2, sort_keys=True)
+
+    print(f"Rendered {len(pending_jobs)} jobs in {time.time() - start:.2f} seconds")
+    return {job['output']: paths for job, paths in zip(pending_jobs, results)}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the maps listed in a JSON manifest of jobs.")
+    parser.add_argument('manifest', help="JSON file with the jobs, see load_manifest")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of render processes")
+    parser.add_argument('--force', action='store_true', help="Render every job even if its outputs are up to date")
+    args = parser.parse_args()
+
+    run_batch(load_manifest(args.manifest), args.workers, args.force)
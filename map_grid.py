@@ -6,20 +6,17 @@ import pickle
 from shapely.geometry import LineString, MultiLineString, box, Polygon
 from shapely.ops import unary_union
 
-def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells=False, force_recalculate=False):
+# State FIPS codes outside the continental US (lower 48 states)
+# Alaska (02), Hawaii (15), Puerto Rico (72), and other territories
+NON_CONTINENTAL_STATEFP = ['02', '15', '72', '60', '66', '69', '78']
+
+def load_projected_states():
     """
-    Create a map showing the boundaries of the continental US states
-    with a grid overlay that only appears inside the US boundaries.
-    Uses an equal-area projection to ensure grid cells are square.
+    Load the continental US state boundaries projected to an equal-area CRS.
     
-    Args:
-        grid_spacing_miles (int): Grid spacing in miles
-        return_grid_cells (bool): If True, return grid cells that intersect with the US boundary
-        force_recalculate (bool): If True, force recalculation of grid cells even if cached data exists
-        
     Returns:
-        tuple: (plt, grid_cells, us_boundary, projected_states) if return_grid_cells is True,
-               otherwise just plt
+        tuple: (projected_states, us_boundary) where us_boundary is a single geometry
+               covering the entire continental US
     """
     print("Loading state shapefile...")
     
@@ -27,8 +24,7 @@ def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells
     states_gdf = gpd.read_file('census/cb_2024_us_state_500k/cb_2024_us_state_500k.shp')
     
     # Filter to include only the continental US (lower 48 states)
-    # Exclude Alaska (02), Hawaii (15), Puerto Rico (72), and other territories
-    continental_states = states_gdf[~states_gdf['STATEFP'].isin(['02', '15', '72', '60', '66', '69', '78'])]
+    continental_states = states_gdf[~states_gdf['STATEFP'].isin(NON_CONTINENTAL_STATEFP)]
     
     print(f"Loaded {len(continental_states)} continental US states")
     
@@ -40,33 +36,87 @@ def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells
     # Create a single geometry representing the entire continental US
     us_boundary = unary_union(projected_states.geometry)
     
-    # Get the bounds of the US in the projected coordinate system (in meters)
-    minx, miny, maxx, maxy = us_boundary.bounds
-    
-    # Create the map
-    print("Creating state boundary map with grid overlay...")
-    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+    return projected_states, us_boundary
+
+def grid_coordinates(bounds, grid_spacing_miles):
+    """
+    Calculate the x and y grid line coordinates covering the given bounds.
     
-    # Plot state boundaries
-    projected_states.plot(
-        linewidth=0.8,
-        edgecolor='black',
-        facecolor='white',
-        ax=ax
-    )
+    Args:
+        bounds (tuple): (minx, miny, maxx, maxy) in the projected CRS (meters)
+        grid_spacing_miles (int): Grid spacing in miles
+        
+    Returns:
+        tuple: (x_grid, y_grid) numpy arrays of grid line coordinates
+    """
+    minx, miny, maxx, maxy = bounds
     
     # Convert miles to meters (1 mile = 1609.34 meters)
     grid_spacing_meters = grid_spacing_miles * 1609.34
     
-    # Create grid coordinates
     x_grid = np.arange(minx, maxx + grid_spacing_meters, grid_spacing_meters)
     y_grid = np.arange(miny, maxy + grid_spacing_meters, grid_spacing_meters)
     
+    return x_grid, y_grid
+
+def generate_grid_cells(us_boundary, x_grid, y_grid, i_range=None, j_range=None):
+    """
+    Clip the grid cells to the US boundary, skipping cells that are mostly outside of it.
+    
+    Args:
+        us_boundary: Geometry of the continental US (or the part of it covering the requested range)
+        x_grid (array): Grid line x coordinates
+        y_grid (array): Grid line y coordinates
+        i_range (tuple): Optional (start, stop) range of column indices to generate
+        j_range (tuple): Optional (start, stop) range of row indices to generate
+        
+    Returns:
+        tuple: (grid_cells, cell_indices) where cell_indices holds the (i, j) grid index of each cell
+    """
+    i_start, i_stop = i_range if i_range else (0, len(x_grid) - 1)
+    j_start, j_stop = j_range if j_range else (0, len(y_grid) - 1)
+    
+    grid_cells = []
+    cell_indices = []
+    
+    for i in range(i_start, i_stop):
+        for j in range(j_start, j_stop):
+            # Create a grid cell
+            cell = box(x_grid[i], y_grid[j], x_grid[i+1], y_grid[j+1])
+            
+            # Check if the cell intersects with the US boundary
+            if cell.intersects(us_boundary):
+                # Get the intersection of the cell with the US boundary
+                cell_in_us = cell.intersection(us_boundary)
+                
+                # Skip if the intersection is too small
+                if cell_in_us.area < 0.1 * cell.area:
+                    continue
+                
+                grid_cells.append(cell_in_us)
+                cell_indices.append((i, j))
+    
+    return grid_cells, cell_indices
+
+def load_grid_cells(us_boundary, grid_spacing_miles, force_recalculate=False):
+    """
+    Load the grid cells for the given spacing from the cache in computed/, generating
+    and caching them first if needed.
+    
+    Args:
+        us_boundary: Geometry of the continental US
+        grid_spacing_miles (int): Grid spacing in miles
+        force_recalculate (bool): If True, force recalculation of grid cells even if cached data exists
+        
+    Returns:
+        tuple: (grid_cells, cell_indices) where cell_indices holds the (i, j) grid index of each cell
+    """
     # Define the path for the serialized grid cells
     os.makedirs('computed', exist_ok=True)
     grid_cache_file = f'computed/grids_{grid_spacing_miles}_miles.bin'
     
     grid_cells = []
+    cell_indices = []
     
     # Try to load grid cells from cache if not forcing recalculation
     if not force_recalculate and os.path.exists(grid_cache_file):
@@ -75,6 +125,8 @@ def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells
             with open(grid_cache_file, 'rb') as f:
                 cached_data = pickle.load(f)
                 grid_cells = cached_data['grid_cells']
+                # Caches written before cells kept their grid index need to be regenerated
+                cell_indices = cached_data['cell_indices']
                 print(f"Successfully loaded {len(grid_cells)} grid cells from cache")
         except Exception as e:
             print(f"Error loading from cache: {e}")
@@ -85,27 +137,52 @@ def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells
     if not grid_cells:
         print("Generating grid cells within US...")
         
-        # Create grid cells and lines
-        for i in range(len(x_grid) - 1):
-            for j in range(len(y_grid) - 1):
-                # Create a grid cell
-                cell = box(x_grid[i], y_grid[j], x_grid[i+1], y_grid[j+1])
-                
-                # Check if the cell intersects with the US boundary
-                if cell.intersects(us_boundary):
-                    # Get the intersection of the cell with the US boundary
-                    cell_in_us = cell.intersection(us_boundary)
-                    
-                    # Skip if the intersection is too small
-                    if cell_in_us.area < 0.1 * cell.area:
-                        continue
-                    
-                    grid_cells.append(cell_in_us)
+        x_grid, y_grid = grid_coordinates(us_boundary.bounds, grid_spacing_miles)
+        grid_cells, cell_indices = generate_grid_cells(us_boundary, x_grid, y_grid)
         
         # Save the grid cells to cache
         print(f"Saving {len(grid_cells)} grid cells to cache: {grid_cache_file}")
         with open(grid_cache_file, 'wb') as f:
-            pickle.dump({'grid_cells': grid_cells}, f)
+            pickle.dump({'grid_cells': grid_cells, 'cell_indices': cell_indices}, f)
+    
+    return grid_cells, cell_indices
+
+def create_state_boundary_map_with_grid(grid_spacing_miles=20, return_grid_cells=False, force_recalculate=False):
+    """
+    Create a map showing the boundaries of the continental US states
+    with a grid overlay that only appears inside the US boundaries.
+    Uses an equal-area projection to ensure grid cells are square.
+    
+    Args:
+        grid_spacing_miles (int): Grid spacing in miles
+        return_grid_cells (bool): If True, return grid cells that intersect with the US boundary
+        force_recalculate (bool): If True, force recalculation of grid cells even if cached data exists
+        
+    Returns:
+        tuple: (plt, grid_cells, us_boundary, projected_states) if return_grid_cells is True,
+               otherwise just plt
+    """
+    projected_states, us_boundary = load_projected_states()
+    
+    # Get the bounds of the US in the projected coordinate system (in meters)
+    minx, miny, maxx, maxy = us_boundary.bounds
+    
+    # Create the map
+    print("Creating state boundary map with grid overlay...")
+    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+    
+    # Plot state boundaries
+    projected_states.plot(
+        linewidth=0.8,
+        edgecolor='black',
+        facecolor='white',
+        ax=ax
+    )
+    
+    # Create grid coordinates
+    x_grid, y_grid = grid_coordinates(us_boundary.bounds, grid_spacing_miles)
+    
+    grid_cells, cell_indices = load_grid_cells(us_boundary, grid_spacing_miles, force_recalculate)
 
     print("Generating and clipping X-grid lines to US boundary...")
     
@@ -0,0 +1,127 @@
+import matplotlib.pyplot as plt
+import numpy as np
+from map_grid import load_projected_states, load_grid_cells
+from grid_scoring import METRICS
+from map_grid_profiles import load_projected_metric_stations, cell_station_weights
+from map_grid_render import cell_collection
+from map_output import OUTPUT_FORMATS, save_figure_formats
+from normals_periods import DEFAULT_PERIOD, NORMALS_PERIODS, align_periods
+from scoring_profiles import DEFAULT_PROFILE, batch_station_scores
+from station_cache import load_station_cache, metric_station_mask, select_stations
+
+# Diverging colors of the change maps, red where the score dropped and blue where it rose
+CHANGE_COLORMAP = 'RdBu'
+
+def period_score_changes(metric, base_period, period, profiles):
+    """
+    Score a metric for every profile in two normals periods and subtract them for the
+    stations the periods have in common. Each period's station cache is loaded once, its
+    stations are scored in one batch, and the periods are lined up by their codes in the
+    shared station-ID dictionary.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        base_period (str): Name of the earlier normals period, e.g. '1981-2010'
+        period (str): Name of the later normals period, e.g. '1991-2020'
+        profiles (list): ScoringProfile objects
+
+    Returns:
+        tuple: (stations, changes) with the shared stations' arrays from the later period and
+               the (profiles, stations) change in score from the base period
+    """
+    scored = []
+    for name in (base_period, period):
+        cache = load_station_cache(period=name)
+        stations = select_stations(cache, metric_station_mask(cache, metric))
+        scores = batch_station_scores(metric, profiles, stations['daily_max'], stations['rainy_days'], summary=stations)
+        scored.append((stations, scores))
+
+    (base_stations, base_scores), (stations, scores) = scored
+    base_rows, rows = align_periods(base_stations['station_codes'], stations['station_codes'])
+    print(f"{len(rows)} stations have {metric} data in both {base_period} and {period}")
+
+    return select_stations(stations, rows), scores[:, rows] - base_scores[:, base_rows]
+
+def period_cell_changes(metric, base_period, period, profiles, grid_cells, grid_spacing_miles):
+    """
+    Change in every profile's cell scores between two normals periods, computed from the
+    change at each shared station with the same cell assignment the maps use.
+
+    Returns:
+        array: (profiles, cells) change in score
+    """
+    stations, changes = period_score_changes(metric, base_period, period, profiles)
+    stations, station_data, kdtree = load_projected_metric_stations(metric, stations, f'cache_stations_{metric}_{base_period}_to_{period}')
+    if not station_data:
+        raise ValueError(f"No stations with {metric} data in both {base_period} and {period}")
+
+    weights = cell_station_weights(grid_cells, station_data, kdtree, grid_spacing_miles)
+    return np.asarray(weights @ changes.T).T
+
+def create_change_map(metric='comfort', base_period=DEFAULT_PERIOD, period='1991-2020', grid_spacing_miles=20,
+                      profile=None, percentile=98, formats=('png',)):
+    """
+    Map the change in a metric's score from one normals period to another, on a diverging
+    color scale centered on no change.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        base_period (str): Name of the earlier normals period
+        period (str): Name of the later normals period
+        grid_spacing_miles (int): Grid spacing in miles
+        profile (ScoringProfile): Scoring profile, DEFAULT_PROFILE if not given
+        percentile (float): Percentile of the absolute changes the color scale ends at
+        formats (tuple): Output formats, see map_output.save_figure_formats
+
+    Returns:
+        tuple: (paths, cell_changes) with the saved file of each format and the cells' changes
+    """
+    profile = profile or DEFAULT_PROFILE
+    projected_states, us_boundary = load_projected_states()
+    grid_cells, _ = load_grid_cells(us_boundary, grid_spacing_miles)
+    cell_changes = period_cell_changes(metric, base_period, period, [profile], grid_cells, grid_spacing_miles)[0]
+
+    limit = np.percentile(np.abs(cell_changes), percentile) or 1.0
+    print(f"Change in {metric} score ranges from {cell_changes.min():.2f} to {cell_changes.max():.2f}, "
+          f"color scale ±{limit:.2f}")
+    norm = plt.Normalize(-limit, limit)
+    cmap = plt.get_cmap(CHANGE_COLORMAP)
+
+    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+    projected_states.plot(linewidth=0.8, edgecolor='black', facecolor='white', ax=ax)
+    ax.add_collection(cell_collection(grid_cells, cmap(norm(cell_changes))))
+    projected_states.boundary.plot(ax=ax, linewidth=0.8, color='black')
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+    sm.set_array([])
+    fig.colorbar(sm, ax=ax, orientation='horizontal', pad=0.05, shrink=0.8).set_label(
+        f"Change in {METRICS[metric]['label']}")
+
+    name = '' if profile is DEFAULT_PROFILE else f' for {profile.name}'
+    ax.set_title(f'Change in Continental US {metric.title()}{name}, {base_period} to {period} '
+                 f'({grid_spacing_miles}-Mile Grid)', fontsize=15)
+    ax.set_axis_off()
+
+    suffix = '' if profile is DEFAULT_PROFILE else f'_{profile.name}'
+    output_base = f'output/map_grid_{metric}_change_{base_period}_to_{period}{suffix}'
+    try:
+        paths = save_figure_formats(fig, output_base, formats, dpi=300)
+    finally:
+        plt.close(fig)
+
+    return paths, cell_changes
+
+if __name__ == "__main__":
+    import argparse
+    from scoring_profiles import load_scoring_profiles
+
+    parser = argparse.ArgumentParser(description="Map the change in a score between two normals periods.")
+    parser.add_argument('--metric', choices=list(METRICS), default='comfort')
+    parser.add_argument('--base', choices=list(NORMALS_PERIODS), default=DEFAULT_PERIOD, help="Earlier normals period")
+    parser.add_argument('--period', choices=list(NORMALS_PERIODS), default='1991-2020', help="Later normals period")
+    parser.add_argument('--spacing', type=int, default=20, help="Grid spacing in miles")
+    parser.add_argument('--profiles', help="JSON file with scoring profiles, the first one is used")
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=['png'])
+    args = parser.parse_args()
+
+    profile = load_scoring_profiles(args.profiles)[0] if args.profiles else None
+    create_change_map(args.metric, args.base, args.period, args.spacing, profile, formats=args.formats)
@@ -1,29 +1,29 @@
 import matplotlib.pyplot as plt
-import numpy as np
 import os
-from shapely.geometry import Point, Polygon
-from matplotlib.colors import LinearSegmentedColormap
-from load_stations_monthly_precip import load_stations_monthly_precip
-from map_grid import create_state_boundary_map_with_grid
-from pyproj import Transformer
+from map_grid import create_state_boundary_map_with_grid, load_grid_cells
+from score_cache import get_grid_scores
+from map_grid_render import render_grid_scores
+from map_output import OUTPUT_FORMATS, save_figure_formats
 import subprocess
-from scipy.spatial import KDTree
+import sys
 
-def create_precipitation_map(grid_spacing_miles=20):
+def create_precipitation_map(grid_spacing_miles=20, workers=1, incremental=False, percentiles=None, force_recalculate=False, dissolve=False):
     """
     Create a map showing precipitation data across the continental US using a grid.
     Each grid cell is colored based on the average precipitation score of stations within it.
     
     Args:
         grid_spacing_miles (int): Grid spacing in miles
+        workers (int): Number of worker processes used to score the grid cells
+        incremental (bool): If True, only rescore the stations and cells affected by station
+                            changes since the last incremental run
+        percentiles (tuple): Optional (low, high) percentiles for the color scale
+        force_recalculate (bool): If True, ignore cached scores
+        dissolve (bool): If True, merge adjacent cells of the same color before drawing
         
     Returns:
         matplotlib.pyplot: The plot object with the precipitation map
     """
-    print("Loading precipitation data from stations...")
-    stations = load_stations_monthly_precip()
-    print(f"Loaded precipitation data for {len(stations)} stations")
-    
     # Get the map, grid cells, and other data from map_grid
     plt, grid_cells, us_boundary, projected_states = create_state_boundary_map_with_grid(
         grid_spacing_miles=grid_spacing_miles, 
@@ -32,148 +32,53 @@ def create_precipitation_map(grid_spacing_miles=20):
     
     print(f"Generated {len(grid_cells)} grid cells that intersect with the US boundary")
     
-    # Create a transformer to convert from lat/lon to the projected CRS
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:5070", always_xy=True)
-    
-    # Pre-compute all station points in the projected coordinate system
-    station_data = []
-    station_points = []
-    
-    for station_id, station in stations.items():
-        if station.latitude is not None and station.longitude is not None:
-            # Transform station coordinates to the projected CRS
-            station_x, station_y = transformer.transform(station.longitude, station.latitude)
-            point = Point(station_x, station_y)
-            station_data.append((station_id, station, point))
-            station_points.append((station_x, station_y))
-    
-    print(f"\nPre-computed coordinates for {len(station_data)} stations")
-    
-    # Create KDTree for efficient spatial queries
-    if not station_points:
-        print("No valid station points found!")
-        return plt
-        
-    kdtree = KDTree(station_points)
-    
-    # Calculate precipitation scores for each grid cell
-    print("Calculating precipitation scores for each grid cell...")
-    grid_cell_scores = []
-    cells_with_assigned_stations = 0
-    cells_with_nearest_stations = 0
-    
-    # Convert grid spacing from miles to meters (for the projected CRS)
-    # Assuming 1 mile = 1609.34 meters
-    grid_spacing_meters = grid_spacing_miles * 1609.34
-    
-    for i, cell in enumerate(grid_cells, 1):
-        # Update progress
-        print(f"\rCalculating precipitation scores: {i}/{len(grid_cells)} cells", end='')
-        
-        # Get cell center and bounds
-        cell_center_x = (cell.bounds[0] + cell.bounds[2]) / 2
-        cell_center_y = (cell.bounds[1] + cell.bounds[3]) / 2
-        
-        # Query KDTree for stations within the search radius
-        # Using the diagonal of the grid cell as the search radius to ensure we capture all stations
-        search_radius = np.sqrt(2) * (grid_spacing_meters / 2)
-        
-        # Find indices of stations within the search radius
-        indices = kdtree.query_ball_point([cell_center_x, cell_center_y], search_radius)
-        
-        # Filter stations that are actually within the cell
-        stations_in_cell = []
-        for idx in indices:
-            _, station, point = station_data[idx]
-            if cell.contains(point):
-                stations_in_cell.append(station)
-        
-        # Calculate average precipitation score if there are stations in the cell
-        if stations_in_cell:
-            avg_precip_score = sum(station.get_precipitation_score() for station in stations_in_cell) / len(stations_in_cell)
-            grid_cell_scores.append((cell, avg_precip_score))
-            cells_with_assigned_stations += 1
-        else:
-            # Find the closest station to this cell's center
-            distance, idx = kdtree.query([cell_center_x, cell_center_y], k=1)
-            closest_station = station_data[idx][1]  # Get the station object
-            precip_score = closest_station.get_precipitation_score()
-            grid_cell_scores.append((cell, precip_score))
-            cells_with_nearest_stations += 1
+    # Scores are cached per station data and scoring code, so style-only re-renders skip loading and scoring
+    scores, cells_with_assigned_stations, cells_with_nearest_stations = get_grid_scores(
+        'precipitation', grid_spacing_miles, grid_cells, workers, incremental, force_recalculate
+    )
     
-    # Print newline after completion
-    print()    
     print(f"Found {cells_with_assigned_stations} grid cells with stations inside")
     print(f"Assigned {cells_with_nearest_stations} grid cells to their nearest station")
     print(f"All {len(grid_cells)} cells now have precipitation data")
     
-    # Find the range of precipitation scores
-    if grid_cell_scores:
-        # Get all scores
-        all_scores = [score for _, score in grid_cell_scores]
-        
-        # Calculate the actual min and max for reference
-        actual_min = min(all_scores)
-        actual_max = max(all_scores)
-        
-        # Calculate 5th and 95th percentiles for better color distribution
-        min_score = np.percentile(all_scores, 5)
-        max_score = np.percentile(all_scores, 95)
-        
-        print(f"Actual precipitation score range: {actual_min:.2f} to {actual_max:.2f}")
-        print(f"Using color scale range (5th-95th percentile): {min_score:.2f} to {max_score:.2f}")
-        
-        # Create a custom colormap: white for no precipitation, dark blue for high
-        colors = [(1, 1, 1), (0.7, 0.9, 1), (0, 0.3, 0.8)]  # White to light blue to dark blue
-        cmap = LinearSegmentedColormap.from_list('precipitation_cmap', colors)
-        
-        # Get the current axes
-        ax = plt.gca()
-        
-        # Plot grid cells with colors based on precipitation scores
-        for cell, score in grid_cell_scores:
-            # Clip the score to the percentile range
-            clipped_score = max(min_score, min(score, max_score))
-            
-            # Normalize the score between 0 and 1
-            normalized_score = (clipped_score - min_score) / (max_score - min_score) if max_score > min_score else 0.5
-            color = cmap(normalized_score)
-            
-            if isinstance(cell, Polygon):
-                x, y = cell.exterior.xy
-                ax.fill(x, y, color=color, alpha=0.7, edgecolor='none')
-            else:  # MultiPolygon
-                for polygon in cell.geoms:
-                    x, y = polygon.exterior.xy
-                    ax.fill(x, y, color=color, alpha=0.7, edgecolor='none')
-        
-        # Plot state boundaries on top to ensure they're visible
-        projected_states.boundary.plot(
-            linewidth=0.8,
-            edgecolor='black',
-            ax=ax
-        )
-        
-        # Create a colorbar for precipitation data
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(min_score, max_score))
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax, orientation='horizontal', pad=0.05, shrink=0.8)
-        cbar.set_label('Precipitation Score (higher = more rainy days)')
+    # Color each cell by its score, clipped to a percentile range for better color distribution
+    if scores:
+        # Dissolving needs the cells' grid indices, which are cached alongside the cells
+        cell_indices = load_grid_cells(us_boundary, grid_spacing_miles)[1] if dissolve else None
+        render_grid_scores(plt, grid_cells, scores, 'precipitation', projected_states, percentiles, cell_indices, dissolve)
     
+    ax = plt.gca()
     ax.set_title(f'Continental US Precipitation Map ({grid_spacing_miles}-Mile Grid)', fontsize=15)
     
     return plt
 
 if __name__ == "__main__":
-    plt = create_precipitation_map(grid_spacing_miles=10)
-    
-    # Ensure output directory exists
-    os.makedirs('output', exist_ok=True)
-    
-    # Save the map
-    output_file = 'output/map_grid_precip.png'
-    print(f"Saving precipitation map to {output_file}...")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spacing', type=int, default=10, help="Grid spacing in miles")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of processes used to score grid cells")
+    parser.add_argument('--incremental', action='store_true', help="Only rescore stations and cells affected by changed station data")
+    parser.add_argument('--percentiles', type=int, nargs=2, metavar=('LOW', 'HIGH'), help="Percentile range of the color scale")
+    parser.add_argument('--force-recalc', action='store_true', help="Ignore cached scores")
+    parser.add_argument('--dissolve', action='store_true', help="Merge adjacent cells of the same color before drawing")
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=['png'], help="Output formats, written in parallel")
+    parser.add_argument('--compress-png', action='store_true', help="Losslessly recompress the PNG")
+    parser.add_argument('--png-colors', type=int, help="Quantize the PNG to this many colors (lossy)")
+    parser.add_argument('--open', action='store_true', help="Open the map in the default viewer (macOS only)")
+    args = parser.parse_args()
+    
+    plt = create_precipitation_map(grid_spacing_miles=args.spacing, workers=args.workers, incremental=args.incremental,
+                                   percentiles=args.percentiles, force_recalculate=args.force_recalc,
+                                   dissolve=args.dissolve)
+    
+    # Save the map in every requested format from the one drawn figure
+    output_base = 'output/map_grid_precip'
+    print(f"Saving precipitation map as {', '.join(args.formats)}...")
+    paths = save_figure_formats(plt.gcf(), output_base, args.formats, dpi=300,
+                                compress_png=args.compress_png, png_colors=args.png_colors)
+    output_file = paths[args.formats[0]]
     
     print("Precipitation map created successfully!")
-    subprocess.run(["open", output_file])
+    if args.open and sys.platform == 'darwin':
+        subprocess.run(["open", output_file])
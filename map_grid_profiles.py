@@ -0,0 +1,163 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+import shapely
+from scipy.sparse import csr_matrix
+from map_grid import load_projected_states, load_grid_cells
+from grid_scoring import cell_search_radius, assign_cell
+from map_grid_render import render_grid_scores
+from scoring_profiles import load_scoring_profiles, batch_station_scores
+from spatial_index import load_kdtree, cell_index_file, save_cell_index, read_cell_index
+from spatial_order import cell_order
+from station_cache import load_station_cache, metric_station_mask, select_stations
+
+def build_cell_index(grid_cells, station_data, kdtree, grid_spacing_miles):
+    """
+    Assign the stations to the grid cells, as a (cells, stations) matrix whose rows average
+    the scores of the stations inside each cell, or pick the station nearest to its center.
+    The cells are visited along a Hilbert curve (see spatial_order), so consecutive KD-tree
+    queries stay in the same part of the tree.
+
+    Returns:
+        dict: 'centers' (cells, 2) of the cells' bounds, 'nearest' station to each center and
+              'weights', the csr_matrix of each station's weight in each cell's score
+    """
+    bounds = shapely.bounds(np.asarray(grid_cells, dtype=object)).reshape(-1, 4)
+    centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+    nearest = kdtree.query(centers, k=1)[1].astype(np.int64) if len(centers) else np.zeros(0, dtype=np.int64)
+
+    search_radius = cell_search_radius(grid_spacing_miles)
+    rows, columns, weights = [], [], []
+
+    for k in cell_order(grid_cells):
+        members, _ = assign_cell(grid_cells[k], station_data, kdtree, search_radius)
+        members = members or [int(nearest[k])]
+        rows.extend([k] * len(members))
+        columns.extend(members)
+        weights.extend([1 / len(members)] * len(members))
+
+    return {
+        'centers': centers,
+        'nearest': nearest,
+        'weights': csr_matrix((weights, (rows, columns)), shape=(len(grid_cells), len(station_data))),
+    }
+
+def load_cell_index(grid_cells, station_data, kdtree, grid_spacing_miles, force_recalculate=False):
+    """
+    Load the cell index of the grid cells and stations from computed/spatial_index/, building
+    and storing it first if none was stored for exactly these cells and station points, see
+    build_cell_index.
+    """
+    index_file = cell_index_file(grid_spacing_miles, kdtree.data, shapely.bounds(np.asarray(grid_cells, dtype=object)))
+
+    if not force_recalculate and os.path.exists(index_file):
+        index = read_cell_index(index_file)
+        if index is not None:
+            return index
+
+    index = build_cell_index(grid_cells, station_data, kdtree, grid_spacing_miles)
+    save_cell_index(index_file, index)
+    return index
+
+def cell_station_weights(grid_cells, station_data, kdtree, grid_spacing_miles):
+    """
+    The (cells, stations) matrix of each station's weight in each cell's score, from the
+    stored cell index (see load_cell_index). Multiplying it by any set of station scores
+    gives the cell scores, so the assignment is shared by every profile and every run.
+
+    Returns:
+        csr_matrix: Weight of each station in each cell's score
+    """
+    return load_cell_index(grid_cells, station_data, kdtree, grid_spacing_miles)['weights']
+
+def load_projected_metric_stations(metric, cache=None, name=None):
+    """
+    Load the stations that can be scored for a metric from the station cache, with the
+    projected coordinates the cache already holds and the KD-tree stored for them (see
+    spatial_index.load_kdtree). An already loaded cache can be passed in to share it
+    between metrics.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        cache (dict): Station cache arrays, or a selection of them, load_station_cache() if not given
+        name (str): Name the KD-tree is stored under, needed when the stations aren't the
+                    whole default cache so the trees of different selections don't replace each other
+
+    Returns:
+        tuple: (stations, station_data, kdtree) with the selected station cache arrays, the
+               (station_id, None, (x, y)) tuples used for cell assignment and a KD-tree over
+               the projected points (None when there are no stations)
+    """
+    if cache is None:
+        cache = load_station_cache()
+    stations = select_stations(cache, metric_station_mask(cache, metric))
+    if not len(stations['station_ids']):
+        return stations, [], None
+
+    station_data = [(station_id, None, point) for station_id, point in zip(stations['station_ids'], zip(stations['x'].tolist(), stations['y'].tolist()))]
+    return stations, station_data, load_kdtree(np.column_stack([stations['x'], stations['y']]), name or f'cache_stations_{metric}')
+
+def create_profile_maps(profiles, metric='comfort', grid_spacing_miles=20, force_recalculate=False):
+    """
+    Create one map per scoring profile. The stations are loaded from the station cache,
+    projected and assigned to the grid cells once, all profiles are scored together from the
+    cached temperature summaries, and only the rendering is repeated per profile.
+
+    Args:
+        profiles (list): ScoringProfile objects, each profile's name is used in its output file
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (int): Grid spacing in miles
+        force_recalculate (bool): If True, force recalculation of grid cells even if cached data exists
+
+    Returns:
+        list: Paths of the saved maps
+    """
+    print(f"Loading station data for {metric} map...")
+    stations, station_data, kdtree = load_projected_metric_stations(metric)
+    print(f"Loaded {len(station_data)} stations")
+
+    projected_states, us_boundary = load_projected_states()
+    grid_cells, _ = load_grid_cells(us_boundary, grid_spacing_miles, force_recalculate)
+
+    if not station_data:
+        print("No valid station points found!")
+        return []
+
+    print(f"Assigning {len(station_data)} stations to {len(grid_cells)} grid cells...")
+    weights = cell_station_weights(grid_cells, station_data, kdtree, grid_spacing_miles)
+
+    print(f"Scoring {len(station_data)} stations for {len(profiles)} profiles...")
+    station_scores = batch_station_scores(metric, profiles, stations['daily_max'], stations['rainy_days'], summary=stations)
+
+    # (cells, stations) x (stations, profiles) gives every profile's cell scores at once
+    cell_scores = np.asarray(weights @ station_scores.T)
+
+    os.makedirs('output', exist_ok=True)
+    output_files = []
+
+    for profile, scores in zip(profiles, cell_scores.T):
+        fig, ax = plt.subplots(1, 1, figsize=(15, 10))
+        projected_states.plot(linewidth=0.8, edgecolor='black', facecolor='white', ax=ax)
+        render_grid_scores(plt, grid_cells, scores.tolist(), metric, projected_states)
+        ax.set_title(f'Continental US {metric.title()} Map for {profile.name} ({grid_spacing_miles}-Mile Grid)', fontsize=15)
+        ax.set_axis_off()
+
+        output_file = f'output/map_grid_{metric}_{profile.name}.png'
+        print(f"Saving {profile.name} map to {output_file}...")
+        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+        output_files.append(output_file)
+
+    return output_files
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render one map per scoring profile.")
+    parser.add_argument('profiles', help="JSON file with a list of scoring profiles")
+    parser.add_argument('--metric', choices=['temperature', 'precipitation', 'comfort'], default='comfort')
+    parser.add_argument('--spacing', type=int, default=20, help="Grid spacing in miles")
+    parser.add_argument('--force-recalc', action='store_true')
+    args = parser.parse_args()
+
+    create_profile_maps(load_scoring_profiles(args.profiles), args.metric, args.spacing, args.force_recalc)
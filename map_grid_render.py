@@ -0,0 +1,229 @@
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Polygon
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import ListedColormap, LinearSegmentedColormap, to_rgba_array
+from grid_scoring import METRICS
+from grid_dissolve import dissolve_grid_cells
+
+def _ordinal(n):
+    """
+    Format a percentile as 2nd, 5th, 95th, 98th...
+    """
+    suffix = 'th' if 11 <= n % 100 <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n}{suffix}"
+
+def metric_colormap(metric):
+    """
+    Build the colormap used to render the given metric.
+    """
+    style = METRICS[metric]
+    if style['bins']:
+        return ListedColormap(style['colors'])
+    return LinearSegmentedColormap.from_list(f'{metric}_cmap', style['colors'])
+
+def _clip_scores(scores, min_score, max_score):
+    """
+    Clip the scores to the percentile range, as an array.
+    """
+    clipped = np.clip(np.asarray(scores, dtype=float), min_score, max_score)
+    # max(min_score, min(nan, max_score)) is min_score, keep that for missing scores
+    clipped[np.isnan(clipped)] = min_score
+    return clipped
+
+def _normalized_scores(scores, min_score, max_score):
+    """
+    Clip the scores and normalize them between 0 and 1 for the continuous colormaps.
+    """
+    clipped = _clip_scores(scores, min_score, max_score)
+    if max_score > min_score:
+        return (clipped - min_score) / (max_score - min_score)
+    return np.full(len(clipped), 0.5)
+
+def score_bin_edges(metric, min_score, max_score, levels=10):
+    """
+    The edges of the color bins of score_bins: the metric's own bins, or the given number
+    of equal levels for continuous metrics.
+
+    Returns:
+        array: The n + 1 edges of the n bins, from min_score to max_score
+    """
+    n_bins = METRICS[metric]['bins'] or levels
+    score_range = max_score - min_score
+    return min_score + (np.arange(n_bins + 1) * score_range / n_bins)
+
+def score_bins(metric, scores, min_score, max_score, levels=10):
+    """
+    Put each score, clipped to [min_score, max_score], into a color bin. Binned metrics use
+    their own bins, so cells in the same bin are drawn in the same color. Continuous metrics
+    are split into the given number of equal levels.
+
+    Returns:
+        array: Bin index of each score
+    """
+    style = METRICS[metric]
+
+    if not style['bins']:
+        normalized = _normalized_scores(scores, min_score, max_score)
+        return np.minimum((normalized * levels).astype(int), levels - 1)
+
+    n_bins = style['bins']
+    bin_edges = score_bin_edges(metric, min_score, max_score)
+
+    # A score is in the first bin whose edges include it, so a score on an edge falls in the
+    # lower bin: that is the first upper edge that is >= the score
+    bins = np.searchsorted(bin_edges[1:], _clip_scores(scores, min_score, max_score), side='left')
+
+    # A score above the last edge (possible when rounding puts it just below max_score) is in no bin and gets bin 0
+    bins[bins == n_bins] = 0
+    return bins
+
+def bin_colors(metric, levels=10):
+    """
+    The color of each bin from score_bins, continuous metrics use the middle of each level.
+    """
+    style = METRICS[metric]
+    if style['bins']:
+        return list(style['colors'])
+    cmap = metric_colormap(metric)
+    return [cmap((level + 0.5) / levels) for level in range(levels)]
+
+def score_rgba(metric, scores, min_score, max_score):
+    """
+    The RGBA fill color of every score at once, see score_colors.
+
+    Returns:
+        array: (scores, 4) RGBA colors
+    """
+    style = METRICS[metric]
+    if style['bins']:
+        return to_rgba_array(style['colors'])[score_bins(metric, scores, min_score, max_score)]
+    return metric_colormap(metric)(_normalized_scores(scores, min_score, max_score))
+
+def score_colors(metric, scores, min_score, max_score):
+    """
+    Pick the fill color for each score after clipping it to [min_score, max_score].
+    Binned metrics use one of their distinct colors, continuous metrics are normalized
+    onto the colormap.
+
+    Returns:
+        list: One color per score
+    """
+    style = METRICS[metric]
+
+    if style['bins']:
+        return [style['colors'][bin_index] for bin_index in score_bins(metric, scores, min_score, max_score)]
+
+    return [tuple(color) for color in score_rgba(metric, scores, min_score, max_score)]
+
+def cell_polygons(grid_cells):
+    """
+    Exterior coordinates of every grid cell's polygons, with the index of the cell each one
+    belongs to, so the geometry can be converted once and recolored for many maps.
+
+    Returns:
+        tuple: (polygons, owners) where polygons is a list of (points, 2) arrays and owners
+               is an array with the cell index of each polygon
+    """
+    polygons = []
+    owners = []
+    for k, cell in enumerate(grid_cells):
+        parts = [cell] if isinstance(cell, Polygon) else cell.geoms
+        for polygon in parts:
+            polygons.append(np.asarray(polygon.exterior.coords))
+            owners.append(k)
+    return polygons, np.array(owners, dtype=np.int64)
+
+def cell_collection(grid_cells, colors, alpha=0.7, polygons=None):
+    """
+    Build one PolyCollection holding the exterior of every grid cell, which matplotlib draws
+    far faster than a separate fill per cell.
+
+    Args:
+        grid_cells (list): Shapely polygons (or multipolygons) for each grid cell
+        colors (array): Fill color of each cell, e.g. from score_rgba
+        polygons (tuple): Optional (polygons, owners) from cell_polygons, to reuse converted geometry
+
+    Returns:
+        PolyCollection: The cells, ready for ax.add_collection
+    """
+    polygons, owners = polygons or cell_polygons(grid_cells)
+    facecolors = to_rgba_array(colors)[owners] if len(owners) else []
+    return PolyCollection(polygons, facecolors=facecolors, edgecolors='none', alpha=alpha)
+
+def render_grid_scores(plt, grid_cells, scores, metric, projected_states, percentiles=None, cell_indices=None, dissolve=False):
+    """
+    Fill each grid cell with the color for its score, draw the state boundaries on top
+    and add a colorbar. The color scale is clipped to a percentile range of the scores.
+    
+    Args:
+        plt: The matplotlib.pyplot module holding the current map
+        grid_cells (list): Shapely polygons for each grid cell
+        scores (list): Score of each grid cell
+        metric (str): One of the keys of METRICS
+        projected_states (GeoDataFrame): State shapes in the projected CRS
+        percentiles (tuple): Optional (low, high) percentiles overriding the metric's default
+        cell_indices (list): (i, j) grid index of each cell, needed to dissolve
+        dissolve (bool): If True, merge adjacent cells of the same color into one shape per
+                         region before drawing, which makes SVGs far smaller and faster to draw.
+                         Continuous metrics are drawn in 10 color levels.
+        
+    Returns:
+        tuple: (min_score, max_score) of the color scale
+    """
+    style = METRICS[metric]
+    low, high = percentiles or style['percentiles']
+    
+    # Calculate the actual min and max for reference
+    actual_min = min(scores)
+    actual_max = max(scores)
+    
+    # Calculate percentiles for better color distribution
+    min_score = np.percentile(scores, low)
+    max_score = np.percentile(scores, high)
+    
+    print(f"Actual {metric} score range: {actual_min:.2f} to {actual_max:.2f}")
+    print(f"Using color scale range ({_ordinal(low)}-{_ordinal(high)} percentile): {min_score:.2f} to {max_score:.2f}")
+    
+    cmap = metric_colormap(metric)
+    
+    # Get the current axes
+    ax = plt.gca()
+    
+    if dissolve:
+        if cell_indices is None:
+            raise ValueError("cell_indices are needed to dissolve grid cells")
+        
+        # Plot one shape per connected region of cells in the same color bin
+        cell_bins = score_bins(metric, scores, min_score, max_score)
+        regions = dissolve_grid_cells(grid_cells, cell_indices, cell_bins)
+        print(f"Dissolved {len(grid_cells)} grid cells into {len(regions)} regions")
+        
+        colors = bin_colors(metric)
+        # Regions can enclose other regions, so draw them with their holes rather than only their exteriors
+        gpd.GeoSeries([geometry for _, geometry in regions]).plot(
+            ax=ax, color=[colors[bin_index] for bin_index, _ in regions], alpha=0.7, edgecolor='none'
+        )
+    else:
+        # Plot grid cells with colors based on their scores, all colors are picked in one pass
+        ax.add_collection(cell_collection(grid_cells, score_rgba(metric, scores, min_score, max_score)))
+        ax.autoscale_view()
+    
+    # Plot state boundaries on top to ensure they're visible
+    projected_states.boundary.plot(
+        linewidth=0.8,
+        edgecolor='black',
+        ax=ax
+    )
+    
+    # Create a colorbar, binned metrics get a tick in the middle of each bin
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(min_score, max_score))
+    sm.set_array([])
+    ticks = None
+    if style['bins']:
+        bin_edges = score_bin_edges(metric, min_score, max_score)
+        ticks = ((bin_edges[:-1] + bin_edges[1:]) / 2).tolist()
+    cbar = plt.colorbar(sm, ax=ax, orientation='horizontal', pad=0.05, shrink=0.8, ticks=ticks)
+    cbar.set_label(style['label'])
+    
+    return min_score, max_score
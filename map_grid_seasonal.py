@@ -0,0 +1,146 @@
+import calendar
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+from matplotlib.animation import FuncAnimation, PillowWriter
+from matplotlib.collections import LineCollection
+from map_grid import load_projected_states, load_grid_cells
+from grid_scoring import METRICS
+from map_grid_profiles import load_projected_metric_stations, cell_station_weights
+from map_grid_render import metric_colormap, score_rgba, cell_polygons, cell_collection
+from scoring_profiles import DEFAULT_PROFILE, batch_monthly_scores
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+
+def seasonal_cell_scores(metric, profiles, grid_cells, grid_spacing_miles):
+    """
+    Compute every profile's monthly score cube over the grid cells in one pass: the stations
+    are scored per month for all profiles at once, and one sparse product with the cell
+    assignment turns the (stations, profiles x months) block into cell scores.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        profiles (list): ScoringProfile objects
+        grid_cells (list): Shapely polygons for each grid cell
+        grid_spacing_miles (int): Grid spacing in miles
+
+    Returns:
+        array: (profiles, cells, 12) monthly scores of each cell
+    """
+    stations, station_data, kdtree = load_projected_metric_stations(metric)
+    if not station_data:
+        raise ValueError(f"No stations with {metric} data")
+
+    print(f"Scoring {len(station_data)} stations for 12 months and {len(profiles)} profile(s)...")
+    station_scores = batch_monthly_scores(metric, profiles, stations['daily_max'], stations['rainy_days'])
+
+    print(f"Assigning {len(station_data)} stations to {len(grid_cells)} grid cells...")
+    weights = cell_station_weights(grid_cells, station_data, kdtree, grid_spacing_miles)
+
+    # (profiles, stations, 12) -> (stations, profiles * 12) so one product covers every month
+    station_block = station_scores.transpose(1, 0, 2).reshape(len(station_data), -1)
+    cell_scores = np.asarray(weights @ station_block)
+    return cell_scores.reshape(len(grid_cells), len(profiles), 12).transpose(1, 0, 2)
+
+def _boundary_lines(projected_states):
+    """
+    State boundary coordinates as a list of line arrays, converted once for every frame.
+    """
+    lines = []
+    for boundary in projected_states.boundary:
+        parts = boundary.geoms if hasattr(boundary, 'geoms') else [boundary]
+        lines.extend(np.asarray(part.coords) for part in parts)
+    return lines
+
+def _draw_month(ax, metric, polygons, lines, month_scores, min_score, max_score, title):
+    """
+    Draw one month's cells and the state boundaries from pre-converted geometry.
+    """
+    collection = cell_collection(None, score_rgba(metric, month_scores, min_score, max_score), polygons=polygons)
+    ax.add_collection(collection)
+    ax.add_collection(LineCollection(lines, colors='black', linewidths=0.4))
+    ax.autoscale_view()
+    ax.set_aspect('equal')
+    ax.set_axis_off()
+    ax.set_title(title, fontsize=11)
+    return collection
+
+def create_seasonal_maps(metric='comfort', grid_spacing_miles=20, profile=None, output='grid', percentiles=None, fps=2):
+    """
+    Render a metric's monthly scores, either as 12 small multiples in one figure or as an
+    animated GIF with one frame per month. All months share one color scale so they can be
+    compared, and the cell and state geometry is converted once and reused by every month.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (int): Grid spacing in miles
+        profile (ScoringProfile): Scoring profile, DEFAULT_PROFILE if not given
+        output (str): 'grid' for small multiples or 'gif' for an animation
+        percentiles (tuple): Optional (low, high) percentiles of the shared color scale
+        fps (int): Frames per second of the animation
+
+    Returns:
+        tuple: (output_file, cell_scores) with the (cells, 12) monthly scores
+    """
+    profile = profile or DEFAULT_PROFILE
+    projected_states, us_boundary = load_projected_states()
+    grid_cells, _ = load_grid_cells(us_boundary, grid_spacing_miles)
+    cell_scores = seasonal_cell_scores(metric, [profile], grid_cells, grid_spacing_miles)[0]
+
+    style = METRICS[metric]
+    low, high = percentiles or style['percentiles']
+    min_score, max_score = np.percentile(cell_scores, low), np.percentile(cell_scores, high)
+    print(f"Using color scale range over all months: {min_score:.2f} to {max_score:.2f}")
+
+    polygons = cell_polygons(grid_cells)
+    lines = _boundary_lines(projected_states)
+    name = '' if profile is DEFAULT_PROFILE else f'_{profile.name}'
+    os.makedirs('output', exist_ok=True)
+
+    sm = plt.cm.ScalarMappable(cmap=metric_colormap(metric), norm=plt.Normalize(min_score, max_score))
+    sm.set_array([])
+
+    if output == 'gif':
+        fig, ax = plt.subplots(1, 1, figsize=(12, 8))
+        collection = _draw_month(ax, metric, polygons, lines, cell_scores[:, 0], min_score, max_score, MONTH_NAMES[0])
+        fig.colorbar(sm, ax=ax, orientation='horizontal', pad=0.05, shrink=0.8).set_label(style['label'])
+
+        # Each frame only recolors the cells of the one collection
+        def update(month):
+            collection.set_facecolor(score_rgba(metric, cell_scores[:, month], min_score, max_score)[polygons[1]])
+            ax.set_title(f'{metric.title()} in {MONTH_NAMES[month]} ({grid_spacing_miles}-Mile Grid)', fontsize=15)
+            return collection,
+
+        output_file = f'output/map_grid_{metric}_monthly{name}.gif'
+        print(f"Saving monthly animation to {output_file}...")
+        FuncAnimation(fig, update, frames=12, blit=False).save(output_file, writer=PillowWriter(fps=fps), dpi=100)
+    elif output == 'grid':
+        fig, axes = plt.subplots(3, 4, figsize=(20, 12))
+        for month, ax in enumerate(axes.ravel()):
+            _draw_month(ax, metric, polygons, lines, cell_scores[:, month], min_score, max_score, MONTH_NAMES[month])
+        fig.suptitle(f'Continental US {metric.title()} by Month ({grid_spacing_miles}-Mile Grid)', fontsize=18)
+        fig.colorbar(sm, ax=axes, orientation='horizontal', pad=0.03, shrink=0.6).set_label(style['label'])
+
+        output_file = f'output/map_grid_{metric}_monthly{name}.png'
+        print(f"Saving monthly maps to {output_file}...")
+        fig.savefig(output_file, dpi=200, bbox_inches='tight')
+    else:
+        raise ValueError(f"Unknown output {output!r}, expected 'grid' or 'gif'")
+
+    plt.close(fig)
+    return output_file, cell_scores
+
+if __name__ == "__main__":
+    import argparse
+    from scoring_profiles import load_scoring_profiles
+
+    parser = argparse.ArgumentParser(description="Render a metric's monthly scores as small multiples or an animation.")
+    parser.add_argument('--metric', choices=list(METRICS), default='comfort')
+    parser.add_argument('--spacing', type=int, default=20, help="Grid spacing in miles")
+    parser.add_argument('--output', choices=['grid', 'gif'], default='grid')
+    parser.add_argument('--profiles', help="JSON file with scoring profiles, the first one is used")
+    parser.add_argument('--percentiles', type=int, nargs=2, metavar=('LOW', 'HIGH'))
+    args = parser.parse_args()
+
+    profile = load_scoring_profiles(args.profiles)[0] if args.profiles else None
+    create_seasonal_maps(args.metric, args.spacing, profile, args.output, args.percentiles)
@@ -0,0 +1,267 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import os
+import json
+import multiprocessing
+import shapely
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import box
+from map_grid import load_projected_states, grid_coordinates, generate_grid_cells
+from grid_scoring import METRICS, load_metric_stations, prepare_station_scoring, score_grid_cells
+from map_grid_render import score_rgba, cell_collection
+from spatial_order import grid_order
+
+# Default number of grid cells along each side of a block
+DEFAULT_BLOCK_CELLS = 64
+
+# Shared state for the block workers. It is filled in before the worker processes are
+# forked so the US boundary, station points and KD-tree are inherited instead of pickled.
+_block_state = {}
+
+def tile_directory(metric, grid_spacing_miles):
+    """
+    Directory holding the per-block score files for the given metric and spacing.
+    """
+    return f'computed/tiles/{metric}_{grid_spacing_miles}_miles'
+
+def output_tile_directory(tile_dir):
+    """
+    Directory in output/tiles/ holding the rendered PNGs of the blocks in tile_dir.
+    """
+    return os.path.join('output', 'tiles', os.path.basename(tile_dir))
+
+def iter_grid_blocks(n_columns, n_rows, block_cells=DEFAULT_BLOCK_CELLS):
+    """
+    Split a grid of n_columns x n_rows cells into square blocks.
+
+    Args:
+        n_columns (int): Number of grid cells along x
+        n_rows (int): Number of grid cells along y
+        block_cells (int): Number of grid cells along each side of a block
+
+    Yields:
+        tuple: (block_i, block_j, i_range, j_range) where the ranges are (start, stop) cell indices
+    """
+    for block_i, i_start in enumerate(range(0, n_columns, block_cells)):
+        for block_j, j_start in enumerate(range(0, n_rows, block_cells)):
+            i_range = (i_start, min(i_start + block_cells, n_columns))
+            j_range = (j_start, min(j_start + block_cells, n_rows))
+            yield block_i, block_j, i_range, j_range
+
+def _pack_geometries(geometries):
+    """
+    Serialize geometries to one WKB byte buffer plus offsets so they can be stored in an .npz without pickling.
+    """
+    wkb = shapely.to_wkb(geometries)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in wkb])
+    return np.frombuffer(b''.join(wkb), dtype=np.uint8), offsets
+
+def _unpack_geometries(wkb_data, offsets):
+    """
+    Inverse of _pack_geometries.
+    """
+    buffer = wkb_data.tobytes()
+    return shapely.from_wkb([buffer[offsets[k]:offsets[k+1]] for k in range(len(offsets) - 1)])
+
+def score_grid_block(block):
+    """
+    Generate, assign and score the grid cells of a single block and write them to disk.
+
+    Args:
+        block (tuple): (block_i, block_j, i_range, j_range) from iter_grid_blocks
+
+    Returns:
+        tuple: (block_file, number of cells), block_file is None for blocks outside the US
+    """
+    block_i, block_j, i_range, j_range = block
+    state = _block_state
+    x_grid, y_grid = state['x_grid'], state['y_grid']
+
+    block_box = box(x_grid[i_range[0]], y_grid[j_range[0]], x_grid[i_range[1]], y_grid[j_range[1]])
+    if not block_box.intersects(state['us_boundary']):
+        return None, 0
+
+    # Clipping the boundary to the block first keeps the per-cell intersections cheap
+    block_boundary = state['us_boundary'].intersection(block_box)
+    grid_cells, cell_indices = generate_grid_cells(block_boundary, x_grid, y_grid, i_range, j_range)
+    if not grid_cells:
+        return None, 0
+
+    scores, _, _ = score_grid_cells(
+        grid_cells, state['station_data'], state['station_scores'], state['kdtree'],
+        state['grid_spacing_miles'], show_progress=False
+    )
+
+    wkb_data, wkb_offsets = _pack_geometries(grid_cells)
+    block_file = os.path.join(state['tile_dir'], f'block_{block_i}_{block_j}.npz')
+    np.savez(
+        block_file,
+        cell_indices=np.array(cell_indices, dtype=np.int32),
+        scores=np.array(scores, dtype=np.float64),
+        wkb_data=wkb_data,
+        wkb_offsets=wkb_offsets,
+        bounds=np.array(block_box.bounds),
+    )
+
+    return block_file, len(grid_cells)
+
+def render_grid_block(block_file, metric, min_score, max_score, pixels_per_cell, grid_spacing_miles):
+    """
+    Render one block's cells to a transparent PNG next to the other tiles in output/tiles/.
+
+    Returns:
+        str: Path of the rendered PNG
+    """
+    with np.load(block_file) as data:
+        grid_cells = _unpack_geometries(data['wkb_data'], data['wkb_offsets'])
+        scores = data['scores']
+        minx, miny, maxx, maxy = data['bounds']
+
+    # Size the image so that each grid cell covers the same number of pixels in every tile
+    dpi = 100
+    grid_spacing_meters = grid_spacing_miles * 1609.34
+    width = (maxx - minx) / grid_spacing_meters * pixels_per_cell / dpi
+    height = (maxy - miny) / grid_spacing_meters * pixels_per_cell / dpi
+
+    fig = plt.figure(figsize=(width, height), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+
+    ax.add_collection(cell_collection(grid_cells, score_rgba(metric, scores, min_score, max_score)))
+
+    block_name = os.path.splitext(os.path.basename(block_file))[0]
+    output_dir = output_tile_directory(os.path.dirname(block_file))
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f'{block_name}.png')
+    fig.savefig(output_file, dpi=dpi, transparent=True)
+    plt.close(fig)
+
+    return output_file
+
+def _load_block_scores(block_file):
+    with np.load(block_file) as data:
+        return data['scores']
+
+def _render_grid_block(args):
+    return render_grid_block(*args)
+
+def create_tiled_grid_map(metric, grid_spacing_miles=5, block_cells=DEFAULT_BLOCK_CELLS, workers=1, pixels_per_cell=4):
+    """
+    Score and render the grid in independent square blocks so memory stays flat no matter how
+    fine the grid is. Each block's cells and scores are written to computed/tiles/ as soon as
+    they are scored, and a second pass renders one PNG per block using color ranges
+    calculated across all blocks.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (float): Grid spacing in miles
+        block_cells (int): Number of grid cells along each side of a block
+        workers (int): Number of worker processes used to score and render blocks
+        pixels_per_cell (int): Size of a grid cell in the rendered tiles, in pixels
+
+    Returns:
+        str: Path of the JSON index describing the blocks and their tiles
+    """
+    print(f"Loading station data for {metric} map...")
+    stations = load_metric_stations(metric)
+    print(f"Loaded {len(stations['station_ids'])} stations")
+
+    projected_states, us_boundary = load_projected_states()
+    x_grid, y_grid = grid_coordinates(us_boundary.bounds, grid_spacing_miles)
+
+    station_data, station_scores, kdtree = prepare_station_scoring(stations, metric)
+    if kdtree is None:
+        print("No valid station points found!")
+        return None
+
+    # Start from empty directories, blocks of an earlier run with another --block-cells would otherwise linger
+    tile_dir = tile_directory(metric, grid_spacing_miles)
+    for directory in (tile_dir, output_tile_directory(tile_dir)):
+        shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(tile_dir, exist_ok=True)
+
+    _block_state.update(
+        us_boundary=us_boundary,
+        x_grid=x_grid,
+        y_grid=y_grid,
+        station_data=station_data,
+        station_scores=station_scores,
+        kdtree=kdtree,
+        grid_spacing_miles=grid_spacing_miles,
+        tile_dir=tile_dir,
+    )
+
+    blocks = list(iter_grid_blocks(len(x_grid) - 1, len(y_grid) - 1, block_cells))
+    # Neighboring blocks query the same stations, so hand them out along a Hilbert curve
+    blocks = [blocks[k] for k in grid_order([(block_i, block_j) for block_i, block_j, _, _ in blocks])]
+    print(f"Scoring {len(blocks)} blocks of up to {block_cells}x{block_cells} cells with {workers} worker(s)...")
+
+    block_files = []
+    total_cells = 0
+
+    # Fork so the workers inherit _block_state instead of receiving it with every task
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            for i, (block_file, n_cells) in enumerate(executor.map(score_grid_block, blocks), 1):
+                print(f"\rScoring blocks: {i}/{len(blocks)}", end='')
+                if block_file:
+                    block_files.append(block_file)
+                    total_cells += n_cells
+    finally:
+        _block_state.clear()
+    print()
+    print(f"Scored {total_cells} grid cells in {len(block_files)} blocks")
+
+    if not block_files:
+        return None
+
+    # Only the score arrays are needed to find the color range
+    all_scores = np.concatenate([_load_block_scores(block_file) for block_file in block_files])
+    low, high = METRICS[metric]['percentiles']
+    min_score = np.percentile(all_scores, low)
+    max_score = np.percentile(all_scores, high)
+    print(f"Using color scale range ({low}-{high} percentile): {min_score:.2f} to {max_score:.2f}")
+
+    render_args = [(block_file, metric, min_score, max_score, pixels_per_cell, grid_spacing_miles) for block_file in block_files]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+        tiles = list(executor.map(_render_grid_block, render_args))
+
+    index_file = os.path.join(tile_dir, 'index.json')
+    with open(index_file, 'w') as f:
+        json.dump({
+            'metric': metric,
+            'grid_spacing_miles': grid_spacing_miles,
+            'block_cells': block_cells,
+            'min_score': min_score,
+            'max_score': max_score,
+            'blocks': [
+                {'scores': block_file, 'tile': tile}
+                for block_file, tile in zip(block_files, tiles)
+            ],
+        }, f, indent=2)
+
+    print(f"Rendered {len(tiles)} tiles, index written to {index_file}")
+    return index_file
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score and render a fine grid in independent blocks.")
+    parser.add_argument('metric', choices=sorted(METRICS))
+    parser.add_argument('grid_spacing_miles', type=int)
+    parser.add_argument('--block-cells', type=int, default=DEFAULT_BLOCK_CELLS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--pixels-per-cell', type=int, default=4)
+    args = parser.parse_args()
+
+    create_tiled_grid_map(
+        args.metric,
+        grid_spacing_miles=args.grid_spacing_miles,
+        block_cells=args.block_cells,
+        workers=args.workers,
+        pixels_per_cell=args.pixels_per_cell,
+    )
@@ -0,0 +1,123 @@
+import multiprocessing
+import numpy as np
+import os
+import time
+from PIL import Image
+
+OUTPUT_FORMATS = ('png', 'svg', 'pdf', 'webp')
+
+# Shared state for the format workers. It is filled in before the worker processes are
+# forked so the finished figure is inherited instead of being pickled or drawn again.
+_output_state = {}
+
+def compress_png(path, colors=None):
+    """
+    Rewrite a PNG with maximum zlib compression. An image with at most 256 distinct colors is
+    stored as a palette image, which is lossless. With colors set, the image is quantized to
+    that many colors first, which is lossy but much smaller for antialiased maps.
+
+    Args:
+        path (str): Path of the PNG, rewritten in place
+        colors (int): Optional number of palette colors to quantize to
+
+    Returns:
+        bool: True if the PNG was stored as a palette image
+    """
+    with Image.open(path) as image:
+        image = image.convert('RGBA')
+
+    if colors:
+        # Fast octree is the only quantizer Pillow supports for images with transparency
+        image = image.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    else:
+        pixels = np.asarray(image).reshape(-1, 4)
+        palette, indices = np.unique(pixels, axis=0, return_inverse=True)
+        if len(palette) <= 256:
+            image = Image.fromarray(indices.reshape(image.height, image.width).astype(np.uint8), 'P')
+            image.putpalette(palette.tobytes(), rawmode='RGBA')
+
+    image.save(path, optimize=True)
+    return image.mode == 'P'
+
+def _save_format(output_format):
+    """
+    Save the shared figure in one format inside a worker process.
+
+    Returns:
+        tuple: (format, path, seconds)
+    """
+    state = _output_state
+    start = time.time()
+
+    if state['prepare'] is not None:
+        state['prepare'](state['figure'], output_format)
+
+    path = f"{state['output_base']}.{output_format}"
+    kwargs = {}
+    if output_format == 'webp':
+        kwargs['pil_kwargs'] = {'lossless': True, 'method': 6}
+    state['figure'].savefig(path, format=output_format, dpi=state['dpi'], bbox_inches=state['bbox_inches'], **kwargs)
+
+    if output_format == 'png' and (state['compress_png'] or state['png_colors']):
+        compress_png(path, state['png_colors'])
+
+    return output_format, path, time.time() - start
+
+def save_figure_formats(fig, output_base, formats=('png',), dpi=300, compress_png=False, png_colors=None,
+                        workers=None, prepare=None, bbox_inches='tight'):
+    """
+    Save one finished figure in several formats, each written by its own forked worker process.
+    The scene is drawn once by the caller, the workers only render it to their format.
+
+    Args:
+        fig (matplotlib.figure.Figure): The finished figure
+        output_base (str): Output path without extension, e.g. 'output/map_grid_comfort'
+        formats (tuple): Any of 'png', 'svg', 'pdf' and 'webp'
+        dpi (int): Resolution of the raster formats
+        compress_png (bool): If True, losslessly recompress the PNG, see compress_png
+        png_colors (int): Optional number of colors to quantize the PNG to (lossy)
+        workers (int): Number of worker processes, one per format if not given
+        prepare (callable): Optional prepare(fig, format) called in the worker before saving,
+                            e.g. to swap in simplified geometry for the vector formats. It
+                            always runs in a worker, so the caller's figure is left unchanged
+        bbox_inches (str): Passed to savefig
+
+    Returns:
+        dict: Path of the saved file for each format
+    """
+    unknown = set(formats) - set(OUTPUT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output formats {sorted(unknown)}, expected any of {list(OUTPUT_FORMATS)}")
+
+    os.makedirs(os.path.dirname(output_base) or '.', exist_ok=True)
+    workers = min(workers or len(formats), len(formats))
+
+    _output_state.update(
+        figure=fig,
+        output_base=output_base,
+        dpi=dpi,
+        compress_png=compress_png,
+        png_colors=png_colors,
+        prepare=prepare,
+        bbox_inches=bbox_inches,
+    )
+
+    start = time.time()
+    try:
+        if workers > 1 or prepare is not None:
+            # Fork so the workers inherit the figure instead of receiving it pickled. One task per
+            # child means each format starts from the caller's figure, whatever prepare() changed.
+            with multiprocessing.get_context('fork').Pool(workers, maxtasksperchild=1) as pool:
+                results = pool.map(_save_format, formats, chunksize=1)
+        else:
+            results = [_save_format(output_format) for output_format in formats]
+    finally:
+        _output_state.clear()
+
+    paths = {}
+    for output_format, path, seconds in results:
+        print(f"Saved {path} in {seconds:.2f} seconds ({os.path.getsize(path) / 1e6:.2f} MB)")
+        paths[output_format] = path
+    print(f"Saved {len(paths)} format(s) in {time.time() - start:.2f} seconds")
+
+    return paths
@@ -3,10 +3,11 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
-from scipy.spatial import cKDTree
 import time
 import re
 from matplotlib.colors import Normalize
+from map_output import OUTPUT_FORMATS, save_figure_formats
+from spatial_index import load_kdtree
 
 def calculate_comfort_score(temp_f):
     """
@@ -72,7 +73,11 @@ def calculate_precipitation_score(station_id, base_dir="noaa/normals-monthly"):
         print(f"Error processing precipitation data for station {station_id}: {e}")
         return 0
 
-def create_comfort_score_map():
+def create_comfort_score_map(formats=('png', 'svg'), compress_png=False, png_colors=None):
+    """
+    Create the zipcode comfort score map and save it in the given formats, see
+    map_output.save_figure_formats. SVG and PDF use simplified zipcode shapes.
+    """
     start_time = time.time()
     
     # Step 1: Load and process the temperature data
@@ -210,8 +215,8 @@ def create_comfort_score_map():
         # Extract centroids for all zip codes with score data
         has_score_centroids = np.array([(p.x, p.y) for p in has_score.geometry.centroid])
         
-        # Build KDTree for fast nearest neighbor lookup
-        tree = cKDTree(has_score_centroids)
+        # KD-tree for fast nearest neighbor lookup, stored in computed/ for the next run
+        tree = load_kdtree(has_score_centroids, 'zipcode_centroids')
         
         # Extract centroids for all missing zip codes
         missing_centroids = np.array([(p.x, p.y) for p in still_missing.geometry.centroid])
@@ -273,41 +278,42 @@ def create_comfort_score_map():
     ax.set_title('Continental US Temperature Comfort Score\n(Higher = More Days Near 72°F)', fontsize=15)
     ax.set_axis_off()
     
-    # Save the map to output directory
-    output_file = 'output/continental_us_comfort_score.png'
-    print(f"Saving comfort score map to {output_file}...")
-    plt.savefig(output_file, dpi=600, bbox_inches='tight')
-    
-    # Create a simplified version for SVG
-    print("Creating simplified SVG comfort score map...")
-    simplified_gdf = merged_gdf.copy()
-    simplified_gdf['geometry'] = simplified_gdf['geometry'].simplify(tolerance=0.01, preserve_topology=True)
-    
-    fig, ax = plt.subplots(1, 1, figsize=(15, 10))
-    
-    # Use the same normalization for the simplified map
-    simplified_gdf.plot(
-        column='comfort_score',
-        cmap=cmap,
-        linewidth=0.1,
-        edgecolor='gray',
-        ax=ax,
-        legend=True,
-        norm=norm,
-        legend_kwds={'label': 'Temperature Comfort Score', 'orientation': 'horizontal'}
-    )
-    
-    ax.set_xlim(-125, -66)
-    ax.set_ylim(24, 50)
-    
-    ax.set_title('Continental US Temperature Comfort Score\n(Higher = More Days Near 72°F)', fontsize=15)
-    ax.set_axis_off()
-    
-    svg_output = 'output/continental_us_comfort_score_simplified.svg'
-    print(f"Saving simplified comfort score map to {svg_output}...")
-    plt.savefig(svg_output, format='svg', bbox_inches='tight')
+    # Save every format from this one figure. The vector formats swap in simplified zipcode
+    # shapes inside their worker process, instead of drawing a second figure for them.
+    def simplify_vector_output(fig, output_format):
+        if output_format not in ('svg', 'pdf'):
+            return
+        print(f"Simplifying zipcode shapes for {output_format}...")
+        simplified_gdf = merged_gdf.copy()
+        simplified_gdf['geometry'] = simplified_gdf['geometry'].simplify(tolerance=0.01, preserve_topology=True)
+        
+        # Redraw only the zipcodes, the legend and title stay as they are
+        ax.collections[0].remove()
+        simplified_gdf.plot(
+            column='comfort_score',
+            cmap=cmap,
+            linewidth=0.1,
+            edgecolor='gray',
+            ax=ax,
+            norm=norm
+        )
+        ax.set_xlim(-125, -66)
+        ax.set_ylim(24, 50)
+    
+    output_base = 'output/continental_us_comfort_score'
+    print(f"Saving comfort score map as {', '.join(formats)}...")
+    save_figure_formats(fig, output_base, formats, dpi=600, compress_png=compress_png,
+                        png_colors=png_colors, prepare=simplify_vector_output)
     
     print(f"Comfort score maps created successfully in {time.time() - start_time:.2f} seconds!")
 
 if __name__ == "__main__":
-    create_comfort_score_map()
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=['png', 'svg'], help="Output formats, written in parallel")
+    parser.add_argument('--compress-png', action='store_true', help="Losslessly recompress the PNG")
+    parser.add_argument('--png-colors', type=int, help="Quantize the PNG to this many colors (lossy)")
+    args = parser.parse_args()
+    
+    create_comfort_score_map(args.formats, args.compress_png, args.png_colors)
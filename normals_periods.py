@@ -0,0 +1,114 @@
+import numpy as np
+import os
+from load_stations_zipcodes import ZIPCODES_NORMALS_STATIONS
+from load_stations_daily_temp import DAILY_TMAX_NORMAL_FILE
+from load_stations_monthly_precip import MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE
+
+# Every station ID seen in any period, see encode_station_ids
+STATION_ID_DICTIONARY = 'computed/station_ids.npz'
+
+class NormalsPeriod:
+    """
+    The data files of one NOAA climate normals period, in the layouts the loaders read.
+    """
+    def __init__(self, name, zipcodes_file, daily_tmax_file, monthly_precip_dir, monthly_precip_archive):
+        self.name = name
+        self.zipcodes_file = zipcodes_file
+        self.daily_tmax_file = daily_tmax_file
+        self.monthly_precip_dir = monthly_precip_dir
+        self.monthly_precip_archive = monthly_precip_archive
+
+    def paths(self):
+        """
+        The period's files as keyword arguments of load_stations().
+        """
+        return {
+            'zipcodes_file': self.zipcodes_file,
+            'daily_tmax_file': self.daily_tmax_file,
+            'monthly_precip_dir': self.monthly_precip_dir,
+            'monthly_precip_archive': self.monthly_precip_archive,
+        }
+
+    def sources(self):
+        """
+        Every file load_stations() reads for the period, for source_fingerprint.
+        """
+        return list(self.paths().values())
+
+    def __repr__(self):
+        return f"NormalsPeriod({self.name!r})"
+
+def _period_files(name):
+    directory = f'noaa/{name}'
+    return NormalsPeriod(
+        name,
+        f'{directory}/zipcodes-normals-stations.txt',
+        f'{directory}/dly-tmax-normal.txt',
+        f'{directory}/normals-monthly/',
+        f'{directory}/normals-monthly.npz',
+    )
+
+# The period the rest of the code was built around keeps its files directly in noaa/
+DEFAULT_PERIOD = '1981-2010'
+
+NORMALS_PERIODS = {
+    DEFAULT_PERIOD: NormalsPeriod(DEFAULT_PERIOD, ZIPCODES_NORMALS_STATIONS, DAILY_TMAX_NORMAL_FILE,
+                                  MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE),
+    '1991-2020': _period_files('1991-2020'),
+    '2006-2020': _period_files('2006-2020'),
+}
+
+def get_normals_period(name):
+    """
+    Look up a normals period by name, e.g. '1991-2020'.
+    """
+    if name not in NORMALS_PERIODS:
+        raise ValueError(f"Unknown normals period {name!r}, expected one of {list(NORMALS_PERIODS)}")
+    return NORMALS_PERIODS[name]
+
+def load_station_id_dictionary():
+    """
+    Load the station IDs of every period, in the order they were first seen. A station's
+    position in the array is its code in every period's station cache.
+    """
+    if not os.path.exists(STATION_ID_DICTIONARY):
+        return np.array([], dtype=str)
+    with np.load(STATION_ID_DICTIONARY) as stored:
+        return stored['station_ids']
+
+def encode_station_ids(station_ids):
+    """
+    Map station IDs to their codes in the shared dictionary, adding the IDs it doesn't have
+    yet at the end so the codes already stored with other periods stay valid. Stations that
+    appear in several periods get the same code in each, so periods can be lined up by
+    comparing integers instead of strings.
+
+    Returns:
+        array: int32 code of each station
+    """
+    dictionary = load_station_id_dictionary()
+    codes = {station_id: code for code, station_id in enumerate(dictionary.tolist())}
+
+    new_ids = [station_id for station_id in dict.fromkeys(np.asarray(station_ids, dtype=str).tolist()) if station_id not in codes]
+    if new_ids:
+        codes.update(zip(new_ids, range(len(codes), len(codes) + len(new_ids))))
+        os.makedirs(os.path.dirname(STATION_ID_DICTIONARY), exist_ok=True)
+        np.savez(STATION_ID_DICTIONARY, station_ids=np.array(list(codes), dtype=str))
+
+    return np.array([codes[station_id] for station_id in np.asarray(station_ids, dtype=str).tolist()], dtype=np.int32)
+
+def decode_station_ids(station_codes):
+    """
+    Station IDs of the codes from encode_station_ids.
+    """
+    return load_station_id_dictionary()[np.asarray(station_codes, dtype=np.int64)]
+
+def align_periods(codes, other_codes):
+    """
+    Line up the stations two periods have in common.
+
+    Returns:
+        tuple: (rows, other_rows) index arrays, so codes[rows] == other_codes[other_rows]
+    """
+    _, rows, other_rows = np.intersect1d(codes, other_codes, assume_unique=True, return_indices=True)
+    return rows, other_rows
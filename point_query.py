@@ -0,0 +1,118 @@
+import numpy as np
+from grid_scoring import project_coordinates
+from scoring_profiles import DEFAULT_PROFILE, batch_station_scores
+from spatial_index import load_kdtree
+from spatial_order import hilbert_order
+from station_cache import load_station_cache, metric_station_mask, select_stations
+
+# Projected station points, scores and KD-tree per (metric, profile), built on the first query
+# and reused by every later one in the same process
+_query_state = {}
+
+def _profile_key(profile):
+    return tuple(sorted(profile.to_dict().items()))
+
+def metric_query_state(metric, profile=None):
+    """
+    Get the station IDs, scores and KD-tree over the projected stations that can be scored
+    for the metric, building and caching them on first use. The KD-tree is stored in
+    computed/ (see spatial_index.load_kdtree), so a new process starts with it in hand.
+
+    Returns:
+        dict: 'station_ids', 'scores' and 'kdtree'
+    """
+    profile = profile or DEFAULT_PROFILE
+    key = (metric, _profile_key(profile))
+
+    if key not in _query_state:
+        cache = load_station_cache()
+        stations = select_stations(cache, metric_station_mask(cache, metric))
+        if not len(stations['station_ids']):
+            raise ValueError(f"No stations with {metric} data")
+
+        _query_state[key] = {
+            'station_ids': stations['station_ids'],
+            'scores': batch_station_scores(metric, [profile], stations['daily_max'], stations['rainy_days'], summary=stations)[0],
+            'kdtree': load_kdtree(np.column_stack([stations['x'], stations['y']]), f'cache_stations_{metric}'),
+        }
+
+    return _query_state[key]
+
+def scores_at(latitudes, longitudes, metric='comfort', method='nearest', k=8, power=2, profile=None):
+    """
+    Score many locations at once.
+
+    Args:
+        latitudes (array): Latitudes of the locations
+        longitudes (array): Longitudes of the locations
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        method (str): 'nearest' for the score of the nearest station, or 'idw' for the
+                      inverse distance weighted score of the k nearest stations
+        k (int): Number of stations used by 'idw'
+        power (float): Power of the distance used by 'idw' weights
+        profile (ScoringProfile): Scoring profile, DEFAULT_PROFILE if not given
+
+    Returns:
+        tuple: (scores, station_ids, distances) where scores has one entry per location and
+               station_ids and distances (in meters) are (locations, stations) arrays of the
+               stations that contributed to each score
+    """
+    state = metric_query_state(metric, profile)
+
+    # Same equal-area CRS as the grid, so distances are in meters
+    x, y = project_coordinates(longitudes, latitudes)
+    points = np.column_stack([np.atleast_1d(x), np.atleast_1d(y)])
+
+    if method == 'nearest':
+        k = 1
+    elif method != 'idw':
+        raise ValueError(f"Unknown method {method!r}, expected 'nearest' or 'idw'")
+
+    k = min(k, len(state['station_ids']))
+
+    # Querying the locations along a Hilbert curve walks the KD-tree (and the spatially sorted
+    # station arrays) in order, the results are put back in the order of the locations
+    order = hilbert_order(points[:, 0], points[:, 1])
+    distances = np.empty((len(points), k))
+    nearest = np.empty((len(points), k), dtype=np.intp)
+    sorted_distances, sorted_nearest = state['kdtree'].query(points[order], k=k)
+    distances[order] = sorted_distances.reshape(len(points), k)
+    nearest[order] = sorted_nearest.reshape(len(points), k)
+    station_scores = state['scores'][nearest]
+
+    if method == 'nearest':
+        scores = station_scores[:, 0]
+    else:
+        with np.errstate(divide='ignore'):
+            weights = 1 / distances ** power
+        # A location right on top of a station takes that station's score
+        exact = distances == 0
+        on_station = exact.any(axis=1)
+        weights[on_station] = exact[on_station]
+        scores = (weights * station_scores).sum(axis=1) / weights.sum(axis=1)
+
+    return scores, state['station_ids'][nearest], distances
+
+def score_at(latitude, longitude, metric='comfort', method='nearest', k=8, power=2, profile=None):
+    """
+    Score a single location, see scores_at.
+
+    Returns:
+        tuple: (score, station_ids) with the IDs of the stations that contributed to the score
+    """
+    scores, station_ids, _ = scores_at([latitude], [longitude], metric, method, k, power, profile)
+    return float(scores[0]), station_ids[0].tolist()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a location.")
+    parser.add_argument('latitude', type=float)
+    parser.add_argument('longitude', type=float)
+    parser.add_argument('--metric', choices=['temperature', 'precipitation', 'comfort'], default='comfort')
+    parser.add_argument('--method', choices=['nearest', 'idw'], default='nearest')
+    parser.add_argument('-k', type=int, default=8, help="Number of stations used by idw")
+    args = parser.parse_args()
+
+    score, station_ids = score_at(args.latitude, args.longitude, args.metric, args.method, args.k)
+    print(f"{args.metric.title()} score at {args.latitude}, {args.longitude}: {score:.2f} (stations: {', '.join(station_ids)})")
@@ -0,0 +1,140 @@
+import hashlib
+import numpy as np
+import os
+from load_stations_zipcodes import ZIPCODES_NORMALS_STATIONS
+from load_stations_daily_temp import DAILY_TMAX_NORMAL_FILE
+from load_stations_monthly_precip import MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE
+from grid_scoring import load_metric_stations, prepare_station_scoring, score_grid_cells, scoring_fingerprint
+from grid_incremental import update_grid_scores
+
+# Bump when the layout of the cache files changes so old files are ignored
+SCORE_CACHE_VERSION = 1
+
+# Data files each metric's stations are loaded from, all of them go into the station cache
+METRIC_SOURCES = {
+    'temperature': [ZIPCODES_NORMALS_STATIONS, DAILY_TMAX_NORMAL_FILE, MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE],
+    'precipitation': [ZIPCODES_NORMALS_STATIONS, DAILY_TMAX_NORMAL_FILE, MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE],
+    'comfort': [ZIPCODES_NORMALS_STATIONS, DAILY_TMAX_NORMAL_FILE, MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE],
+}
+
+def source_fingerprint(paths, stat_files=True):
+    """
+    Hash the name, size and modification time of the data files (or of every file in a directory)
+    so changed station data can be detected without reading or parsing it.
+
+    With stat_files=False a directory only contributes its own modification time and number of
+    entries. That notices files being added, removed or replaced by renaming (as downloads do)
+    without a stat of every file, which adds up for the ~9,800 precipitation CSVs on a network mount.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path) and not stat_files:
+            digest.update(f"{os.path.normpath(path)}:{os.stat(path).st_mtime_ns}:{len(os.listdir(path))}".encode())
+            continue
+        if os.path.isdir(path):
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        elif os.path.exists(path):
+            entries = [path]
+        else:
+            digest.update(f"{path}:missing".encode())
+            continue
+        for entry in entries:
+            stat = os.stat(entry)
+            digest.update(f"{os.fspath(entry)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+def score_cache_key(metric):
+    """
+    Key that changes whenever the metric's station data or the scoring code change.
+    """
+    return hashlib.sha1(
+        f"{SCORE_CACHE_VERSION}:{source_fingerprint(METRIC_SOURCES[metric], stat_files=False)}:{scoring_fingerprint()}".encode()
+    ).hexdigest()[:16]
+
+def score_cache_file(metric, grid_spacing_miles):
+    """
+    Path of the cached scores for the current station data and scoring code.
+    """
+    return f'computed/scores_{metric}_{grid_spacing_miles}_miles_{score_cache_key(metric)}.npz'
+
+def remove_other_cache_files(cache_file):
+    """
+    Delete the files cached for older station data or scoring code next to cache_file, i.e. the
+    ones whose name only differs in the key at the end. Nothing ever reads them again.
+    """
+    directory, name = os.path.split(cache_file)
+    prefix, extension = name.rsplit('_', 1)[0] + '_', os.path.splitext(name)[1]
+    for entry in os.scandir(directory or '.'):
+        key = entry.name[len(prefix):-len(extension)]
+        if (entry.name.startswith(prefix) and entry.name.endswith(extension) and len(key) == 16 and '_' not in key
+                and entry.name != name):
+            os.remove(entry.path)
+
+def compute_grid_scores(metric, grid_spacing_miles, grid_cells, workers=1, incremental=False):
+    """
+    Load the stations for a metric and score every grid cell.
+
+    Returns:
+        tuple: (scores, cells_with_assigned_stations, cells_with_nearest_stations)
+    """
+    print(f"Loading {metric} data from stations...")
+    stations = load_metric_stations(metric)
+    print(f"Loaded {metric} data for {len(stations['station_ids'])} stations")
+
+    if incremental:
+        # Reuse the last run's results for everything that doesn't depend on a changed station
+        return update_grid_scores(metric, grid_spacing_miles, grid_cells, stations)
+
+    # Score the stations and load the KD-tree over the projected points the station cache holds
+    station_data, station_scores, kdtree = prepare_station_scoring(stations, metric)
+
+    if kdtree is None:
+        print("No valid station points found!")
+        return [], 0, 0
+
+    # Calculate scores for each grid cell
+    print(f"Calculating {metric} scores for each grid cell...")
+    return score_grid_cells(grid_cells, station_data, station_scores, kdtree, grid_spacing_miles, label=metric, workers=workers)
+
+def get_grid_scores(metric, grid_spacing_miles, grid_cells, workers=1, incremental=False, force_recalculate=False):
+    """
+    Get the score of every grid cell, from the cache in computed/ when the station data and
+    scoring code haven't changed since the scores were saved. A cache hit skips loading the
+    stations entirely, so re-rendering with different colors or percentiles is fast.
+
+    Args:
+        metric (str): One of 'temperature', 'precipitation' or 'comfort'
+        grid_spacing_miles (int): Grid spacing in miles
+        grid_cells (list): Shapely polygons for each grid cell
+        workers (int): Number of worker processes used to score the grid cells
+        incremental (bool): If True, only rescore stations and cells affected by station changes
+        force_recalculate (bool): If True, ignore cached scores
+
+    Returns:
+        tuple: (scores, cells_with_assigned_stations, cells_with_nearest_stations)
+    """
+    cache_file = score_cache_file(metric, grid_spacing_miles)
+
+    if not force_recalculate and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            # The grid itself could have been regenerated since
+            if len(cached['scores']) == len(grid_cells):
+                print(f"Loaded {metric} scores from cache: {cache_file}")
+                return cached['scores'].tolist(), int(cached['cells_with_assigned_stations']), int(cached['cells_with_nearest_stations'])
+
+    scores, cells_with_assigned_stations, cells_with_nearest_stations = compute_grid_scores(
+        metric, grid_spacing_miles, grid_cells, workers, incremental
+    )
+
+    if scores:
+        os.makedirs('computed', exist_ok=True)
+        np.savez(
+            cache_file,
+            scores=np.array(scores, dtype=np.float64),
+            cells_with_assigned_stations=cells_with_assigned_stations,
+            cells_with_nearest_stations=cells_with_nearest_stations,
+        )
+        print(f"Saved {metric} scores to cache: {cache_file}")
+        remove_other_cache_files(cache_file)
+
+    return scores, cells_with_assigned_stations, cells_with_nearest_stations
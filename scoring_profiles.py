@@ -0,0 +1,264 @@
+import json
+import numpy as np
+
+class ScoringProfile:
+    """
+    Preferences used to turn a station's weather into comfort scores.
+
+    The temperature score of a day is max_points at ideal_temp and drops by cold_points_loss
+    per degree below it and hot_points_loss per degree above it. Each rainy day (≥0.5")
+    is worth rainy_day_points, averaged over the 366 days of the year.
+    """
+    def __init__(self, name='default', ideal_temp=72, max_points=40, cold_points_loss=1, hot_points_loss=3, rainy_day_points=30):
+        self.name = name
+        self.ideal_temp = ideal_temp
+        self.max_points = max_points
+        self.cold_points_loss = cold_points_loss
+        self.hot_points_loss = hot_points_loss
+        self.rainy_day_points = rainy_day_points
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"ScoringProfile({', '.join(f'{key}={value!r}' for key, value in vars(self).items())})"
+
+# The preferences the maps were originally built around
+DEFAULT_PROFILE = ScoringProfile()
+
+def load_scoring_profiles(path):
+    """
+    Load scoring profiles from a JSON file containing a list of objects, e.g.
+    [{"name": "likes-heat", "ideal_temp": 80, "hot_points_loss": 1}, ...].
+    Settings that are left out keep their default values.
+
+    Returns:
+        list: ScoringProfile objects
+    """
+    with open(path, 'r') as f:
+        return [ScoringProfile(**settings) for settings in json.load(f)]
+
+def station_arrays(stations):
+    """
+    Pack the stations' weather data into arrays for batched scoring.
+
+    Args:
+        stations (list): Station objects
+
+    Returns:
+        tuple: (daily_max, rainy_days) where daily_max is a (stations, 12, 31) array with NaN
+               for missing days and stations without temperature data, and rainy_days is a
+               (stations, 12) array of zeros for stations without precipitation data
+    """
+    daily_max = np.full((len(stations), 12, 31), np.nan)
+    rainy_days = np.zeros((len(stations), 12))
+
+    for k, station in enumerate(stations):
+        if station.avg_daily_max_temperature is not None:
+            daily_max[k] = np.array(station.avg_daily_max_temperature, dtype=float)  # None becomes NaN
+        if station.avg_rainy_days_per_month:
+            rainy_days[k] = station.avg_rainy_days_per_month
+
+    return daily_max, rainy_days
+
+def _profile_parameters(profiles, name):
+    return np.array([getattr(profile, name) for profile in profiles], dtype=float)
+
+def batch_temperature_scores(profiles, daily_max, chunk_size=256):
+    """
+    Score every station for every profile in one broadcast over (profiles, stations, days),
+    matching Station.get_temperature_score.
+
+    Args:
+        profiles (list): ScoringProfile objects
+        daily_max (array): (stations, 12, 31) daily maximum temperatures from station_arrays
+        chunk_size (int): Number of stations broadcast at once, bounding the temporary arrays
+
+    Returns:
+        array: (profiles, stations) average daily temperature scores
+    """
+    # Shape parameters as (profiles, 1, 1) so they broadcast against (stations, days)
+    ideal_temp = _profile_parameters(profiles, 'ideal_temp')[:, None, None]
+    max_points = _profile_parameters(profiles, 'max_points')[:, None, None]
+    cold_points_loss = _profile_parameters(profiles, 'cold_points_loss')[:, None, None]
+    hot_points_loss = _profile_parameters(profiles, 'hot_points_loss')[:, None, None]
+
+    days = daily_max.reshape(len(daily_max), -1)
+    valid_days = np.count_nonzero(~np.isnan(days), axis=1)
+    scores = np.zeros((len(profiles), len(days)))
+
+    for start in range(0, len(days), chunk_size):
+        temps = days[None, start:start + chunk_size]
+        difference = temps - ideal_temp
+        day_scores = np.where(
+            difference <= 0,
+            max_points + difference * cold_points_loss,  # colder than ideal
+            max_points - difference * hot_points_loss,   # hotter than ideal
+        )
+        scores[:, start:start + chunk_size] = np.nansum(day_scores, axis=2)
+
+    # Average across all valid days, stations without temperature data score 0
+    return np.divide(scores, valid_days, out=np.zeros_like(scores), where=valid_days > 0)
+
+# Padding after a station's valid days in the sorted summaries, above any real temperature (tenths of °F)
+MISSING_DAY_TENTHS = 10000
+
+def temperature_summary(daily_max):
+    """
+    Reduce each station's daily maximum temperatures to a sorted array with cumulative sums.
+    The temperature score is piecewise linear with one kink at the ideal temperature, so the
+    number and sum of the days on either side of the kink are all any profile needs, and both
+    can be found with a binary search instead of a pass over every day.
+
+    Temperatures are kept as integer tenths of °F (the resolution of the NOAA data), so the
+    sums are exact and the summary can be stored compactly in the station cache.
+
+    Args:
+        daily_max (array): (stations, 12, 31) daily maximum temperatures from station_arrays
+
+    Returns:
+        dict: 'tmax_sorted' (stations, 372) int16 tenths padded with MISSING_DAY_TENTHS,
+              'tmax_cumsum' (stations, 373) int64 running sums starting at 0 and
+              'tmax_days' (stations,) number of valid days
+    """
+    days = daily_max.reshape(len(daily_max), -1)
+    valid = ~np.isnan(days)
+    tenths = np.where(valid, np.round(np.nan_to_num(days) * 10), MISSING_DAY_TENTHS).astype(np.int16)
+    tmax_sorted = np.sort(tenths, axis=1)
+
+    tmax_days = np.count_nonzero(valid, axis=1)
+    in_range = np.arange(days.shape[1]) < tmax_days[:, None]
+    tmax_cumsum = np.zeros((len(days), days.shape[1] + 1), dtype=np.int64)
+    tmax_cumsum[:, 1:] = np.cumsum(np.where(in_range, tmax_sorted, 0), axis=1)
+
+    return {'tmax_sorted': tmax_sorted, 'tmax_cumsum': tmax_cumsum, 'tmax_days': tmax_days}
+
+def summary_temperature_scores(profiles, summary):
+    """
+    Score every station for every profile from the summaries built by temperature_summary,
+    in O(log days) per station and profile. Matches batch_temperature_scores.
+
+    Returns:
+        array: (profiles, stations) average daily temperature scores
+    """
+    tmax_sorted, tmax_cumsum, tmax_days = summary['tmax_sorted'], summary['tmax_cumsum'], summary['tmax_days']
+    n_stations, n_slots = tmax_sorted.shape
+
+    # Shift every station's row into its own range of values so one searchsorted covers all of them
+    row_width = 2 * MISSING_DAY_TENTHS + 1
+    row_offset = np.arange(n_stations, dtype=np.int64) * row_width + MISSING_DAY_TENTHS
+    flat = (tmax_sorted + row_offset[:, None]).ravel()
+    row_start = np.arange(n_stations) * n_slots
+    total = tmax_cumsum[np.arange(n_stations), tmax_days] / 10
+
+    scores = np.zeros((len(profiles), n_stations))
+    for p, profile in enumerate(profiles):
+        # Number of days at or below the ideal temperature in each station
+        cold_days = np.searchsorted(flat, profile.ideal_temp * 10 + row_offset, side='right') - row_start
+        cold_days = np.clip(cold_days, 0, tmax_days)
+        hot_days = tmax_days - cold_days
+
+        cold_sum = tmax_cumsum[np.arange(n_stations), cold_days] / 10
+        hot_sum = total - cold_sum
+
+        day_scores = (
+            profile.max_points * tmax_days
+            - profile.cold_points_loss * (cold_days * profile.ideal_temp - cold_sum)
+            - profile.hot_points_loss * (hot_sum - hot_days * profile.ideal_temp)
+        )
+        scores[p] = np.divide(day_scores, tmax_days, out=np.zeros(n_stations), where=tmax_days > 0)
+
+    return scores
+
+def batch_precipitation_scores(profiles, rainy_days):
+    """
+    Score every station for every profile, matching Station.get_precipitation_score.
+
+    Returns:
+        array: (profiles, stations) precipitation scores
+    """
+    rainy_day_points = _profile_parameters(profiles, 'rainy_day_points')[:, None]
+    return rainy_days.sum(axis=1)[None, :] * rainy_day_points / 366
+
+def batch_station_scores(metric, profiles, daily_max, rainy_days, summary=None):
+    """
+    Score every station for every profile for one of the grid metrics.
+    When the temperature summary from temperature_summary is given it is used instead of the daily data.
+
+    Returns:
+        array: (profiles, stations) scores
+    """
+    def temperature_scores():
+        if summary is not None:
+            return summary_temperature_scores(profiles, summary)
+        return batch_temperature_scores(profiles, daily_max)
+
+    if metric == 'temperature':
+        return temperature_scores()
+    if metric == 'precipitation':
+        return batch_precipitation_scores(profiles, rainy_days)
+    return temperature_scores() + batch_precipitation_scores(profiles, rainy_days)
+
+# Days in each month of the 366-day year the normals cover, Feb 29 included
+MONTH_DAYS = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def daily_temperature_scores(profile, daily_max):
+    """
+    Score every day of every station for one profile, matching the per-day score of
+    Station.get_temperature_score. Works on temperatures of any shape, e.g. hourly ones.
+
+    Args:
+        profile (ScoringProfile): The profile
+        daily_max (array): (stations, 12, 31) daily maximum temperatures from station_arrays
+
+    Returns:
+        array: Day scores in the shape of daily_max, NaN for missing days
+    """
+    difference = daily_max - profile.ideal_temp
+    return np.where(
+        difference <= 0,
+        profile.max_points + difference * profile.cold_points_loss,  # colder than ideal
+        profile.max_points - difference * profile.hot_points_loss,   # hotter than ideal
+    )
+
+def monthly_temperature_scores(profiles, daily_max):
+    """
+    Average the day scores of each month, one profile at a time so the temporary arrays
+    stay the size of the temperature data.
+
+    Returns:
+        array: (profiles, stations, 12) average temperature score of each month, 0 for months
+               without data
+    """
+    valid_days = np.count_nonzero(~np.isnan(daily_max), axis=2)
+    scores = np.zeros((len(profiles),) + valid_days.shape)
+
+    for p, profile in enumerate(profiles):
+        month_sums = np.nansum(daily_temperature_scores(profile, daily_max), axis=2)
+        scores[p] = np.divide(month_sums, valid_days, out=np.zeros(valid_days.shape), where=valid_days > 0)
+
+    return scores
+
+def monthly_precipitation_scores(profiles, rainy_days):
+    """
+    Spread the rainy day points over the days of each month. Averaging the months weighted
+    by MONTH_DAYS gives Station.get_precipitation_score.
+
+    Returns:
+        array: (profiles, stations, 12) precipitation score of each month
+    """
+    rainy_day_points = _profile_parameters(profiles, 'rainy_day_points')[:, None, None]
+    return rainy_days[None] * rainy_day_points / MONTH_DAYS
+
+def batch_monthly_scores(metric, profiles, daily_max, rainy_days):
+    """
+    Score every month of every station for every profile for one of the grid metrics.
+
+    Returns:
+        array: (profiles, stations, 12) scores
+    """
+    if metric == 'temperature':
+        return monthly_temperature_scores(profiles, daily_max)
+    if metric == 'precipitation':
+        return monthly_precipitation_scores(profiles, rainy_days)
+    return monthly_temperature_scores(profiles, daily_max) + monthly_precipitation_scores(profiles, rainy_days)
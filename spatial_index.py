@@ -0,0 +1,127 @@
+import hashlib
+import numpy as np
+import os
+import pickle
+from scipy.sparse import csr_matrix
+from scipy.spatial import KDTree
+
+# KD-trees and cell indexes, one file per set of points they were built from
+SPATIAL_INDEX_DIR = 'computed/spatial_index'
+
+# Bump when the layout of the stored indexes changes so old files are ignored
+SPATIAL_INDEX_VERSION = 1
+
+# Cell indexes kept per grid spacing, several sets of stations (e.g. each normals period) are
+# assigned to the same grid, so the least recently used ones beyond this are deleted
+CELL_INDEXES_KEPT = 4
+
+def array_digest(*arrays):
+    """
+    Hash the contents of arrays, e.g. the points a KD-tree was built from, so an index
+    stored for exactly those points can be found again.
+    """
+    digest = hashlib.sha1(f"{SPATIAL_INDEX_VERSION}".encode())
+    for values in arrays:
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        digest.update(str(values.shape).encode())
+        digest.update(values.tobytes())
+    return digest.hexdigest()[:16]
+
+def load_kdtree(points, name='points'):
+    """
+    Load the KD-tree over the points from computed/, building and storing it first if no
+    tree was stored for exactly these points. Only the newest tree of each name is kept, so
+    each source of points needs its own name.
+
+    Args:
+        points (array): (points, 2) projected coordinates
+        name (str): Prefix of the stored file, e.g. 'stations'
+
+    Returns:
+        KDTree: Tree over the points, in their order
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    index_file = os.path.join(SPATIAL_INDEX_DIR, f'{name}_{array_digest(points)}.pkl')
+
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Error loading KD-tree from {index_file}, rebuilding it: {e}")
+
+    kdtree = KDTree(points)
+    os.makedirs(SPATIAL_INDEX_DIR, exist_ok=True)
+    with open(index_file, 'wb') as f:
+        pickle.dump(kdtree, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _remove_stale_kdtrees(name, index_file)
+    return kdtree
+
+def _remove_stale_kdtrees(name, index_file):
+    """
+    Delete the trees stored under the same name for other points, which are never loaded again
+    once the points change. Names that merely start with this one, e.g. 'stations_comfort' for
+    'stations', are left alone since their remainder isn't just a digest.
+    """
+    prefix = f'{name}_'
+    for entry in os.scandir(SPATIAL_INDEX_DIR):
+        digest, extension = os.path.splitext(entry.name[len(prefix):])
+        if (entry.name.startswith(prefix) and extension == '.pkl' and len(digest) == 16 and '_' not in digest
+                and entry.path != index_file):
+            os.remove(entry.path)
+
+def cell_index_file(grid_spacing_miles, station_points, cell_bounds):
+    """
+    Path of the stored cell index for a set of stations and grid cells.
+    """
+    return os.path.join(SPATIAL_INDEX_DIR, f'cells_{grid_spacing_miles}_miles_{array_digest(station_points, cell_bounds)}.npz')
+
+def save_cell_index(index_file, index):
+    """
+    Store a cell index from load_cell_index, with the sparse weights as their CSR arrays.
+    """
+    weights = index['weights']
+    os.makedirs(SPATIAL_INDEX_DIR, exist_ok=True)
+    np.savez(
+        index_file,
+        centers=index['centers'],
+        nearest=index['nearest'],
+        weights_data=weights.data,
+        weights_indices=weights.indices,
+        weights_indptr=weights.indptr,
+        weights_shape=np.array(weights.shape),
+    )
+    _remove_least_recent_cell_indexes(index_file)
+
+def _remove_least_recent_cell_indexes(index_file):
+    """
+    Delete the least recently used cell indexes of the same grid spacing beyond CELL_INDEXES_KEPT.
+    """
+    prefix = os.path.basename(index_file).rsplit('_', 1)[0] + '_'
+    stored = [entry for entry in os.scandir(SPATIAL_INDEX_DIR) if entry.name.startswith(prefix) and entry.name.endswith('.npz')]
+    stored.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in stored[CELL_INDEXES_KEPT:]:
+        if entry.path != index_file:
+            os.remove(entry.path)
+
+def read_cell_index(index_file):
+    """
+    Read a cell index stored by save_cell_index, or None if it can't be read.
+    """
+    try:
+        with np.load(index_file) as stored:
+            index = {
+                'centers': stored['centers'],
+                'nearest': stored['nearest'],
+                'weights': csr_matrix(
+                    (stored['weights_data'], stored['weights_indices'], stored['weights_indptr']),
+                    shape=tuple(stored['weights_shape']),
+                ),
+            }
+    except Exception as e:
+        print(f"Error loading cell index from {index_file}, rebuilding it: {e}")
+        return None
+
+    # Mark it as used, the least recently used indexes are the ones deleted
+    os.utime(index_file)
+    return index
@@ -0,0 +1,82 @@
+import numpy as np
+import shapely
+
+# Resolution of the curve along each axis, 2^16 steps over the points' extent
+HILBERT_BITS = 16
+
+def hilbert_index(x, y, bounds=None, bits=HILBERT_BITS):
+    """
+    Position of each point along a Hilbert curve filling the bounds. Points that are close
+    on the curve are close on the map, so sorting by it keeps neighbors near each other in
+    memory.
+
+    Args:
+        x (array): x coordinates
+        y (array): y coordinates
+        bounds (tuple): Optional (minx, miny, maxx, maxy) the curve covers, the points' extent
+                        if not given
+        bits (int): Number of bits of each quantized coordinate
+
+    Returns:
+        array: int64 curve position of each point
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if not len(x):
+        return np.zeros(0, dtype=np.int64)
+
+    minx, miny, maxx, maxy = bounds if bounds is not None else (np.nanmin(x), np.nanmin(y), np.nanmax(x), np.nanmax(y))
+    side = 1 << bits
+    scale = (side - 1) / max(maxx - minx, maxy - miny, 1e-12)
+    xi = np.clip(np.nan_to_num((x - minx) * scale), 0, side - 1).astype(np.int64)
+    yi = np.clip(np.nan_to_num((y - miny) * scale), 0, side - 1).astype(np.int64)
+
+    d = np.zeros(len(xi), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (xi & s) > 0
+        ry = (yi & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+
+        # Rotate the quadrant so the curve continues where the previous one ended
+        flip = ~ry & rx
+        xi = np.where(flip, side - 1 - xi, xi)
+        yi = np.where(flip, side - 1 - yi, yi)
+        xi, yi = np.where(ry, xi, yi), np.where(ry, yi, xi)
+        s >>= 1
+
+    return d
+
+def hilbert_order(x, y, bounds=None):
+    """
+    Permutation that sorts the points along a Hilbert curve, with points whose coordinates
+    are NaN last in their original order.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~np.isnan(x) & ~np.isnan(y)
+
+    d = np.full(len(x), np.iinfo(np.int64).max)
+    if valid.any():
+        d[valid] = hilbert_index(x[valid], y[valid], bounds)
+    return np.argsort(d, kind='stable')
+
+def grid_order(cell_indices):
+    """
+    Permutation that visits grid cells along a Hilbert curve over their (i, j) grid index,
+    so consecutive cells are spatial neighbors rather than whole columns apart.
+    """
+    cell_indices = np.asarray(cell_indices, dtype=float).reshape(-1, 2)
+    if not len(cell_indices):
+        return np.zeros(0, dtype=np.int64)
+    extent = max(cell_indices.max(), 1)
+    return hilbert_order(cell_indices[:, 0], cell_indices[:, 1], (0, 0, extent, extent))
+
+def cell_order(grid_cells):
+    """
+    Permutation that visits grid cells along a Hilbert curve over their centers, see grid_order.
+    """
+    if not len(grid_cells):
+        return np.zeros(0, dtype=np.int64)
+    bounds = shapely.bounds(np.asarray(grid_cells, dtype=object))
+    return hilbert_order((bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2)
@@ -1,4 +1,6 @@
 import re
+import numpy as np
+from scoring_profiles import DEFAULT_PROFILE, daily_temperature_scores
 
 class Station:
     def __init__(self):
@@ -6,6 +8,7 @@ class Station:
         self._zipcode = None
         self._avg_daily_max_temperature = None
         self._avg_rainy_days_per_month = []
+        self._avg_hourly_feels_like = None
         self._latitude = None
         self._longitude = None
     
@@ -91,7 +94,19 @@ class Station:
                 
         self._avg_rainy_days_per_month = value
     
-    def get_temperature_score(self):
+    @property
+    def avg_hourly_feels_like(self):
+        return self._avg_hourly_feels_like
+    
+    @avg_hourly_feels_like.setter
+    def avg_hourly_feels_like(self, value):
+        # One row per day of the 366-day year and one column per hour, NaN for missing hours
+        value = np.asarray(value, dtype=np.float32)
+        if value.shape != (366, 24):
+            raise ValueError(f"avg_hourly_feels_like must have shape (366, 24), got {value.shape}")
+        self._avg_hourly_feels_like = value
+    
+    def get_temperature_score(self, profile=None):
         """
         Calculate comfort score based on temperature:
         - 72°F = 40 points (optimal)
@@ -100,11 +115,13 @@ class Station:
         - Higher temperatures lose points faster
         
         Processes all valid temperature data points and returns the average score.
+        The constants come from a ScoringProfile, DEFAULT_PROFILE gives the values above.
         """
-        ideal_temp = 72
-        max_points = 40
-        cold_points_loss = 1
-        hot_points_loss = 3
+        profile = profile or DEFAULT_PROFILE
+        ideal_temp = profile.ideal_temp
+        max_points = profile.max_points
+        cold_points_loss = profile.cold_points_loss
+        hot_points_loss = profile.hot_points_loss
 
         if self._avg_daily_max_temperature is None:
             return 0
@@ -135,26 +152,46 @@ class Station:
         # Return average score across all valid days
         return total_score / valid_days if valid_days > 0 else 0
     
-    def get_precipitation_score(self):
+    def get_precipitation_score(self, profile=None):
         """
         Calculate precipitation score based on number of rainy days.
         10 points per day with ≥0.5" rainfall.
         
         Uses the sum of average rainy days across all months.
         """
+        profile = profile or DEFAULT_PROFILE
+
         if not self._avg_rainy_days_per_month:
             return 0
             
         # Sum the average rainy days across all months
         total_rainy_days = sum(self._avg_rainy_days_per_month)
         # 10 points per rainy day: a rainy day at 62 or 77 equals a sunny day at 72 because I like rain
-        return total_rainy_days * 30 / 366 # 366 days, feb 29 is in our dataset of 30 yrs
+        return total_rainy_days * profile.rainy_day_points / 366 # 366 days, feb 29 is in our dataset of 30 yrs
+    
+    def get_feels_like_score(self, profile=None):
+        """
+        Calculate comfort score like get_temperature_score, but from the hourly feels-like
+        temperatures (heat index when hot, wind chill when cold) instead of the daily maximums.
+        Every valid hour of the year counts the same.
+        """
+        profile = profile or DEFAULT_PROFILE
+        
+        if self._avg_hourly_feels_like is None:
+            return 0
+        
+        hour_scores = daily_temperature_scores(profile, self._avg_hourly_feels_like.astype(np.float64))
+        valid_hours = np.count_nonzero(~np.isnan(hour_scores))
+        if valid_hours == 0:
+            return 0
+        
+        return float(np.nansum(hour_scores) / valid_hours)
     
-    def get_total_score(self):
+    def get_total_score(self, profile=None):
         """
         Calculate the total comfort score by combining temperature and precipitation scores.
         """
-        temp_score = self.get_temperature_score()
-        precip_score = self.get_precipitation_score()
+        temp_score = self.get_temperature_score(profile)
+        precip_score = self.get_precipitation_score(profile)
         
         return temp_score + precip_score
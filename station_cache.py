@@ -0,0 +1,180 @@
+import numpy as np
+import os
+from itertools import islice
+from load_stations import load_stations
+from load_stations_zipcodes import ZIPCODES_NORMALS_STATIONS
+from load_stations_daily_temp import DAILY_TMAX_NORMAL_FILE
+from load_stations_monthly_precip import MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE
+from normals_periods import DEFAULT_PERIOD, get_normals_period, encode_station_ids, load_station_id_dictionary
+from grid_scoring import project_coordinates
+from score_cache import source_fingerprint
+from spatial_order import hilbert_order
+from scoring_profiles import station_arrays, temperature_summary
+
+# Bump when the arrays stored in the cache change so old files are rebuilt
+STATION_CACHE_VERSION = 4
+
+STATION_CACHE_FILE = 'computed/stations.npz'
+
+# Every file load_stations() reads for the default period
+STATION_SOURCES = [ZIPCODES_NORMALS_STATIONS, DAILY_TMAX_NORMAL_FILE, MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE]
+
+def station_cache_arrays(stations):
+    """
+    Convert stations into the columnar arrays stored in the station cache.
+
+    Args:
+        stations (dict): Dictionary mapping station IDs to Station objects
+
+    Returns:
+        dict: 'station_ids', 'latitude' and 'longitude' (NaN when unknown), 'x' and 'y' in
+              the grid's projected CRS (see grid_scoring.project_coordinates), 'daily_max' and
+              'rainy_days' from station_arrays, 'has_temperature', 'has_precipitation' and the
+              sorted temperature summary from temperature_summary
+    """
+    station_list = list(stations.values())
+    daily_max, rainy_days = station_arrays(station_list)
+
+    latitude = np.array([np.nan if s.latitude is None else s.latitude for s in station_list], dtype=float)
+    longitude = np.array([np.nan if s.longitude is None else s.longitude for s in station_list], dtype=float)
+    x, y = project_coordinates(longitude, latitude)
+
+    arrays = {
+        'station_ids': np.array(list(stations), dtype=str),
+        'latitude': latitude,
+        'longitude': longitude,
+        'x': x,
+        'y': y,
+        'daily_max': daily_max,
+        'rainy_days': rainy_days,
+        'has_temperature': np.array([s.avg_daily_max_temperature is not None for s in station_list], dtype=bool),
+        'has_precipitation': np.array([bool(s.avg_rainy_days_per_month) for s in station_list], dtype=bool),
+    }
+    arrays.update(temperature_summary(daily_max))
+
+    return arrays
+
+def spatial_sort(arrays):
+    """
+    Reorder the station arrays along a Hilbert curve over the stations' projected
+    coordinates, so stations that are near each other on the map are near each other in
+    memory and KD-tree queries and per-cell lookups touch few distinct parts of the arrays.
+    Stations without coordinates go last.
+
+    Returns:
+        dict: The reordered arrays, plus 'source_order' with each station's position in the
+              order the stations were loaded in, see original_order
+    """
+    order = hilbert_order(arrays['x'], arrays['y'])
+
+    arrays = select_stations(arrays, order)
+    arrays['source_order'] = order.astype(np.int32)
+    return arrays
+
+def original_order(cache):
+    """
+    Permutation that puts spatially sorted station arrays back in the order the stations
+    were loaded in, e.g. select_stations(cache, original_order(cache)).
+    """
+    return np.argsort(cache['source_order'])
+
+def iter_station_batches(stations, batch_size=1024):
+    """
+    Group a stream of stations, e.g. from iter_stations_daily_temp(), into fixed-size batches
+    of arrays, so consumers can start working before parsing finishes and only ever hold
+    one batch. The last batch may be smaller.
+
+    Args:
+        stations: Iterable of Station objects
+        batch_size (int): Number of stations per batch
+
+    Yields:
+        dict: Arrays from station_cache_arrays for each batch
+    """
+    stations = iter(stations)
+    while True:
+        batch = list(islice(stations, batch_size))
+        if not batch:
+            return
+        yield station_cache_arrays({station.station_id: station for station in batch})
+
+def station_cache_file(period=None):
+    """
+    Path of a normals period's station cache. The default period keeps computed/stations.npz.
+    """
+    if period is None or period == DEFAULT_PERIOD:
+        return STATION_CACHE_FILE
+    return f'computed/stations_{get_normals_period(period).name}.npz'
+
+def _station_codes(arrays):
+    """
+    The cached station codes, encoded again if the shared dictionary was rebuilt since.
+    """
+    codes = arrays.get('station_codes')
+    dictionary = load_station_id_dictionary()
+    if codes is not None and len(codes) == len(arrays['station_ids']) and (
+            not len(codes) or (codes.max() < len(dictionary) and np.array_equal(dictionary[codes], arrays['station_ids']))):
+        return codes
+    return encode_station_ids(arrays['station_ids'])
+
+def load_station_cache(force_recalculate=False, period=None):
+    """
+    Load the combined station data of a normals period as arrays from computed/, rebuilding
+    it with load_stations() when the period's NOAA data files have changed since it was
+    saved. Each period has its own cache, and every cache holds the stations' codes in the
+    shared station-ID dictionary (see normals_periods.encode_station_ids), so periods can be
+    compared station by station without parsing either of them again.
+
+    Args:
+        force_recalculate (bool): If True, rebuild the cache even if it is up to date
+        period (str): Name of a normals period in NORMALS_PERIODS, the default period if not given
+
+    The stations are stored along a Hilbert curve over their projected coordinates, see
+    spatial_sort.
+
+    Returns:
+        dict: Arrays from station_cache_arrays, plus 'station_codes' and 'source_order'
+    """
+    cache_file = station_cache_file(period)
+    if period is None or period == DEFAULT_PERIOD:
+        sources, paths = STATION_SOURCES, {}
+    else:
+        normals = get_normals_period(period)
+        sources, paths = normals.sources(), normals.paths()
+    source_key = f"{STATION_CACHE_VERSION}:{source_fingerprint(sources, stat_files=False)}"
+
+    if not force_recalculate and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if str(cached['source_key']) == source_key:
+                print(f"Loaded station data from cache: {cache_file}")
+                arrays = {name: cached[name] for name in cached.files if name != 'source_key'}
+                arrays['station_codes'] = _station_codes(arrays)
+                return arrays
+        print("Station data changed since the cache was saved, rebuilding it")
+
+    print(f"Loading {period or DEFAULT_PERIOD} stations to build the station cache...")
+    arrays = spatial_sort(station_cache_arrays(load_stations(**paths)))
+    arrays['station_codes'] = encode_station_ids(arrays['station_ids'])
+
+    os.makedirs('computed', exist_ok=True)
+    np.savez(cache_file, source_key=source_key, **arrays)
+    print(f"Saved {len(arrays['station_ids'])} stations to cache: {cache_file}")
+
+    return arrays
+
+def metric_station_mask(cache, metric):
+    """
+    Select the cached stations that have the data needed to score the given metric.
+    """
+    mask = ~np.isnan(cache['latitude']) & ~np.isnan(cache['longitude'])
+    if metric in ('temperature', 'comfort'):
+        mask &= cache['has_temperature']
+    if metric in ('precipitation', 'comfort'):
+        mask &= cache['has_precipitation']
+    return mask
+
+def select_stations(cache, mask):
+    """
+    Subset every per-station array of the cache.
+    """
+    return {name: values[mask] for name, values in cache.items()}
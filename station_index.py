@@ -0,0 +1,233 @@
+import numpy as np
+import os
+from station import Station
+from load_stations_zipcodes import ZIPCODES_NORMALS_STATIONS, load_stations_zipcodes
+from load_stations_daily_temp import DAILY_TMAX_NORMAL_FILE, parse_daily_temp_lines
+from load_stations_monthly_precip import MONTHLY_PRECIP_DIR, MONTHLY_PRECIP_ARCHIVE, parse_monthly_precip_csv, precip_archive_is_current
+from score_cache import source_fingerprint
+
+# Bump when the arrays stored in the index change so old files are rebuilt
+STATION_INDEX_VERSION = 1
+
+STATION_INDEX_FILE = 'computed/station_index.npz'
+
+# Index, zipcodes and precipitation archive kept in memory after the first lookup
+_loaded = {}
+
+def build_station_index():
+    """
+    Scan dly-tmax-normal.txt once and record where each station's lines are. The file is
+    sorted by station, so each station is normally one contiguous run of lines; a station
+    whose lines are split up gets one entry per run.
+
+    Returns:
+        dict: 'station_ids' sorted, with the byte 'offsets' and 'lengths' of each run of lines
+    """
+    station_ids = []
+    offsets = []
+    lengths = []
+
+    with open(DAILY_TMAX_NORMAL_FILE, 'rb') as file:
+        offset = 0
+        for line in file:
+            parts = line.split(None, 1)
+            if parts:
+                station_id = parts[0].decode()
+                if not station_ids or station_ids[-1] != station_id or offsets[-1] + lengths[-1] != offset:
+                    station_ids.append(station_id)
+                    offsets.append(offset)
+                    lengths.append(0)
+                lengths[-1] += len(line)
+            offset += len(line)
+
+    # A stable sort keeps the runs of a split-up station in file order
+    order = np.argsort(np.array(station_ids, dtype=str), kind='stable')
+    return {
+        'station_ids': np.array(station_ids, dtype=str)[order],
+        'offsets': np.array(offsets, dtype=np.int64)[order],
+        'lengths': np.array(lengths, dtype=np.int64)[order],
+    }
+
+def load_station_index(force_recalculate=False):
+    """
+    Load the station index from computed/, building it first if it is missing or
+    dly-tmax-normal.txt has changed since it was built. The index is kept in memory
+    after the first call.
+    """
+    source_key = f"{STATION_INDEX_VERSION}:{source_fingerprint([DAILY_TMAX_NORMAL_FILE])}"
+
+    if not force_recalculate and _loaded.get('index_key') == source_key:
+        return _loaded['index']
+
+    index = None
+    if not force_recalculate and os.path.exists(STATION_INDEX_FILE):
+        with np.load(STATION_INDEX_FILE) as cached:
+            if str(cached['source_key']) == source_key:
+                index = {name: cached[name] for name in cached.files if name != 'source_key'}
+
+    if index is None:
+        print(f"Building station index for {DAILY_TMAX_NORMAL_FILE}...")
+        index = build_station_index()
+        os.makedirs('computed', exist_ok=True)
+        np.savez(STATION_INDEX_FILE, source_key=source_key, **index)
+
+    _loaded.update(index_key=source_key, index=index)
+    return index
+
+def _precip_archive():
+    """
+    The packed precipitation archive's arrays, or None when it hasn't been packed or is
+    older than the CSV files. The check against the CSV files is made once per archive file.
+    """
+    archive_path = MONTHLY_PRECIP_ARCHIVE
+    if not os.path.exists(archive_path):
+        return None
+
+    archive_key = source_fingerprint([archive_path])
+    if _loaded.get('archive_key') != archive_key:
+        archive = None
+        if precip_archive_is_current(archive_path, MONTHLY_PRECIP_DIR):
+            with np.load(archive_path) as packed:
+                archive = {name: packed[name] for name in packed.files if name != 'source_key'}
+        else:
+            print(f"{archive_path} is older than the CSV files, reading the CSV files instead")
+        _loaded.update(archive_key=archive_key, archive=archive)
+
+    return _loaded['archive']
+
+def _zipcodes():
+    """
+    Zipcode of each station in zipcodes-normals-stations.txt. The file is small, so it is read
+    whole once and read again only when it changes.
+    """
+    if not os.path.exists(ZIPCODES_NORMALS_STATIONS):
+        return {}
+
+    zipcodes_key = source_fingerprint([ZIPCODES_NORMALS_STATIONS])
+    if _loaded.get('zipcodes_key') != zipcodes_key:
+        stations = load_stations_zipcodes(ZIPCODES_NORMALS_STATIONS)
+        _loaded.update(zipcodes_key=zipcodes_key,
+                       zipcodes={station_id: station.zipcode for station_id, station in stations.items()})
+
+    return _loaded['zipcodes']
+
+def _load_zipcode(station_id):
+    """
+    A station with only its zipcode set, or None if the zipcodes file doesn't list it.
+    """
+    zipcode = _zipcodes().get(station_id)
+    if zipcode is None:
+        return None
+
+    station = Station()
+    station.station_id = station_id
+    station.zipcode = zipcode
+    return station
+
+def _load_precipitation(station_id):
+    """
+    Load one station's precipitation data from the packed archive, or from its CSV file.
+    """
+    archive = _precip_archive()
+
+    if archive is None:
+        file_path = os.path.join(MONTHLY_PRECIP_DIR, f'{station_id}.csv')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r') as csvfile:
+            return parse_monthly_precip_csv(station_id, csvfile)
+
+    k = np.searchsorted(archive['station_ids'], station_id)
+    if k == len(archive['station_ids']) or archive['station_ids'][k] != station_id:
+        return None
+
+    station = Station()
+    station.station_id = station_id
+    if not np.isnan(archive['latitude'][k]):
+        station.latitude = archive['latitude'][k]
+    if not np.isnan(archive['longitude'][k]):
+        station.longitude = archive['longitude'][k]
+    station.avg_rainy_days_per_month = archive['rainy_days'][k].tolist()
+    return station
+
+def _load_temperature(station_id, index):
+    """
+    Load one station's daily maximum temperatures by reading only its lines of dly-tmax-normal.txt.
+    """
+    start = np.searchsorted(index['station_ids'], station_id, side='left')
+    stop = np.searchsorted(index['station_ids'], station_id, side='right')
+    if start == stop:
+        return None
+
+    lines = []
+    with open(DAILY_TMAX_NORMAL_FILE, 'rb') as file:
+        for offset, length in zip(index['offsets'][start:stop], index['lengths'][start:stop]):
+            file.seek(offset)
+            lines.extend(file.read(length).decode().splitlines())
+
+    return next(parse_daily_temp_lines(lines), None)
+
+def load_station(station_id, index=None):
+    """
+    Load a single station's zipcode, temperature and precipitation data without loading every
+    station, combined the same way load_stations() does.
+
+    Args:
+        station_id (str): NOAA station ID, e.g. 'USW00094728'
+        index (dict): Index from load_station_index(), loaded if not given
+
+    Returns:
+        Station: The station, or None if no data source has it
+    """
+    if index is None:
+        index = load_station_index()
+
+    station = _load_zipcode(station_id)
+    temp_station = _load_temperature(station_id, index)
+    precip_station = _load_precipitation(station_id)
+
+    # Same order and precedence as load_stations(): zipcode, then temperature, then precipitation,
+    # whose coordinates only fill in a location the station doesn't have yet
+    if temp_station is not None:
+        if station is None:
+            station = temp_station
+        else:
+            station.avg_daily_max_temperature = temp_station.avg_daily_max_temperature
+
+    if precip_station is None:
+        return station
+    if station is None:
+        return precip_station
+
+    station.avg_rainy_days_per_month = precip_station.avg_rainy_days_per_month
+    if station.latitude is None and precip_station.latitude is not None:
+        station.latitude = precip_station.latitude
+    if station.longitude is None and precip_station.longitude is not None:
+        station.longitude = precip_station.longitude
+    return station
+
+def load_stations_by_id(station_ids):
+    """
+    Load a small set of stations by ID, see load_station.
+
+    Returns:
+        dict: Dictionary mapping station IDs to Station objects, for the stations that were found
+    """
+    index = load_station_index()
+    stations = {}
+    for station_id in station_ids:
+        station = load_station(station_id, index)
+        if station is not None:
+            stations[station_id] = station
+    return stations
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look up and score stations without loading every station.")
+    parser.add_argument('station_ids', nargs='+')
+    args = parser.parse_args()
+
+    for station_id, station in load_stations_by_id(args.station_ids).items():
+        print(f"{station_id}: temperature {station.get_temperature_score():.2f}, "
+              f"precipitation {station.get_precipitation_score():.2f}, total {station.get_total_score():.2f}")
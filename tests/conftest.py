@@ -0,0 +1,89 @@
+import os
+import sys
+import numpy as np
+import pytest
+from pyproj import Transformer
+from shapely.geometry import Polygon
+
+# Add the parent directory to the path so the tests can import the modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from station import Station
+
+TO_LONLAT = Transformer.from_crs("EPSG:5070", "EPSG:4326", always_xy=True)
+
+# A patch of Kansas in EPSG:5070 with one corner cut off, about 125 x 125 miles
+KANSAS_BOUNDARY = Polygon([(-300000, 1700000), (-100000, 1700000), (-100000, 1800000), (-200000, 1900000), (-300000, 1900000)])
+
+# An irregular "country" roughly 100 x 60 miles so the grid has partial cells along the edges
+IRREGULAR_BOUNDARY = Polygon([(0, 0), (160000, 10000), (150000, 100000), (60000, 90000), (10000, 60000)])
+
+def _make_station(station_id, temperature=None, rainy_days=None, latitude=None, longitude=None, xy=None):
+    station = Station()
+    station.station_id = station_id
+    if xy is not None:
+        longitude, latitude = TO_LONLAT.transform(*xy)
+    if latitude is not None:
+        station.latitude = latitude
+        station.longitude = -100.0 if longitude is None else longitude
+    if temperature is not None:
+        station.avg_daily_max_temperature = (temperature if isinstance(temperature, list)
+                                             else [[temperature] * 31 for _ in range(12)])
+    if rainy_days is not None:
+        station.avg_rainy_days_per_month = rainy_days if isinstance(rainy_days, list) else [rainy_days] * 12
+    return station
+
+@pytest.fixture
+def boundary():
+    return KANSAS_BOUNDARY
+
+@pytest.fixture
+def irregular_boundary():
+    return IRREGULAR_BOUNDARY
+
+@pytest.fixture
+def make_station():
+    """
+    Factory for a synthetic Station. A single temperature or number of rainy days is used for
+    every day or month, lists are used as they are. The location is given as latitude/longitude
+    (longitude -100 if only the latitude is given) or as projected EPSG:5070 coordinates xy.
+    """
+    return _make_station
+
+@pytest.fixture
+def synthetic_stations(boundary):
+    """
+    30 stations spread at random over the boundary's bounding box, each with one temperature
+    for every day and one number of rainy days for every month.
+    """
+    rng = np.random.default_rng(0)
+    (x0, y0, x1, y1) = boundary.bounds
+    stations = {}
+    for k in range(30):
+        xy = (rng.uniform(x0, x1), rng.uniform(y0, y1))
+        station_id = f'S{k:02d}'
+        stations[station_id] = _make_station(station_id, float(rng.uniform(40, 95)), float(rng.uniform(0, 10)), xy=xy)
+    return stations
+
+@pytest.fixture
+def station_points(irregular_boundary):
+    """
+    Factory for projected stations spread at random over the irregular boundary's bounding box,
+    returns (station_data, station_scores, points) as used by the grid scoring functions.
+    """
+    def make_station_points(n_stations=40, seed=0):
+        rng = np.random.default_rng(seed)
+        (x0, y0, x1, y1) = irregular_boundary.bounds
+        points = rng.uniform((x0, y0), (x1, y1), size=(n_stations, 2))
+        station_data = [(f"S{k}", None, (x, y)) for k, (x, y) in enumerate(points.tolist())]
+        station_scores = list(rng.uniform(0, 40, size=n_stations))
+        return station_data, station_scores, points
+    return make_station_points
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    """
+    Run the test in tmp_path, so the caches the code writes to computed/ (and output/) start empty.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
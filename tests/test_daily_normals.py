@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import load_stations_daily_normals
+from load_stations_daily_normals import (
+    parse_daily_normals_csv, load_column_catalog, catalog_stations, load_daily_normals,
+)
+
+def write_station(directory, station_id, columns, value):
+    header = ['STATION', 'DATE', 'LATITUDE', 'LONGITUDE'] + columns
+    lines = [','.join(f'"{column}"' for column in header)]
+    for month in range(1, 13):
+        for day in range(1, 32 if month != 2 else 30):
+            values = [str(value(month, day, column)) for column in columns]
+            lines.append(','.join([f'"{station_id}"', f'"{month:02d}-{day:02d}"', '"40.5"', '"-100.25"'] + values))
+    (directory / f'{station_id}.csv').write_text('\n'.join(lines) + '\n')
+
+@pytest.fixture
+def normals_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'normals-daily'
+    directory.mkdir()
+    monkeypatch.setattr(load_stations_daily_normals, 'DAILY_NORMALS_DIR', str(directory))
+    monkeypatch.setattr(load_stations_daily_normals, 'DAILY_NORMALS_CATALOG', str(tmp_path / 'catalog.npz'))
+    monkeypatch.setattr(load_stations_daily_normals, 'DAILY_NORMALS_STORE_DIR', str(tmp_path / 'store'))
+
+    write_station(directory, 'A', ['DLY-TMAX-NORMAL', 'DLY-TMIN-NORMAL'], lambda month, day, column: month * 10 + (0 if 'MAX' in column else -20))
+    write_station(directory, 'B', ['DLY-TMIN-NORMAL', 'DLY-SNOW-PCTALL-GE001TI'], lambda month, day, column: -7777 if 'SNOW' in column else -9999 if day == 1 else 15)
+    write_station(directory, 'C', ['DLY-PRCP-PCTALL-GE001HI'], lambda month, day, column: 30)
+    return directory
+
+def test_parse_flags_and_dates():
+    lines = ['"STATION","DATE","LATITUDE","LONGITUDE","DLY-TMIN-NORMAL","DLY-SNOW-NORMAL"',
+             '"X","01-01","35.0","-90.0","-9999","-7777"',
+             '"X","02-29","35.0","-90.0","-5.5","2.0"']
+    latitude, longitude, values = parse_daily_normals_csv(lines, ['DLY-SNOW-NORMAL', 'DLY-TMIN-NORMAL', 'DLY-TAVG-NORMAL'])
+    assert (latitude, longitude) == (35.0, -90.0)
+    assert values.shape == (3, 12, 31) and values.dtype == np.float32
+    assert values[0, 0, 0] == 0 and values[0, 1, 28] == 2.0
+    assert np.isnan(values[1, 0, 0]) and values[1, 1, 28] == -5.5
+    assert np.isnan(values[2]).all()
+    assert np.count_nonzero(~np.isnan(values)) == 3
+
+def test_catalog_lists_columns_per_station(normals_dir):
+    catalog = load_column_catalog()
+    assert catalog['station_ids'].tolist() == ['A', 'B', 'C']
+    assert catalog_stations(catalog, 'DLY-TMIN-NORMAL').tolist() == ['A', 'B']
+    assert catalog_stations(catalog, 'DLY-PRCP-PCTALL-GE001HI').tolist() == ['C']
+    assert catalog_stations(catalog, 'DLY-TAVG-NORMAL').tolist() == []
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_load_selected_variables(normals_dir, workers):
+    normals = load_daily_normals(['DLY-TMIN-NORMAL', 'DLY-SNOW-PCTALL-GE001TI'], workers=workers)
+
+    tmin = normals['DLY-TMIN-NORMAL']
+    assert tmin['station_ids'].tolist() == ['A', 'B']
+    assert tmin['values'].shape == (2, 12, 31)
+    assert tmin['values'][0, 6, 0] == 50
+    assert np.isnan(tmin['values'][0, 1, 29])  # Feb 30
+    assert np.isnan(tmin['values'][1, 3, 0]) and tmin['values'][1, 3, 1] == 15
+    assert np.allclose(tmin['latitude'], 40.5)
+
+    assert normals['DLY-SNOW-PCTALL-GE001TI']['station_ids'].tolist() == ['B']
+    assert np.nanmax(normals['DLY-SNOW-PCTALL-GE001TI']['values']) == 0
+
+def test_stored_variables_are_not_parsed_again(normals_dir, monkeypatch):
+    load_daily_normals(['DLY-TMIN-NORMAL'], workers=1)
+
+    parsed = []
+    original = load_stations_daily_normals._parse_files
+    def counting_parse_files(files, variables):
+        parsed.append(list(variables))
+        return original(files, variables)
+    monkeypatch.setattr(load_stations_daily_normals, '_parse_files', counting_parse_files)
+
+    normals = load_daily_normals(['DLY-TMIN-NORMAL', 'DLY-TMAX-NORMAL'], workers=1)
+    assert parsed and all(variables == ['DLY-TMAX-NORMAL'] for variables in parsed)
+    assert normals['DLY-TMIN-NORMAL']['station_ids'].tolist() == ['A', 'B']
+    assert normals['DLY-TMAX-NORMAL']['station_ids'].tolist() == ['A']
+
+def test_unknown_variable_rejected(normals_dir):
+    with pytest.raises(ValueError):
+        load_daily_normals(['DLY-TAVG-NORMAL'], workers=1)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from shapely.geometry import shape
+
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_dissolve import label_cell_regions, dissolve_grid_cells
+from grid_export import scored_regions, regions_to_geojson
+from map_grid_render import score_bins, score_bin_edges
+
+def test_regions_follow_edges_not_corners():
+    # 0 0 1
+    # 1 0 1    the two 1s on the left only touch the right column through a corner
+    # 1 1 0
+    cell_bins = {(0, 2): 0, (1, 2): 0, (2, 2): 1, (0, 1): 1, (1, 1): 0, (2, 1): 1, (0, 0): 1, (1, 0): 1, (2, 0): 0}
+    regions = label_cell_regions(list(cell_bins), list(cell_bins.values()))
+
+    region_of = dict(zip(cell_bins, regions))
+    assert len(set(regions)) == 4
+    assert region_of[(0, 1)] == region_of[(0, 0)] == region_of[(1, 0)]
+    assert region_of[(2, 2)] == region_of[(2, 1)]
+    assert region_of[(2, 1)] != region_of[(1, 0)]
+
+def test_dissolve_keeps_area_and_bins(boundary):
+    x_grid, y_grid = grid_coordinates(boundary.bounds, 10)
+    grid_cells, cell_indices = generate_grid_cells(boundary, x_grid, y_grid)
+    cell_bins = [int(i >= 6) for i, j in cell_indices]
+
+    regions = dissolve_grid_cells(grid_cells, cell_indices, cell_bins)
+
+    assert sorted(bin_index for bin_index, _ in regions) == [0, 1]
+    assert sum(geometry.area for _, geometry in regions) == pytest.approx(sum(cell.area for cell in grid_cells))
+    for bin_index, geometry in regions:
+        assert geometry.geom_type == 'Polygon'
+        inside = [cell for cell, b in zip(grid_cells, cell_bins) if b == bin_index]
+        assert geometry.area == pytest.approx(sum(cell.area for cell in inside))
+
+def test_geojson_export(boundary):
+    x_grid, y_grid = grid_coordinates(boundary.bounds, 10)
+    grid_cells, cell_indices = generate_grid_cells(boundary, x_grid, y_grid)
+    scores = [float(i) for i, j in cell_indices]
+
+    regions, bin_ranges = scored_regions('temperature', grid_cells, cell_indices, scores)
+    collection = regions_to_geojson('temperature', regions, bin_ranges, precision=4)
+
+    assert len(collection['features']) == len(regions) < len(grid_cells)
+    for feature in collection['features']:
+        geometry = shape(feature['geometry'])
+        assert geometry.is_valid
+        assert -102 < geometry.centroid.x < -96 and 37 < geometry.centroid.y < 41
+        assert feature['properties']['color'].startswith('#')
+    assert bin_ranges[0][0] == pytest.approx(np.percentile(scores, 2))
+
+def test_exported_bin_ranges_hold_their_cells(boundary):
+    x_grid, y_grid = grid_coordinates(boundary.bounds, 10)
+    grid_cells, cell_indices = generate_grid_cells(boundary, x_grid, y_grid)
+    scores = np.array([float(i + j) / 3 for i, j in cell_indices])
+
+    regions, bin_ranges = scored_regions('comfort', grid_cells, cell_indices, scores, percentiles=(0, 100))
+
+    # The exported ranges use the edges the cells were binned with, so every score is inside its bin's range
+    edges = score_bin_edges('comfort', scores.min(), scores.max())
+    assert bin_ranges == list(zip(edges[:-1], edges[1:]))
+    for score, bin_index in zip(scores, score_bins('comfort', scores, scores.min(), scores.max())):
+        low, high = bin_ranges[bin_index]
+        assert low <= score <= high
+
+def test_dissolved_render_draws_regions(tmp_path, boundary):
+    import geopandas as gpd
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from map_grid_render import render_grid_scores
+
+    x_grid, y_grid = grid_coordinates(boundary.bounds, 2)
+    grid_cells, cell_indices = generate_grid_cells(boundary, x_grid, y_grid)
+    scores = [float(i // 10 + j // 15) for i, j in cell_indices]
+    states = gpd.GeoDataFrame(geometry=[boundary], crs='EPSG:5070')
+
+    sizes = {}
+    for dissolve in (False, True):
+        fig, ax = plt.subplots()
+        render_grid_scores(plt, grid_cells, scores, 'comfort', states, cell_indices=cell_indices, dissolve=dissolve)
+        fig.savefig(tmp_path / f'{dissolve}.svg')
+        plt.close(fig)
+        sizes[dissolve] = (tmp_path / f'{dissolve}.svg').stat().st_size
+    assert sizes[True] * 5 < sizes[False]
+
+    fig, ax = plt.subplots()
+    with pytest.raises(ValueError):
+        render_grid_scores(plt, grid_cells, scores, 'comfort', states, dissolve=True)
+    plt.close(fig)
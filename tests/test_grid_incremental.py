@@ -0,0 +1,64 @@
+import pytest
+
+import spatial_index
+from scoring_profiles import DEFAULT_PROFILE
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_scoring import prepare_station_scoring, score_grid_cells
+from grid_incremental import update_grid_scores
+from station_cache import station_cache_arrays, metric_station_mask, select_stations
+
+def metric_arrays(stations):
+    arrays = station_cache_arrays(stations)
+    return select_stations(arrays, metric_station_mask(arrays, 'temperature'))
+
+def full_scores(grid_cells, stations, spacing):
+    station_data, station_scores, kdtree = prepare_station_scoring(metric_arrays(stations), 'temperature')
+    return score_grid_cells(grid_cells, station_data, station_scores, kdtree, spacing, show_progress=False)
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_incremental_update_matches_full_recompute(boundary, synthetic_stations, make_station):
+    spacing = 5
+    grid_cells, _ = generate_grid_cells(boundary, *grid_coordinates(boundary.bounds, spacing))
+    stations = synthetic_stations
+
+    first = update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations))
+    assert first == full_scores(grid_cells, stations, spacing)
+
+    # Nothing changed: the saved scores are returned as they are
+    assert update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations)) == first
+
+    # Move one station, change another's data, add one and remove one
+    stations['S03'] = make_station('S03', 70.0, xy=(-150000, 1750000))
+    stations['S07'].avg_daily_max_temperature = [[55 for _ in range(31)] for _ in range(12)]
+    stations['NEW'] = make_station('NEW', 72.0, xy=(-260000, 1790000))
+    del stations['S11']
+
+    updated = update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations))
+    assert updated == full_scores(grid_cells, stations, spacing)
+    assert updated != first
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_changed_scoring_profile_rescores_every_station(monkeypatch, boundary, synthetic_stations):
+    spacing = 5
+    grid_cells, _ = generate_grid_cells(boundary, *grid_coordinates(boundary.bounds, spacing))
+    stations = synthetic_stations
+
+    first = update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations))
+
+    # Same stations, but a different ideal temperature changes the scoring fingerprint
+    monkeypatch.setattr(DEFAULT_PROFILE, 'ideal_temp', 60)
+    updated = update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations))
+    assert updated != first
+    assert updated == full_scores(grid_cells, stations, spacing)
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_stored_kdtree_is_reused_when_no_station_moves(monkeypatch, boundary, synthetic_stations):
+    spacing = 5
+    grid_cells, _ = generate_grid_cells(boundary, *grid_coordinates(boundary.bounds, spacing))
+    stations = synthetic_stations
+    update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations))
+
+    # Only the data of a station changed, so the stored tree over the same points is loaded
+    stations['S07'].avg_daily_max_temperature = [[55 for _ in range(31)] for _ in range(12)]
+    monkeypatch.setattr(spatial_index, 'KDTree', lambda points: pytest.fail("KD-tree rebuilt"))
+    assert update_grid_scores('temperature', spacing, grid_cells, metric_arrays(stations)) == full_scores(grid_cells, stations, spacing)
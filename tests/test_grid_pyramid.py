@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Point
+from scipy.spatial import KDTree
+
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_scoring import score_grid_cells
+import grid_pyramid
+from grid_pyramid import build_finest_level, derive_pyramid_level, level_cell_scores, level_cell_geometries
+
+@pytest.fixture
+def make_finest_level(irregular_boundary, station_points):
+    def make(spacing=4):
+        x_grid, y_grid = grid_coordinates(irregular_boundary.bounds, spacing)
+        grid_cells, cell_indices = generate_grid_cells(irregular_boundary, x_grid, y_grid)
+        station_data, station_scores, points = station_points(60, seed=1)
+        level = build_finest_level(grid_cells, cell_indices, x_grid, y_grid, station_data, station_scores)
+        return level, grid_cells, cell_indices, station_data, station_scores, KDTree(points)
+    return make
+
+def test_finest_level_matches_direct_scoring(make_finest_level):
+    level, grid_cells, cell_indices, station_data, station_scores, kdtree = make_finest_level()
+    expected, _, _ = score_grid_cells(grid_cells, station_data, station_scores, kdtree, 4, show_progress=False)
+
+    level_indices, scores = level_cell_scores(level, station_scores, kdtree)
+    by_index = dict(zip(map(tuple, level_indices), scores))
+
+    assert len(by_index) == len(grid_cells)
+    for (i, j), score in zip(cell_indices, expected):
+        assert abs(by_index[(i, j)] - score) < 1e-9
+
+def test_derived_level_aggregates_blocks(make_finest_level):
+    level, grid_cells, cell_indices, station_data, station_scores, kdtree = make_finest_level()
+    coarse = derive_pyramid_level(level, 2)
+
+    level_indices, _ = level_cell_scores(coarse, station_scores, kdtree)
+    geometries = level_cell_geometries(grid_cells, cell_indices, 2, level_indices)
+
+    for (i, j), geometry in zip(level_indices, geometries):
+        inside = [score for (_, _, point), score in zip(station_data, station_scores)
+                  if any(cell.contains(Point(point)) for cell, (ci, cj) in zip(grid_cells, cell_indices)
+                         if (ci // 2, cj // 2) == (i, j))]
+        assert coarse['count'][i, j] == len(inside)
+        assert abs(coarse['area'][i, j] - geometry.area) < 1e-3
+        if inside:
+            assert abs(coarse['sum'][i, j] - sum(inside)) < 1e-9
+            assert coarse['min'][i, j] == min(inside)
+            assert coarse['max'][i, j] == max(inside)
+
+    # Every station counted at the finest level is still counted once at the coarser level
+    assert coarse['count'].sum() == level['count'].sum()
+
+def test_derived_cells_come_from_the_coarse_grid(monkeypatch, make_finest_level, irregular_boundary):
+    level, grid_cells, cell_indices, _, station_scores, kdtree = make_finest_level()
+    level_indices, _ = level_cell_scores(derive_pyramid_level(level, 2), station_scores, kdtree)
+    merged = level_cell_geometries(grid_cells, cell_indices, 2, level_indices)
+
+    coarse_cells, coarse_indices = generate_grid_cells(irregular_boundary, *grid_coordinates(irregular_boundary.bounds, 8))
+    # Drop one coarse cell, it has to be merged from the finest cells instead
+    missing = tuple(level_indices[0])
+    kept = [(cell, index) for cell, index in zip(coarse_cells, coarse_indices) if index != missing]
+    coarse_grid = ([cell for cell, _ in kept], [index for _, index in kept])
+
+    union = shapely.coverage_union_all
+    calls = []
+    def counting_union(cells):
+        calls.append(len(cells))
+        return union(cells)
+    monkeypatch.setattr(grid_pyramid.shapely, 'coverage_union_all', counting_union)
+    geometries = level_cell_geometries(grid_cells, cell_indices, 2, level_indices, coarse_grid)
+    assert len(calls) == 1
+
+    coarse_lookup = dict(zip(coarse_grid[1], coarse_grid[0]))
+    for (i, j), geometry, merged_geometry in zip(level_indices, geometries, merged):
+        if (i, j) == missing:
+            assert geometry.equals(merged_geometry)
+        else:
+            assert geometry is coarse_lookup[(i, j)]
+            assert geometry.symmetric_difference(merged_geometry).area < 0.1 * geometry.area
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_cached_level_is_keyed_on_data_and_grid(monkeypatch, make_finest_level, irregular_boundary):
+    spacing = 4
+    x_grid, y_grid = grid_coordinates(irregular_boundary.bounds, spacing)
+    grid_cells, cell_indices = generate_grid_cells(irregular_boundary, x_grid, y_grid)
+    level, _, _, station_data, station_scores, _ = make_finest_level(spacing)
+    args = (grid_cells, cell_indices, x_grid, y_grid, station_data, station_scores)
+
+    monkeypatch.setattr(grid_pyramid, 'score_cache_key', lambda metric: 'first')
+    grid_pyramid.load_grid_pyramid('temperature', spacing, *args)
+    assert os.path.exists('computed/pyramid_temperature_4_miles_first.npz')
+
+    build = grid_pyramid.build_finest_level
+    monkeypatch.setattr(grid_pyramid, 'build_finest_level', lambda *args: pytest.fail("pyramid rebuilt"))
+    cached = grid_pyramid.load_grid_pyramid('temperature', spacing, *args)
+    assert set(cached) == set(level)
+    assert np.array_equal(cached['count'], level['count'])
+
+    # A different grid with the same spacing isn't served from the cache
+    with pytest.raises(pytest.fail.Exception):
+        grid_pyramid.load_grid_pyramid('temperature', spacing, grid_cells[:-1], cell_indices[:-1], *args[2:])
+
+    # Neither is changed station data or scoring code
+    monkeypatch.setattr(grid_pyramid, 'build_finest_level', build)
+    monkeypatch.setattr(grid_pyramid, 'score_cache_key', lambda metric: 'second')
+    grid_pyramid.load_grid_pyramid('temperature', spacing, *args)
+    assert os.path.exists('computed/pyramid_temperature_4_miles_second.npz')
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from shapely.geometry import Point
+from scipy.spatial import KDTree
+
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_scoring import score_grid_cells, project_stations, unproject_coordinates, SEVEN_BIN_COLORS
+from pyproj import Transformer
+from station_cache import station_cache_arrays
+from map_grid_render import score_colors, score_bins, score_rgba
+
+@pytest.fixture
+def make_scoring_inputs(irregular_boundary, station_points):
+    def make(spacing=5, n_stations=40):
+        x_grid, y_grid = grid_coordinates(irregular_boundary.bounds, spacing)
+        grid_cells, _ = generate_grid_cells(irregular_boundary, x_grid, y_grid)
+        station_data, station_scores, points = station_points(n_stations)
+        return grid_cells, station_data, station_scores, KDTree(points)
+    return make
+
+def test_cells_average_inside_stations_or_use_nearest(make_scoring_inputs):
+    grid_cells, station_data, station_scores, kdtree = make_scoring_inputs()
+    scores, assigned, nearest = score_grid_cells(grid_cells, station_data, station_scores, kdtree, 5, show_progress=False)
+
+    assert len(scores) == len(grid_cells)
+    assert assigned + nearest == len(grid_cells)
+    assert assigned > 0 and nearest > 0
+
+    for cell, score in zip(grid_cells, scores):
+        inside = [s for (_, _, point), s in zip(station_data, station_scores) if cell.contains(Point(point))]
+        if inside:
+            assert score == sum(inside) / len(inside)
+        else:
+            center = ((cell.bounds[0] + cell.bounds[2]) / 2, (cell.bounds[1] + cell.bounds[3]) / 2)
+            assert score == station_scores[kdtree.query(center)[1]]
+
+def test_parallel_scoring_matches_serial(make_scoring_inputs):
+    grid_cells, station_data, station_scores, kdtree = make_scoring_inputs()
+    serial = score_grid_cells(grid_cells, station_data, station_scores, kdtree, 5, show_progress=False)
+    parallel = score_grid_cells(grid_cells, station_data, station_scores, kdtree, 5, show_progress=False, workers=3)
+    assert parallel == serial
+
+def test_seven_bin_colors_at_edges():
+    # Scores on a bin edge fall in the lower bin, scores outside the range are clipped
+    colors = score_colors('temperature', [-5, 0, 1, 1.5, 7, 20], 0, 7)
+    assert colors == [SEVEN_BIN_COLORS[0], SEVEN_BIN_COLORS[0], SEVEN_BIN_COLORS[0],
+                      SEVEN_BIN_COLORS[1], SEVEN_BIN_COLORS[6], SEVEN_BIN_COLORS[6]]
+
+def test_vectorized_bins_match_per_score_loop():
+    def loop_bin(score, min_score, max_score, n_bins=7):
+        bin_edges = [min_score + (i * (max_score - min_score) / n_bins) for i in range(n_bins + 1)]
+        clipped_score = max(min_score, min(score, max_score))
+        for i in range(n_bins):
+            if bin_edges[i] <= clipped_score <= bin_edges[i + 1]:
+                return i
+        return 0
+
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        scores = rng.normal(20, 10, 40).round(1).tolist()
+        min_score, max_score = np.percentile(scores, 2), np.percentile(scores, 98)
+        scores += [min_score + (i * (max_score - min_score) / 7) for i in range(8)]
+        expected = [loop_bin(score, min_score, max_score) for score in scores]
+        assert score_bins('comfort', scores, min_score, max_score).tolist() == expected
+        assert score_rgba('comfort', scores, min_score, max_score)[:, :3].tolist() == [list(SEVEN_BIN_COLORS[b]) for b in expected]
+
+def test_stations_are_projected_in_one_call(make_station):
+    rng = np.random.default_rng(4)
+    stations = {}
+    for k in range(30):
+        if k % 7:
+            stations[f'S{k:02d}'] = make_station(f'S{k:02d}', latitude=float(rng.uniform(25, 49)),
+                                                 longitude=float(rng.uniform(-124, -67)))
+        else:
+            stations[f'S{k:02d}'] = make_station(f'S{k:02d}')
+
+    transformer = Transformer.from_crs("EPSG:4326", "EPSG:5070", always_xy=True)
+    station_data, station_points = project_stations(stations)
+    assert [station_id for station_id, _, _ in station_data] == [s for k, s in enumerate(stations) if k % 7]
+    for (station_id, station, point), row in zip(station_data, station_points):
+        assert np.allclose(point, transformer.transform(station.longitude, station.latitude))
+        assert np.allclose(row, point)
+
+    # The station cache holds the same coordinates, NaN for stations without a location
+    cache = station_cache_arrays(stations)
+    located = ~np.isnan(cache['latitude'])
+    assert np.allclose(np.column_stack([cache['x'], cache['y']])[located], station_points)
+    assert np.isnan(cache['x'][~located]).all()
+
+    # And converting them back gives the original longitudes and latitudes
+    longitude, latitude = unproject_coordinates(station_points[:, 0], station_points[:, 1])
+    assert np.allclose(longitude, [station.longitude for _, station, _ in station_data])
+    assert np.allclose(latitude, [station.latitude for _, station, _ in station_data])
@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from pyproj import Transformer
+
+import grid_tile_server
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_tile_server import load_grid_layer, layer_score_at, create_tile_server
+
+TO_LONLAT = Transformer.from_crs("EPSG:5070", "EPSG:4326", always_xy=True)
+
+@pytest.fixture
+def layer(monkeypatch, boundary):
+    x_grid, y_grid = grid_coordinates(boundary.bounds, 20)
+    grid_cells, cell_indices = generate_grid_cells(boundary, x_grid, y_grid)
+    scores = [float(i * 10 + j) for i, j in cell_indices]
+    monkeypatch.setattr(grid_tile_server, 'load_grid_cells', lambda us_boundary, spacing: (grid_cells, cell_indices))
+    monkeypatch.setattr(grid_tile_server, 'get_grid_scores', lambda metric, spacing, cells, workers: (scores, len(cells), 0))
+    monkeypatch.setattr(grid_tile_server, 'score_cache_key', lambda metric: 'abc')
+    return load_grid_layer('comfort', 20, boundary)
+
+def test_layer_score_lookup(layer):
+    spacing = layer['spacing']
+    x0, y0 = layer['origin']
+    longitude, latitude = TO_LONLAT.transform(x0 + 2.5 * spacing, y0 + 1.5 * spacing)
+    assert layer_score_at(layer, latitude, longitude) == 21.0
+
+    # Outside the cut-off corner
+    longitude, latitude = TO_LONLAT.transform(-105000, 1895000)
+    assert layer_score_at(layer, latitude, longitude) is None
+
+def test_tiles_and_conditional_requests(layer):
+    server = create_tile_server({'comfort': layer}, port=0, tile_cache_size=8)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        # The z=6 tile over Kansas
+        with urllib.request.urlopen(f"{base}/comfort/6/14/24.png") as response:
+            assert response.headers['Content-Type'] == 'image/png'
+            etag = response.headers['ETag']
+            assert response.read().startswith(b'\x89PNG')
+
+        request = urllib.request.Request(f"{base}/comfort/6/14/24.png", headers={'If-None-Match': etag})
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 304
+
+        with urllib.request.urlopen(f"{base}/comfort/scores") as response:
+            body = json.loads(response.read())
+        assert len(body['cells']) == np.count_nonzero(~np.isnan(layer['scores']))
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}/rainfall/6/14/24.png")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
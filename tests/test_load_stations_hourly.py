@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import load_stations_hourly
+from load_stations_hourly import (
+    parse_hourly_line, load_hourly_normals, feels_like_temperatures, feels_like_scores, load_stations_hourly as load_hourly_stations,
+)
+from scoring_profiles import ScoringProfile, DEFAULT_PROFILE, MONTH_DAYS
+from station import Station
+
+PROFILES = [DEFAULT_PROFILE, ScoringProfile(name='likes-heat', ideal_temp=85, hot_points_loss=1)]
+
+def write_hourly_file(path, station_ids, value, skip_feb_29=True):
+    lines = []
+    for station_id in station_ids:
+        for month in range(1, 13):
+            for day in range(1, MONTH_DAYS[month - 1] + 1):
+                if skip_feb_29 and (month, day) == (2, 29):
+                    continue
+                hours = ' '.join(f'{int(round(value(station_id, month, hour) * 10)):5d}C' for hour in range(24))
+                lines.append(f'{station_id} {month:02d} {day:02d} {hours}')
+    path.write_text('\n'.join(lines) + '\n')
+
+@pytest.fixture
+def hourly_files(tmp_path, monkeypatch):
+    files = {variable: str(tmp_path / f'hly-{variable}-normal.txt') for variable in ('temp', 'hidx', 'wchl', 'dewp')}
+    monkeypatch.setattr(load_stations_hourly, 'HOURLY_NORMAL_FILES', files)
+    monkeypatch.setattr(load_stations_hourly, 'HOURLY_STORE_DIR', str(tmp_path / 'hourly'))
+
+    def temp(station_id, month, hour):
+        return 20 + 7 * month + hour + (15 if station_id == 'B' else 0)
+
+    write_hourly_file(tmp_path / 'hly-temp-normal.txt', ['B', 'A', 'C'], temp)
+    write_hourly_file(tmp_path / 'hly-hidx-normal.txt', ['A', 'B'], lambda s, m, h: temp(s, m, h) + 5)
+    write_hourly_file(tmp_path / 'hly-wchl-normal.txt', ['A', 'C'], lambda s, m, h: temp(s, m, h) - 10)
+    return files
+
+def test_parse_hourly_line():
+    values = ' '.join(['  808C'] * 22 + ['-9999 ', '  -52P'])
+    station_id, day, hours = parse_hourly_line(f'USW00012345 03 01 {values}')
+    assert station_id == 'USW00012345'
+    assert day == 31 + 29
+    assert hours[0] == pytest.approx(80.8)
+    assert np.isnan(hours[22]) and hours[23] == pytest.approx(-5.2)
+    assert parse_hourly_line('USW00012345 02 30 ' + values) is None
+
+def test_store_layout(hourly_files):
+    station_ids, temp = load_hourly_normals('temp')
+    assert station_ids.tolist() == ['A', 'B', 'C']
+    assert temp.shape == (3, 366, 24) and temp.dtype == np.float16
+    assert isinstance(temp, np.memmap)
+    assert np.isnan(temp[:, 31 + 28]).all()  # Feb 29 isn't in the files
+    assert float(temp[1, 0, 5]) == pytest.approx(20 + 7 + 5 + 15)
+
+    _, temp32 = load_hourly_normals('temp', np.float32)
+    assert temp32.dtype == np.float32
+
+def test_feels_like_uses_heat_index_and_wind_chill():
+    temp = np.array([40.0, 72.0, 90.0, np.nan])
+    hidx = np.array([40.0, 72.0, 99.0, np.nan])
+    wchl = np.array([31.0, 72.0, 90.0, np.nan])
+    assert np.allclose(feels_like_temperatures(temp, hidx, wchl), [31, 72, 99, np.nan], equal_nan=True)
+    assert np.allclose(feels_like_temperatures(temp), temp, equal_nan=True)
+
+@pytest.mark.parametrize('chunk_size', [1, 512])
+def test_batch_scores_match_station_method(hourly_files, chunk_size):
+    station_ids, scores = feels_like_scores(PROFILES, chunk_size=chunk_size)
+    stations = load_hourly_stations()
+    assert station_ids.tolist() == list(stations) == ['A', 'B', 'C']
+
+    for p, profile in enumerate(PROFILES):
+        expected = [stations[station_id].get_feels_like_score(profile) for station_id in station_ids]
+        assert np.allclose(scores[p], expected)
+
+    # Heat index makes the hot station B feel worse than its air temperature alone
+    plain = Station()
+    plain.avg_hourly_feels_like = np.asarray(load_hourly_normals('temp')[1][1], dtype=np.float32)
+    assert stations['B'].get_feels_like_score() < plain.get_feels_like_score()
+
+def test_station_without_hourly_data_scores_zero():
+    assert Station().get_feels_like_score() == 0
+    with pytest.raises(ValueError):
+        Station().avg_hourly_feels_like = np.zeros((365, 24))
@@ -0,0 +1,100 @@
+import json
+import os
+import geopandas as gpd
+import numpy as np
+import pytest
+
+import map_batch
+from map_grid import grid_coordinates, generate_grid_cells
+from map_batch import load_manifest, run_batch
+from station_cache import station_cache_arrays
+
+@pytest.fixture
+def batch(in_tmp_dir, monkeypatch, boundary, synthetic_stations):
+    states = gpd.GeoDataFrame(geometry=[boundary], crs='EPSG:5070')
+    cache = station_cache_arrays(synthetic_stations)
+    calls = []
+
+    def fake_load_station_cache():
+        calls.append('stations')
+        return cache
+
+    def fake_load_grid_cells(us_boundary, spacing):
+        calls.append(('grid', spacing))
+        return generate_grid_cells(us_boundary, *grid_coordinates(us_boundary.bounds, spacing))
+
+    monkeypatch.setattr(map_batch, 'load_station_cache', fake_load_station_cache)
+    monkeypatch.setattr(map_batch, 'load_projected_states', lambda: (states, boundary))
+    monkeypatch.setattr(map_batch, 'load_grid_cells', fake_load_grid_cells)
+    (in_tmp_dir / 'stations.txt').write_text('first')
+    monkeypatch.setattr(map_batch, 'STATION_SOURCES', [str(in_tmp_dir / 'stations.txt')])
+
+    manifest = {
+        'profiles': [{'name': 'likes-heat', 'ideal_temp': 85}],
+        'jobs': [
+            {'metric': 'comfort', 'spacing': 20, 'dpi': 20},
+            {'metric': 'comfort', 'spacing': 20, 'profile': 'likes-heat', 'dpi': 20, 'formats': ['png', 'svg']},
+            {'metric': 'temperature', 'spacing': 10, 'dpi': 20, 'dissolve': True},
+        ],
+    }
+    (in_tmp_dir / 'manifest.json').write_text(json.dumps(manifest))
+    return in_tmp_dir, calls
+
+def test_batch_shares_data_and_skips_unchanged_outputs(batch):
+    tmp_path, calls = batch
+    jobs = load_manifest(str(tmp_path / 'manifest.json'))
+
+    rendered = run_batch(jobs, workers=2)
+    assert sorted(rendered) == [
+        'output/map_grid_comfort_20_miles_default',
+        'output/map_grid_comfort_20_miles_likes-heat',
+        'output/map_grid_temperature_10_miles_default',
+    ]
+    assert rendered['output/map_grid_comfort_20_miles_likes-heat'] == {
+        'png': 'output/map_grid_comfort_20_miles_likes-heat.png',
+        'svg': 'output/map_grid_comfort_20_miles_likes-heat.svg',
+    }
+    for paths in rendered.values():
+        assert all(os.path.exists(path) for path in paths.values())
+    # The station cache is loaded once, and each spacing's grid once
+    assert calls == ['stations', ('grid', 10), ('grid', 20)]
+
+    # Nothing changed, nothing is loaded or rendered
+    assert run_batch(jobs, workers=2) == {}
+    assert len(calls) == 3
+
+    # Changing one job's settings, or removing one of its outputs, only reruns that job
+    jobs[0]['percentiles'] = [5, 95]
+    os.remove('output/map_grid_temperature_10_miles_default.png')
+    assert sorted(run_batch(jobs, workers=1)) == [
+        'output/map_grid_comfort_20_miles_default',
+        'output/map_grid_temperature_10_miles_default',
+    ]
+
+def test_changed_station_data_or_scoring_code_reruns_every_job(batch, monkeypatch):
+    tmp_path, _ = batch
+    jobs = load_manifest(str(tmp_path / 'manifest.json'))
+    assert len(run_batch(jobs, workers=1)) == 3
+    assert run_batch(jobs, workers=1) == {}
+
+    # The station cache's data files are what the batch reads, so a change to one reruns everything
+    (tmp_path / 'stations.txt').write_text('second')
+    assert len(run_batch(jobs, workers=1)) == 3
+
+    # So does a change to the vectorised scoring code
+    def batch_precipitation_scores(profiles, rainy_days):
+        return rainy_days.sum(axis=1)[None, :] * 0
+    monkeypatch.setattr(map_batch, 'BATCH_SCORING_FUNCTIONS', map_batch.BATCH_SCORING_FUNCTIONS[:-1] + [batch_precipitation_scores])
+    assert len(run_batch(jobs, workers=1)) == 3
+
+def test_profile_changes_scores(batch):
+    tmp_path, _ = batch
+    jobs = load_manifest(str(tmp_path / 'manifest.json'))
+    _, _, scores = map_batch.score_jobs(jobs)
+    assert len(scores[0]) == len(scores[1])
+    assert not np.allclose(scores[0], scores[1])
+
+def test_manifest_rejects_unknown_profile(tmp_path):
+    (tmp_path / 'manifest.json').write_text(json.dumps([{'metric': 'comfort', 'profile': 'missing'}]))
+    with pytest.raises(ValueError):
+        load_manifest(str(tmp_path / 'manifest.json'))
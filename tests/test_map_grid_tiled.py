@@ -0,0 +1,87 @@
+import json
+import os
+import numpy as np
+import pytest
+from scipy.spatial import KDTree
+
+import map_grid_tiled
+from map_grid import grid_coordinates, generate_grid_cells
+from grid_scoring import score_grid_cells
+from map_grid_tiled import iter_grid_blocks, score_grid_block, _unpack_geometries
+
+@pytest.fixture
+def make_state(tmp_path, irregular_boundary, station_points):
+    def make(spacing):
+        x_grid, y_grid = grid_coordinates(irregular_boundary.bounds, spacing)
+        station_data, station_scores, points = station_points()
+        return {
+            'us_boundary': irregular_boundary,
+            'x_grid': x_grid,
+            'y_grid': y_grid,
+            'station_data': station_data,
+            'station_scores': station_scores,
+            'kdtree': KDTree(points),
+            'grid_spacing_miles': spacing,
+            'tile_dir': str(tmp_path),
+        }
+    return make
+
+def test_iter_grid_blocks_covers_grid_once():
+    seen = set()
+    for _, _, (i0, i1), (j0, j1) in iter_grid_blocks(10, 7, block_cells=4):
+        for i in range(i0, i1):
+            for j in range(j0, j1):
+                assert (i, j) not in seen
+                seen.add((i, j))
+    assert seen == {(i, j) for i in range(10) for j in range(7)}
+
+def test_blocks_match_untiled_grid(monkeypatch, make_state, irregular_boundary):
+    state = make_state(spacing=5)
+    monkeypatch.setattr(map_grid_tiled, '_block_state', state)
+
+    # Score the whole grid in one go
+    cells, indices = generate_grid_cells(irregular_boundary, state['x_grid'], state['y_grid'])
+    scores, _, _ = score_grid_cells(cells, state['station_data'], state['station_scores'], state['kdtree'], 5, show_progress=False)
+    expected = dict(zip(indices, scores))
+
+    # Score it again block by block
+    tiled = {}
+    tiled_cells = {}
+    for block in iter_grid_blocks(len(state['x_grid']) - 1, len(state['y_grid']) - 1, block_cells=3):
+        block_file, n_cells = score_grid_block(block)
+        if block_file is None:
+            continue
+        with np.load(block_file) as data:
+            assert len(data['scores']) == n_cells
+            for (i, j), score, cell in zip(data['cell_indices'], data['scores'], _unpack_geometries(data['wkb_data'], data['wkb_offsets'])):
+                tiled[(int(i), int(j))] = score
+                tiled_cells[(int(i), int(j))] = cell
+
+    assert tiled.keys() == expected.keys()
+    for key, score in expected.items():
+        assert tiled[key] == score
+        assert abs(tiled_cells[key].area - cells[indices.index(key)].area) < 1e-3
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_rerun_replaces_the_blocks_of_an_earlier_run(monkeypatch, make_state, irregular_boundary):
+    state = make_state(spacing=5)
+    monkeypatch.setattr(map_grid_tiled, 'load_metric_stations', lambda metric: {'station_ids': np.array([])})
+    monkeypatch.setattr(map_grid_tiled, 'load_projected_states', lambda: (None, irregular_boundary))
+    monkeypatch.setattr(map_grid_tiled, 'prepare_station_scoring',
+                        lambda stations, metric: (state['station_data'], state['station_scores'], state['kdtree']))
+
+    def stored_blocks():
+        return (sorted(name for name in os.listdir('computed/tiles/temperature_5_miles') if name.startswith('block_')),
+                sorted(os.listdir('output/tiles/temperature_5_miles')))
+
+    map_grid_tiled.create_tiled_grid_map('temperature', 5, block_cells=2, workers=2, pixels_per_cell=1)
+    assert len(stored_blocks()[0]) > 4
+    assert map_grid_tiled._block_state == {}
+
+    # Bigger blocks write fewer files, none of the smaller blocks may be left behind
+    index_file = map_grid_tiled.create_tiled_grid_map('temperature', 5, block_cells=8, workers=2, pixels_per_cell=1)
+    with open(index_file) as f:
+        index = json.load(f)
+    block_files, tiles = stored_blocks()
+    assert block_files == sorted(os.path.basename(block['scores']) for block in index['blocks'])
+    assert tiles == sorted(os.path.basename(block['tile']) for block in index['blocks'])
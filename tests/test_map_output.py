@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from PIL import Image
+
+from map_output import save_figure_formats, compress_png
+
+def _figure():
+    fig, ax = plt.subplots(figsize=(2, 2))
+    ax.imshow(np.arange(16).reshape(4, 4), cmap='RdYlGn', interpolation='nearest')
+    ax.set_axis_off()
+    return fig
+
+def test_all_formats_written_from_one_figure(tmp_path):
+    fig = _figure()
+    paths = save_figure_formats(fig, str(tmp_path / 'map'), ('png', 'svg', 'pdf', 'webp'), dpi=50)
+    plt.close(fig)
+
+    assert set(paths) == {'png', 'svg', 'pdf', 'webp'}
+    for output_format, path in paths.items():
+        assert path == str(tmp_path / f'map.{output_format}')
+        assert os.path.getsize(path) > 0
+    with Image.open(paths['webp']) as image:
+        assert image.format == 'WEBP'
+
+def test_lossless_png_compression_keeps_pixels(tmp_path):
+    fig = _figure()
+    plain = save_figure_formats(fig, str(tmp_path / 'plain'), ('png',), dpi=50)['png']
+    compressed = save_figure_formats(fig, str(tmp_path / 'compressed'), ('png',), dpi=50, compress_png=True)['png']
+    plt.close(fig)
+
+    with Image.open(plain) as a, Image.open(compressed) as b:
+        assert b.mode == 'P'
+        assert np.array_equal(np.asarray(a.convert('RGBA')), np.asarray(b.convert('RGBA')))
+    assert os.path.getsize(compressed) < os.path.getsize(plain)
+
+def test_quantized_png_has_palette(tmp_path):
+    path = str(tmp_path / 'gradient.png')
+    gradient = np.linspace(0, 255, 64 * 64 * 3).reshape(64, 64, 3).astype(np.uint8)
+    Image.fromarray(gradient).save(path)
+
+    assert compress_png(path, colors=16)
+    with Image.open(path) as image:
+        assert image.mode == 'P'
+        assert len(image.getcolors()) <= 16
+
+def test_prepare_runs_per_format_without_changing_figure(tmp_path):
+    fig = _figure()
+
+    def prepare(fig, output_format):
+        fig.axes[0].set_title(f'prepared for {output_format}')
+
+    paths = save_figure_formats(fig, str(tmp_path / 'map'), ('svg', 'pdf'), workers=1, prepare=prepare)
+
+    with open(paths['svg']) as f:
+        svg = f.read()
+    assert 'prepared for svg' in svg
+    assert fig.axes[0].get_title() == ''
+    plt.close(fig)
+
+def test_unknown_format_rejected(tmp_path):
+    fig = _figure()
+    with pytest.raises(ValueError):
+        save_figure_formats(fig, str(tmp_path / 'map'), ('bmp',))
+    plt.close(fig)
@@ -0,0 +1,79 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pytest
+
+import map_grid_change
+import station_cache
+from normals_periods import encode_station_ids, decode_station_ids, align_periods, get_normals_period
+from scoring_profiles import DEFAULT_PROFILE
+from station_cache import load_station_cache, station_cache_arrays
+from map_grid import grid_coordinates, generate_grid_cells
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_station_codes_are_shared_between_periods():
+    first = encode_station_ids(['B', 'A', 'C'])
+    second = encode_station_ids(['D', 'A', 'B'])
+
+    assert first.tolist() == [0, 1, 2]
+    assert second.tolist() == [3, 1, 0]
+    assert decode_station_ids(second).tolist() == ['D', 'A', 'B']
+
+    rows, other_rows = align_periods(first, second)
+    assert first[rows].tolist() == second[other_rows].tolist() == [0, 1]
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_each_period_has_its_own_cache(monkeypatch, make_station):
+    periods = {
+        None: {'A': make_station('A', 70.0, 2.0, latitude=40.0), 'B': make_station('B', 80.0, 2.0, latitude=40.0)},
+        '1991-2020': {'B': make_station('B', 75.0, 2.0, latitude=40.0), 'C': make_station('C', 72.0, 2.0, latitude=40.0)},
+    }
+    calls = []
+    def fake_load_stations(**paths):
+        period = None if not paths else '1991-2020'
+        calls.append(period)
+        assert not paths or paths == get_normals_period('1991-2020').paths()
+        return periods[period]
+    monkeypatch.setattr(station_cache, 'load_stations', fake_load_stations)
+
+    base = load_station_cache()
+    later = load_station_cache(period='1991-2020')
+    load_station_cache(period='1991-2020')
+
+    assert calls == [None, '1991-2020']
+    assert os.path.exists('computed/stations_1991-2020.npz')
+    assert base['station_codes'].tolist() == [0, 1]
+    assert later['station_codes'].tolist() == [1, 2]
+
+    # Only station B is in both periods, and its ideal days moved from 80°F to 75°F
+    monkeypatch.setattr(map_grid_change, 'load_station_cache', lambda period=None: base if period == '1981-2010' else later)
+    stations, changes = map_grid_change.period_score_changes('temperature', '1981-2010', '1991-2020', [DEFAULT_PROFILE])
+    assert stations['station_ids'].tolist() == ['B']
+    assert np.allclose(changes, [[(40 - 3 * 3) - (40 - 3 * 8)]])
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_change_map_uses_shared_stations(monkeypatch, make_station, boundary):
+    rng = np.random.default_rng(2)
+    (x0, y0, x1, y1) = boundary.bounds
+    periods = {}
+    for name, warming in (('1981-2010', 0.0), ('1991-2020', 2.0)):
+        stations = {}
+        for k in range(15):
+            xy = (rng.uniform(x0, x1), rng.uniform(y0, y1))
+            stations[f'S{k:02d}'] = make_station(f'S{k:02d}', 70.0 + k + warming, 2.0, xy=xy)
+        cache = station_cache_arrays(stations)
+        cache['station_codes'] = encode_station_ids(cache['station_ids'])
+        periods[name] = cache
+
+    grid_cells, cell_indices = generate_grid_cells(boundary, *grid_coordinates(boundary.bounds, 20))
+    monkeypatch.setattr(map_grid_change, 'load_station_cache', lambda period=None: periods[period])
+    monkeypatch.setattr(map_grid_change, 'load_projected_states', lambda: (gpd.GeoDataFrame(geometry=[boundary], crs='EPSG:5070'), boundary))
+    monkeypatch.setattr(map_grid_change, 'load_grid_cells', lambda us_boundary, spacing: (grid_cells, cell_indices))
+
+    paths, cell_changes = map_grid_change.create_change_map('temperature', '1981-2010', '1991-2020', 20)
+    assert paths == {'png': 'output/map_grid_temperature_change_1981-2010_to_1991-2020.png'}
+    assert os.path.exists(paths['png'])
+    assert cell_changes.shape == (len(grid_cells),)
+    # Every station got 2°F warmer: +2 points at 70°F, -2 at 71°F and -6 from 72°F up
+    assert np.all((cell_changes >= -6 - 1e-9) & (cell_changes <= 2 + 1e-9))
+    assert np.isclose(cell_changes, -6).any()
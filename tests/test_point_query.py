@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import point_query
+import spatial_index
+from station_cache import station_cache_arrays
+from point_query import score_at, scores_at
+
+@pytest.fixture
+def stations(in_tmp_dir, monkeypatch, make_station):
+    stations = {
+        'A': make_station('A', 72.0, 1.0, latitude=40.0, longitude=-100.0),
+        'B': make_station('B', 62.0, 1.0, latitude=40.0, longitude=-99.0),
+        'C': make_station('C', 82.0, 1.0, latitude=41.0, longitude=-100.0),
+    }
+    monkeypatch.setattr(point_query, 'load_station_cache', lambda: station_cache_arrays(stations))
+    monkeypatch.setattr(point_query, '_query_state', {})
+    return stations
+
+def test_nearest_station_score(stations):
+    score, station_ids = score_at(40.1, -99.1, metric='comfort')
+    assert station_ids == ['B']
+    assert score == pytest.approx(stations['B'].get_total_score())
+
+def test_idw_scores(stations):
+    scores, station_ids, distances = scores_at([40.0, 40.5], [-100.0, -99.6], metric='temperature', method='idw', k=3)
+
+    # Right on top of a station
+    assert scores[0] == pytest.approx(stations['A'].get_temperature_score())
+
+    weights = 1 / distances[1] ** 2
+    expected = [stations[station_id].get_temperature_score() for station_id in station_ids[1]]
+    assert scores[1] == pytest.approx(np.dot(weights, expected) / weights.sum())
+    assert sorted(station_ids[1]) == ['A', 'B', 'C']
+
+def test_state_is_reused_across_calls(stations, monkeypatch):
+    score_at(40.0, -100.0)
+    monkeypatch.setattr(point_query, 'load_station_cache', lambda: pytest.fail("stations reloaded"))
+    scores, _, _ = scores_at(np.full(1000, 40.0), np.full(1000, -100.0))
+    assert len(scores) == 1000
+
+def test_kdtree_is_stored_between_processes(stations, monkeypatch):
+    score_at(40.0, -100.0)
+
+    # A new process starts without _query_state but finds the stored tree
+    monkeypatch.setattr(point_query, '_query_state', {})
+    monkeypatch.setattr(spatial_index, 'KDTree', lambda points: pytest.fail("KD-tree rebuilt"))
+    score, station_ids = score_at(40.1, -99.1)
+    assert station_ids == ['B']
@@ -0,0 +1,43 @@
+import os
+import pytest
+
+import score_cache
+from score_cache import get_grid_scores, source_fingerprint
+
+def test_source_fingerprint_detects_changed_files(tmp_path):
+    data_dir = tmp_path / "normals-monthly"
+    data_dir.mkdir()
+    (data_dir / "A.csv").write_text("DATE\n01\n")
+    before = source_fingerprint([str(data_dir)])
+    assert source_fingerprint([str(data_dir)]) == before
+
+    (data_dir / "B.csv").write_text("DATE\n01\n")
+    assert source_fingerprint([str(data_dir)]) != before
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_cached_scores_skip_loading(tmp_path, monkeypatch):
+    monkeypatch.setitem(score_cache.METRIC_SOURCES, 'temperature', [str(tmp_path / "tmax.txt")])
+    (tmp_path / "tmax.txt").write_text("v1")
+
+    calls = []
+    def fake_compute(metric, grid_spacing_miles, grid_cells, workers, incremental):
+        calls.append(metric)
+        return [float(k) for k in range(len(grid_cells))], 2, 1
+    monkeypatch.setattr(score_cache, 'compute_grid_scores', fake_compute)
+
+    grid_cells = [None, None, None]
+    assert get_grid_scores('temperature', 10, grid_cells) == ([0.0, 1.0, 2.0], 2, 1)
+    assert get_grid_scores('temperature', 10, grid_cells) == ([0.0, 1.0, 2.0], 2, 1)
+    assert calls == ['temperature']
+
+    # New station data means new scores, which replace the old ones on disk
+    first_file = score_cache.score_cache_file('temperature', 10)
+    (tmp_path / "computed" / "scores_temperature_100_miles_0123456789abcdef.npz").write_bytes(b"other spacing")
+    (tmp_path / "tmax.txt").write_text("v2 with more data")
+    get_grid_scores('temperature', 10, grid_cells)
+    assert calls == ['temperature', 'temperature']
+    assert sorted(os.listdir('computed')) == sorted([
+        os.path.basename(score_cache.score_cache_file('temperature', 10)),
+        "scores_temperature_100_miles_0123456789abcdef.npz",
+    ])
+    assert not os.path.exists(first_file)
@@ -0,0 +1,76 @@
+import json
+import numpy as np
+import pytest
+
+from station import Station
+from scoring_profiles import (
+    ScoringProfile, DEFAULT_PROFILE, load_scoring_profiles, station_arrays, batch_station_scores,
+    batch_temperature_scores, temperature_summary, summary_temperature_scores,
+)
+
+PROFILES = [
+    DEFAULT_PROFILE,
+    ScoringProfile(name='likes-heat', ideal_temp=85, hot_points_loss=1),
+    ScoringProfile(name='hates-rain', ideal_temp=68, cold_points_loss=2, rainy_day_points=-20),
+]
+
+@pytest.fixture
+def make_stations(make_station):
+    def make_random_stations(n_stations=10):
+        rng = np.random.default_rng(0)
+        stations = []
+        for k in range(n_stations):
+            temps = rng.uniform(20, 105, size=(12, 31)).round(1).tolist()
+            temps[1][29] = temps[1][30] = None  # Feb 30 and 31 don't exist
+            # One station without temperature data and one without precipitation data
+            rainy_days = rng.uniform(0, 10, size=12).tolist() if k != 5 else None
+            stations.append(make_station(f"S{k}", temps if k != 3 else None, rainy_days))
+        return stations
+    return make_random_stations
+
+def test_default_profile_keeps_original_scores():
+    temps = [[72 for _ in range(31)] for _ in range(12)]
+    temps[0][0] = 62
+    temps[0][1] = 82
+    station = Station()
+    station.avg_daily_max_temperature = temps
+    station.avg_rainy_days_per_month = [3] * 12
+
+    assert station.get_temperature_score() == (40 * 370 + 30 + 10) / 372
+    assert station.get_precipitation_score() == 36 * 30 / 366
+    assert station.get_total_score(DEFAULT_PROFILE) == station.get_total_score()
+
+@pytest.mark.parametrize('metric, method', [
+    ('temperature', Station.get_temperature_score),
+    ('precipitation', Station.get_precipitation_score),
+    ('comfort', Station.get_total_score),
+])
+def test_batch_scores_match_station_methods(metric, method, make_stations):
+    stations = make_stations()
+    daily_max, rainy_days = station_arrays(stations)
+
+    scores = batch_station_scores(metric, PROFILES, daily_max, rainy_days)
+
+    assert scores.shape == (len(PROFILES), len(stations))
+    for p, profile in enumerate(PROFILES):
+        expected = [method(station, profile) for station in stations]
+        assert scores[p] == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+def test_load_scoring_profiles(tmp_path):
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps([{'name': 'warm', 'ideal_temp': 80}, {'name': 'default'}]))
+
+    warm, default = load_scoring_profiles(path)
+
+    assert warm.ideal_temp == 80 and warm.hot_points_loss == DEFAULT_PROFILE.hot_points_loss
+    assert default.to_dict() == DEFAULT_PROFILE.to_dict()
+
+def test_temperature_summary_scores_match_daily_scores(make_stations):
+    stations = make_stations(30)
+    daily_max, _ = station_arrays(stations)
+    profiles = PROFILES + [ScoringProfile(ideal_temp=71.55), ScoringProfile(ideal_temp=-40), ScoringProfile(ideal_temp=140)]
+
+    summary = temperature_summary(daily_max)
+
+    assert summary['tmax_days'].tolist() == [0 if k == 3 else 370 for k in range(30)]
+    assert summary_temperature_scores(profiles, summary) == pytest.approx(batch_temperature_scores(profiles, daily_max), rel=1e-12, abs=1e-12)
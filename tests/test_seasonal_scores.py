@@ -0,0 +1,81 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pytest
+from PIL import Image
+
+import map_grid_seasonal
+import map_grid_profiles
+from map_grid import grid_coordinates, generate_grid_cells
+from station_cache import station_cache_arrays
+from scoring_profiles import (
+    ScoringProfile, DEFAULT_PROFILE, MONTH_DAYS, station_arrays, batch_station_scores, batch_monthly_scores,
+)
+
+PROFILES = [DEFAULT_PROFILE, ScoringProfile(name='likes-heat', ideal_temp=85, hot_points_loss=1, rainy_day_points=5)]
+
+@pytest.fixture
+def stations(make_station, boundary):
+    rng = np.random.default_rng(1)
+    (x0, y0, x1, y1) = boundary.bounds
+    stations = {}
+    for k in range(20):
+        xy = (rng.uniform(x0, x1), rng.uniform(y0, y1))
+        temperatures = []
+        for month, days in enumerate(MONTH_DAYS):
+            month_temps = [round(float(t), 1) for t in 50 + 30 * np.sin(np.pi * month / 11) + rng.normal(0, 5, days)]
+            temperatures.append(month_temps + [None] * (31 - days))
+        # One month without data
+        if k == 0:
+            temperatures[3] = [None] * 31
+        rainy_days = [float(d) for d in rng.uniform(0, 10, 12)]
+        stations[f'S{k:02d}'] = make_station(f'S{k:02d}', temperatures, rainy_days, xy=xy)
+    return stations
+
+@pytest.mark.parametrize('metric', ['temperature', 'precipitation', 'comfort'])
+def test_months_average_to_annual_scores(metric, stations):
+    daily_max, rainy_days = station_arrays(list(stations.values()))
+    monthly = batch_monthly_scores(metric, PROFILES, daily_max, rainy_days)
+    annual = batch_station_scores(metric, PROFILES, daily_max, rainy_days)
+    assert monthly.shape == (2, 20, 12)
+
+    # Temperature months weigh by their valid days, precipitation months by their calendar days
+    valid_days = np.count_nonzero(~np.isnan(daily_max), axis=2)
+    temperature = np.sum(batch_monthly_scores('temperature', PROFILES, daily_max, rainy_days) * valid_days, axis=2) / valid_days.sum(axis=1)
+    precipitation = np.sum(batch_monthly_scores('precipitation', PROFILES, daily_max, rainy_days) * MONTH_DAYS, axis=2) / 366
+    expected = {'temperature': temperature, 'precipitation': precipitation, 'comfort': temperature + precipitation}[metric]
+    assert np.allclose(expected, annual)
+
+def test_month_without_data_scores_zero(stations):
+    daily_max, rainy_days = station_arrays(list(stations.values()))
+    assert batch_monthly_scores('temperature', PROFILES, daily_max, rainy_days)[0, 0, 3] == 0
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_seasonal_cube_and_small_multiples(monkeypatch, boundary, stations):
+    cache = station_cache_arrays(stations)
+    grid_cells, cell_indices = generate_grid_cells(boundary, *grid_coordinates(boundary.bounds, 20))
+    monkeypatch.setattr(map_grid_profiles, 'load_station_cache', lambda: cache)
+    monkeypatch.setattr(map_grid_seasonal, 'load_projected_states', lambda: (gpd.GeoDataFrame(geometry=[boundary], crs='EPSG:5070'), boundary))
+    monkeypatch.setattr(map_grid_seasonal, 'load_grid_cells', lambda us_boundary, spacing: (grid_cells, cell_indices))
+
+    cube = map_grid_seasonal.seasonal_cell_scores('comfort', PROFILES, grid_cells, 20)
+    assert cube.shape == (2, len(grid_cells), 12)
+
+    # Every profile's months are the same cells as its annual map
+    weights = map_grid_profiles.cell_station_weights(
+        grid_cells, *map_grid_profiles.load_projected_metric_stations('comfort')[1:], 20
+    )
+    metric_stations = map_grid_profiles.select_stations(cache, map_grid_profiles.metric_station_mask(cache, 'comfort'))
+    station_monthly = batch_monthly_scores('comfort', PROFILES, metric_stations['daily_max'], metric_stations['rainy_days'])
+    for p in range(2):
+        assert np.allclose(cube[p], weights @ station_monthly[p])
+
+    output_file, cell_scores = map_grid_seasonal.create_seasonal_maps('comfort', 20, output='grid')
+    assert output_file == 'output/map_grid_comfort_monthly.png'
+    assert os.path.exists(output_file)
+    assert np.allclose(cell_scores, cube[0])
+
+    output_file, _ = map_grid_seasonal.create_seasonal_maps('temperature', 20, PROFILES[1], output='gif')
+    assert output_file == 'output/map_grid_temperature_monthly_likes-heat.gif'
+    with Image.open(output_file) as image:
+        assert image.n_frames == 12
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+from scipy.spatial import KDTree
+
+import map_grid_profiles
+import spatial_index
+from map_grid import grid_coordinates, generate_grid_cells
+from spatial_index import load_kdtree
+
+@pytest.fixture
+def make_inputs(irregular_boundary, station_points):
+    def make():
+        grid_cells, _ = generate_grid_cells(irregular_boundary, *grid_coordinates(irregular_boundary.bounds, 5))
+        station_data, _, points = station_points()
+        return grid_cells, station_data, points
+    return make
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_kdtree_is_stored_per_point_set(monkeypatch, make_inputs):
+    _, _, points = make_inputs()
+
+    tree = load_kdtree(points, 'stations')
+    monkeypatch.setattr(spatial_index, 'KDTree', lambda points: pytest.fail("KD-tree rebuilt"))
+    stored = load_kdtree(points, 'stations')
+    assert np.array_equal(stored.data, tree.data)
+    assert stored.query([50000, 50000])[1] == tree.query([50000, 50000])[1]
+
+    # Other points get their own tree
+    with pytest.raises(pytest.fail.Exception):
+        load_kdtree(points[:-1], 'stations')
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_older_kdtrees_are_removed(make_inputs):
+    _, _, points = make_inputs()
+
+    load_kdtree(points, 'stations')
+    load_kdtree(points, 'stations_comfort')
+    load_kdtree(points[:-1], 'stations')
+
+    # Only the newest tree of each name is kept
+    stored = sorted(os.listdir(spatial_index.SPATIAL_INDEX_DIR))
+    assert stored == sorted([
+        f"stations_{spatial_index.array_digest(points[:-1])}.pkl",
+        f"stations_comfort_{spatial_index.array_digest(points)}.pkl",
+    ])
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_cell_index_is_stored_per_grid_and_stations(monkeypatch, make_inputs):
+    grid_cells, station_data, points = make_inputs()
+    kdtree = KDTree(points)
+
+    index = map_grid_profiles.load_cell_index(grid_cells, station_data, kdtree, 5)
+    assert index['centers'].shape == (len(grid_cells), 2)
+    assert index['nearest'].tolist() == kdtree.query(index['centers'])[1].tolist()
+    assert np.allclose(index['weights'].sum(axis=1), 1)
+
+    monkeypatch.setattr(map_grid_profiles, 'build_cell_index', lambda *args: pytest.fail("cell index rebuilt"))
+    stored = map_grid_profiles.load_cell_index(grid_cells, station_data, kdtree, 5)
+    assert np.array_equal(stored['nearest'], index['nearest'])
+    assert (stored['weights'] != index['weights']).nnz == 0
+    assert (map_grid_profiles.cell_station_weights(grid_cells, station_data, kdtree, 5) != index['weights']).nnz == 0
+
+    # Moving a station needs a new index
+    moved_points = points.copy()
+    moved_points[0] += 1000
+    with pytest.raises(pytest.fail.Exception):
+        map_grid_profiles.load_cell_index(grid_cells, station_data, KDTree(moved_points), 5)
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_each_point_source_keeps_its_tree(monkeypatch, make_inputs):
+    _, station_data, points = make_inputs()
+
+    # The station cache callers and the change maps (only the stations of both periods) use different points
+    load_kdtree(points, 'cache_stations_comfort')
+    load_kdtree(points[::2], 'cache_stations_comfort_1981-2010_to_1991-2020')
+
+    monkeypatch.setattr(spatial_index, 'KDTree', lambda points: pytest.fail("KD-tree rebuilt"))
+    load_kdtree(points, 'cache_stations_comfort')
+    load_kdtree(points[::2], 'cache_stations_comfort_1981-2010_to_1991-2020')
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_least_recently_used_cell_indexes_are_removed(monkeypatch, make_inputs):
+    grid_cells, station_data, points = make_inputs()
+    monkeypatch.setattr(spatial_index, 'CELL_INDEXES_KEPT', 2)
+
+    def index_files():
+        return sorted(name for name in os.listdir(spatial_index.SPATIAL_INDEX_DIR) if name.startswith('cells_'))
+
+    kdtrees = [KDTree(points + offset) for offset in (0, 1000, 2000)]
+    map_grid_profiles.load_cell_index(grid_cells, station_data, kdtrees[0], 5)
+    first = index_files()
+    map_grid_profiles.load_cell_index(grid_cells, station_data, kdtrees[1], 5)
+    second = sorted(set(index_files()) - set(first))
+
+    # Age the second index and use the first one again, the second is then the least recently used
+    os.utime(os.path.join(spatial_index.SPATIAL_INDEX_DIR, second[0]), ns=(0, 0))
+    map_grid_profiles.load_cell_index(grid_cells, station_data, kdtrees[0], 5)
+    map_grid_profiles.load_cell_index(grid_cells, station_data, kdtrees[2], 5)
+    remaining = index_files()
+    assert len(remaining) == 2 and first[0] in remaining and second[0] not in remaining
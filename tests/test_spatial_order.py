@@ -0,0 +1,44 @@
+import numpy as np
+
+from spatial_order import hilbert_index, hilbert_order, grid_order
+from station_cache import station_cache_arrays, spatial_sort, original_order, select_stations
+
+def test_hilbert_curve_visits_neighbors():
+    side = 16
+    xs, ys = np.meshgrid(np.arange(side), np.arange(side), indexing='ij')
+    d = hilbert_index(xs.ravel(), ys.ravel(), (0, 0, side - 1, side - 1), bits=4)
+    assert sorted(d.tolist()) == list(range(side * side))
+
+    # Every step along the curve moves to an adjacent cell
+    points = np.column_stack([xs.ravel(), ys.ravel()])[np.argsort(d)]
+    assert np.all(np.abs(np.diff(points, axis=0)).sum(axis=1) == 1)
+
+    cell_indices = np.column_stack([xs.ravel(), ys.ravel()])
+    ordered_cells = cell_indices[grid_order(cell_indices)]
+    assert np.all(np.abs(np.diff(ordered_cells, axis=0)).sum(axis=1) == 1)
+
+def test_missing_coordinates_go_last():
+    order = hilbert_order([0.0, np.nan, 5.0, 1.0], [0.0, 1.0, 5.0, np.nan])
+    assert sorted(order[:2].tolist()) == [0, 2]
+    assert order[2:].tolist() == [1, 3]
+
+def test_spatial_sort_keeps_the_load_order(make_station):
+    rng = np.random.default_rng(3)
+    stations = {}
+    for k in range(50):
+        if k % 10:
+            latitude, longitude = float(rng.uniform(30, 45)), float(rng.uniform(-120, -75))
+        else:
+            latitude = longitude = None
+        stations[f'S{k:02d}'] = make_station(f'S{k:02d}', rainy_days=k / 2, latitude=latitude, longitude=longitude)
+
+    arrays = station_cache_arrays(stations)
+    sorted_arrays = spatial_sort(arrays)
+
+    assert sorted(sorted_arrays['station_ids'].tolist()) == arrays['station_ids'].tolist()
+    assert np.isnan(sorted_arrays['latitude'][-5:]).all()
+    assert np.array_equal(sorted_arrays['rainy_days'][:, 0], [int(station_id[1:]) / 2 for station_id in sorted_arrays['station_ids']])
+
+    restored = select_stations(sorted_arrays, original_order(sorted_arrays))
+    for name, values in arrays.items():
+        assert np.array_equal(restored[name], values, equal_nan=values.dtype.kind == 'f')
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import station_cache
+from station_cache import load_station_cache, metric_station_mask, select_stations, original_order
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_station_cache_rebuilds_when_sources_change(tmp_path, monkeypatch, make_station):
+    monkeypatch.setattr(station_cache, 'STATION_SOURCES', [str(tmp_path / "tmax.txt")])
+    (tmp_path / "tmax.txt").write_text("v1")
+
+    stations = {
+        'A': make_station('A', 70.5, 2.0, latitude=40.0),
+        'B': make_station('B', 80.0, latitude=35.0),
+        'C': make_station('C', rainy_days=1.0),
+    }
+    calls = []
+    def fake_load_stations():
+        calls.append(1)
+        return stations
+    monkeypatch.setattr(station_cache, 'load_stations', fake_load_stations)
+
+    cache = load_station_cache()
+    assert load_station_cache()['station_ids'].tolist() == cache['station_ids'].tolist()
+    assert len(calls) == 1
+
+    # The stations are stored along a space-filling curve, the one without coordinates last
+    assert cache['station_ids'][-1] == 'C'
+    cache = select_stations(cache, original_order(cache))
+    assert cache['station_ids'].tolist() == ['A', 'B', 'C']
+
+    assert cache['tmax_days'].tolist() == [372, 372, 0]
+    assert cache['tmax_cumsum'][0, -1] == 372 * 705
+    assert metric_station_mask(cache, 'comfort').tolist() == [True, False, False]
+    assert metric_station_mask(cache, 'temperature').tolist() == [True, True, False]
+    assert np.isnan(cache['latitude'][2])
+
+    (tmp_path / "tmax.txt").write_text("v2 with more data")
+    load_station_cache()
+    assert len(calls) == 2
@@ -0,0 +1,107 @@
+import os
+import pytest
+
+import station_index
+import load_stations_daily_temp as daily_temp_module
+import load_stations_monthly_precip as monthly_precip_module
+from load_stations_daily_temp import load_stations_daily_temp
+from load_stations_monthly_precip import pack_monthly_precip_archive
+from load_stations import load_stations
+from station_index import load_station, load_stations_by_id
+
+def tmax_line(station_id, month, value):
+    return f"{station_id} {month:02d} " + " ".join(f"{value}C" for _ in range(31)) + "\n"
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_stations_load_from_the_index(tmp_path, monkeypatch):
+    tmax_file = tmp_path / "dly-tmax-normal.txt"
+    tmax_file.write_text(
+        tmax_line("USW1", 1, 700) + tmax_line("USW1", 2, 710) + tmax_line("USC2", 1, 800) + tmax_line("USW1", 3, 720)
+    )
+    data_dir = tmp_path / "normals-monthly"
+    data_dir.mkdir()
+    rows = "".join(f"{month:02d},60,40.5,-100.25\n" for month in range(1, 13))
+    (data_dir / "USW1.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    monkeypatch.setattr(daily_temp_module, 'DAILY_TMAX_NORMAL_FILE', str(tmax_file))
+    monkeypatch.setattr(station_index, 'DAILY_TMAX_NORMAL_FILE', str(tmax_file))
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_DIR', str(data_dir))
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_ARCHIVE', str(tmp_path / "normals-monthly.npz"))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_DIR', str(data_dir))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_ARCHIVE', str(tmp_path / "normals-monthly.npz"))
+    monkeypatch.setattr(station_index, '_loaded', {})
+
+    expected = load_stations_daily_temp()
+    station = load_station("USW1")
+
+    assert station.avg_daily_max_temperature == expected["USW1"].avg_daily_max_temperature
+    assert station.avg_rainy_days_per_month == [2.0] * 12
+    assert (station.latitude, station.longitude) == (40.5, -100.25)
+    assert os.path.exists(station_index.STATION_INDEX_FILE)
+
+    # Same result from the packed precipitation archive
+    os.utime(data_dir, ns=(1, 1))
+    pack_monthly_precip_archive()
+    assert load_station("USW1").get_total_score() == station.get_total_score()
+    assert station_index._precip_archive() is not None
+
+    # An archive that is older than the CSV files isn't used
+    rows = "".join(f"{month:02d},90,40.5,-100.25\n" for month in range(1, 13))
+    (data_dir / "USW1.new").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    os.replace(data_dir / "USW1.new", data_dir / "USW1.csv")
+    monkeypatch.setattr(station_index, '_loaded', {})
+    assert load_station("USW1").avg_rainy_days_per_month == [3.0] * 12
+    assert station_index._precip_archive() is None
+
+    stations = load_stations_by_id(["USC2", "MISSING"])
+    assert list(stations) == ["USC2"]
+    assert stations["USC2"].avg_daily_max_temperature[0][0] == 80.0
+    assert stations["USC2"].avg_rainy_days_per_month == []
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_precipitation_without_coordinates(tmp_path, monkeypatch):
+    tmax_file = tmp_path / "dly-tmax-normal.txt"
+    tmax_file.write_text(tmax_line("USW1", 1, 700))
+    data_dir = tmp_path / "normals-monthly"
+    data_dir.mkdir()
+    rows = "".join(f"{month:02d},60\n" for month in range(1, 13))
+    (data_dir / "USW1.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI\n" + rows)
+    monkeypatch.setattr(station_index, 'DAILY_TMAX_NORMAL_FILE', str(tmax_file))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_DIR', str(data_dir))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_ARCHIVE', str(tmp_path / "normals-monthly.npz"))
+    monkeypatch.setattr(station_index, '_loaded', {})
+
+    # The CSV has no LATITUDE/LONGITUDE columns, so the station keeps having no location
+    station = load_station("USW1")
+    assert station.avg_rainy_days_per_month == [2.0] * 12
+    assert station.avg_daily_max_temperature[0][0] == 70.0
+    assert (station.latitude, station.longitude) == (None, None)
+
+@pytest.mark.usefixtures('in_tmp_dir')
+def test_load_station_matches_load_stations(tmp_path, monkeypatch):
+    zipcodes_file = tmp_path / "zipcodes-normals-stations.txt"
+    zipcodes_file.write_text("USW1 66044 LAWRENCE\nUSZ3 67530 GREAT BEND\nUSB5 67901 LIBERAL\n")
+    tmax_file = tmp_path / "dly-tmax-normal.txt"
+    tmax_file.write_text(tmax_line("USW1", 1, 700) + tmax_line("USC2", 1, 800))
+    data_dir = tmp_path / "normals-monthly"
+    data_dir.mkdir()
+    for station_id, coordinates in [("USW1", ",38.9,-95.2"), ("USP4", ",37.1,-98.4"), ("USB5", "")]:
+        header = "DATE,MLY-PRCP-AVGNDS-GE050HI" + (",LATITUDE,LONGITUDE" if coordinates else "")
+        rows = "".join(f"{month:02d},{month * 10}{coordinates}\n" for month in range(1, 13))
+        (data_dir / f"{station_id}.csv").write_text(header + "\n" + rows)
+    archive = tmp_path / "normals-monthly.npz"
+    monkeypatch.setattr(station_index, 'ZIPCODES_NORMALS_STATIONS', str(zipcodes_file))
+    monkeypatch.setattr(station_index, 'DAILY_TMAX_NORMAL_FILE', str(tmax_file))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_DIR', str(data_dir))
+    monkeypatch.setattr(station_index, 'MONTHLY_PRECIP_ARCHIVE', str(archive))
+    monkeypatch.setattr(station_index, '_loaded', {})
+
+    expected = load_stations(str(zipcodes_file), str(tmax_file), str(data_dir), str(archive))
+    assert sorted(expected) == ["USB5", "USC2", "USP4", "USW1", "USZ3"]
+
+    for station_id, expected_station in expected.items():
+        station = load_station(station_id)
+        for field in ['station_id', 'zipcode', 'latitude', 'longitude',
+                      'avg_daily_max_temperature', 'avg_rainy_days_per_month']:
+            assert getattr(station, field) == getattr(expected_station, field), (station_id, field)
+
+    assert load_station("MISSING") is None
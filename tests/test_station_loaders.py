@@ -0,0 +1,108 @@
+import asyncio
+import os
+import pytest
+
+import load_stations_daily_temp as daily_temp_module
+import load_stations_monthly_precip as monthly_precip_module
+from load_stations_daily_temp import iter_stations_daily_temp, load_stations_daily_temp
+from load_stations_monthly_precip import iter_stations_monthly_precip, load_stations_monthly_precip, load_stations_monthly_precip_async
+from station_cache import iter_station_batches
+
+def tmax_line(station_id, month, value):
+    return f"{station_id} {month:02d} " + " ".join(f"{value}C" for _ in range(31)) + "\n"
+
+def test_daily_temp_stream_yields_each_station_once_parsed(tmp_path, monkeypatch):
+    path = tmp_path / "dly-tmax-normal.txt"
+    path.write_text(tmax_line("A", 1, 700) + tmax_line("A", 2, 710) + tmax_line("B", 1, 800) + tmax_line("A", 3, 720))
+    monkeypatch.setattr(daily_temp_module, 'DAILY_TMAX_NORMAL_FILE', str(path))
+
+    stream = iter_stations_daily_temp()
+    first = next(stream)
+    assert first.station_id == "A"
+    assert first.avg_daily_max_temperature[1][0] == 71.0
+    assert [station.station_id for station in stream] == ["B", "A"]
+
+    # The dict loader combines the months of a station whose lines aren't contiguous
+    stations = load_stations_daily_temp()
+    assert list(stations) == ["A", "B"]
+    assert [stations["A"].avg_daily_max_temperature[month][0] for month in range(4)] == [70.0, 71.0, 72.0, None]
+
+def test_monthly_precip_stream_matches_dict_loader(tmp_path, monkeypatch):
+    for station_id, rainy in [("A", 30), ("B", 60)]:
+        rows = "".join(f"{month:02d},{rainy},40.5,-100.25\n" for month in range(1, 13))
+        (tmp_path / f"{station_id}.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    (tmp_path / "notes.txt").write_text("not a station")
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_DIR', str(tmp_path))
+
+    streamed = {station.station_id: station for station in iter_stations_monthly_precip()}
+    loaded = load_stations_monthly_precip()
+
+    assert sorted(streamed) == sorted(loaded) == ["A", "B"]
+    assert loaded["B"].avg_rainy_days_per_month == [2.0] * 12
+    assert (loaded["A"].latitude, loaded["A"].longitude) == (40.5, -100.25)
+
+    batches = list(iter_station_batches(iter_stations_monthly_precip(), batch_size=1))
+    assert [batch['station_ids'].tolist() for batch in batches] == [[s] for s in streamed]
+    assert all(batch['rainy_days'].shape == (1, 12) for batch in batches)
+
+def test_async_monthly_precip_matches_serial_loader(tmp_path, monkeypatch):
+    for k in range(20):
+        rows = "".join(f"{month:02d},{k + month},35.0,-90.0\n" for month in range(1, 13))
+        (tmp_path / f"S{k:02d}.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    (tmp_path / "BAD.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI\n01,9999\n")  # more than 31 rainy days
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_DIR', str(tmp_path))
+
+    serial = load_stations_monthly_precip()
+    concurrent = asyncio.run(load_stations_monthly_precip_async(max_concurrent_reads=4))
+
+    assert list(concurrent) == list(serial) and "BAD" not in concurrent
+    for station_id, station in serial.items():
+        assert concurrent[station_id].avg_rainy_days_per_month == station.avg_rainy_days_per_month
+
+    # Any directory can be read, like with the serial loader
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_DIR', str(tmp_path / "missing"))
+    assert list(asyncio.run(load_stations_monthly_precip_async(max_concurrent_reads=4, directory=str(tmp_path)))) == list(serial)
+
+def test_packed_archive_is_read_instead_of_the_csv_files(tmp_path, monkeypatch):
+    data_dir = tmp_path / "normals-monthly"
+    data_dir.mkdir()
+    for station_id, rainy in [("B", 60), ("A", 30)]:
+        rows = "".join(f"{month:02d},{rainy},40.5,-100.25\n" for month in range(1, 13))
+        (data_dir / f"{station_id}.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    (data_dir / "C.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI\n" + "".join(f"{month:02d},3\n" for month in range(1, 13)))
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_DIR', str(data_dir))
+    monkeypatch.setattr(monthly_precip_module, 'MONTHLY_PRECIP_ARCHIVE', str(tmp_path / "normals-monthly.npz"))
+
+    from_csv = load_stations_monthly_precip()
+    # An old directory time, so later changes to the directory always move it
+    archive_stamp = 1
+    os.utime(data_dir, ns=(archive_stamp, archive_stamp))
+    assert monthly_precip_module.pack_monthly_precip_archive() == 3
+
+    # Make sure the archive is what gets read
+    read_csv_files = monthly_precip_module._iter_monthly_precip_dir
+    monkeypatch.setattr(monthly_precip_module, '_iter_monthly_precip_dir', lambda directory=None: pytest.fail("CSV files read"))
+    from_archive = load_stations_monthly_precip()
+
+    assert list(from_archive) == ["A", "B", "C"]
+    for station_id, station in from_csv.items():
+        packed = from_archive[station_id]
+        assert packed.avg_rainy_days_per_month == station.avg_rainy_days_per_month
+        assert (packed.latitude, packed.longitude) == (station.latitude, station.longitude)
+
+    # A directory other than the default one isn't in the default archive
+    with pytest.raises(pytest.fail.Exception):
+        load_stations_monthly_precip(str(data_dir))
+
+    # A CSV file edited in place is only noticed by a full check
+    monkeypatch.setattr(monthly_precip_module, '_iter_monthly_precip_dir', read_csv_files)
+    rows = "".join(f"{month:02d},90,40.5,-100.25\n" for month in range(1, 13))
+    (data_dir / "A.csv").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    os.utime(data_dir, ns=(archive_stamp, archive_stamp))
+    assert monthly_precip_module.precip_archive_is_current()
+    assert not monthly_precip_module.precip_archive_is_current(verify=True)
+
+    # Replacing or adding a file changes the directory, and the CSV files are read again
+    (data_dir / "A.new").write_text("DATE,MLY-PRCP-AVGNDS-GE050HI,LATITUDE,LONGITUDE\n" + rows)
+    os.replace(data_dir / "A.new", data_dir / "A.csv")
+    assert load_stations_monthly_precip()["A"].avg_rainy_days_per_month == [3.0] * 12